@@ -0,0 +1,50 @@
+"""
+Measure how dispatch cost scales with the number of unload stations.
+
+The fleet grows with the station count so queues stay short and the run is dominated by
+finding the shortest queue for every arriving truck.
+
+Usage:
+    python -m benchmarks.bench_dispatch --stations 10 100 1000
+"""
+import argparse
+import contextlib
+import io
+import time
+from simulation.config import SimulationConfig
+from simulation.run import LunarMiningSimulation
+
+
+def time_dispatch(dispatch: str, num_trucks: int, num_stations: int, minutes: int, seed: int):
+    """
+    Run one event engine simulation and return its wall time in seconds and a digest of its results
+    """
+    simulation = LunarMiningSimulation(num_trucks, num_stations, engine="event", dispatch=dispatch, seed=seed,
+                                       config=SimulationConfig(horizon_minutes=minutes))
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation.run()
+    seconds = time.perf_counter() - start
+    digest = hash(tuple((t.num_batches_delivered, t.total_queued_time) for t in simulation.trucks))
+    return seconds, digest
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark linear and indexed dispatch as station count grows')
+    parser.add_argument('--stations', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--trucks-per-station', type=int, default=40)
+    parser.add_argument('--minutes', type=int, default=24 * 60)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for num_stations in args.stations:
+        num_trucks = num_stations * args.trucks_per_station
+        linear, linear_digest = time_dispatch("linear", num_trucks, num_stations, args.minutes, args.seed)
+        indexed, indexed_digest = time_dispatch("indexed", num_trucks, num_stations, args.minutes, args.seed)
+        identical = "identical" if linear_digest == indexed_digest else "DIFFERENT"
+        print(f"{num_stations} stations, {num_trucks} trucks: linear {linear:.3f}s, indexed {indexed:.3f}s, "
+              f"{linear / indexed:.1f}x, results {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Compare the wall time of the simulation engines on large fleets.
+
+Usage:
+    python -m benchmarks.bench_engines --trucks 10000 --stations 40
+    python -m benchmarks.bench_engines --trucks 10000 --stations 40 --config mixed_fleet.toml
+"""
+import argparse
+import contextlib
+import io
+import time
+from simulation.config import SimulationConfig
+from simulation.run import LunarMiningSimulation
+
+
+def time_engine(engine: str, num_trucks: int, num_stations: int, config: SimulationConfig, seed: int) -> float:
+    """
+    Run one simulation with the given engine and return its wall time in seconds
+    """
+    simulation = LunarMiningSimulation(num_trucks, num_stations, engine=engine, seed=seed, config=config)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation.run()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the simulation engines against the tick engine')
+    parser.add_argument('--trucks', type=int, nargs='+', default=[10000])
+    parser.add_argument('--stations', type=int, default=40)
+    parser.add_argument('--minutes', type=int, default=72 * 60)
+    parser.add_argument('--engines', nargs='+', default=["tick", "event", "vector", "kernel"])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--config', metavar='FILE', default=None,
+                        help='TOML file with truck and station classes, to compare a mixed fleet with a uniform one')
+    args = parser.parse_args()
+    config = SimulationConfig.from_toml(args.config) if args.config else SimulationConfig()
+    config = config.replace(horizon_minutes=args.minutes)
+
+    for num_trucks in args.trucks:
+        times = {engine: time_engine(engine, num_trucks, args.stations, config, args.seed)
+                 for engine in args.engines}
+        baseline = times.get("tick")
+        for engine, seconds in times.items():
+            speedup = f", {baseline / seconds:.1f}x tick" if baseline else ""
+            print(f"{num_trucks} trucks, {args.stations} stations, {engine}: {seconds:.3f}s{speedup}")
+
+
+if __name__ == "__main__":
+    main()
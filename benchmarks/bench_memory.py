@@ -0,0 +1,70 @@
+"""
+Report the memory used per truck by each way of storing a fleet, measured with tracemalloc.
+
+"dict objects" rebuilds MiningTruck without __slots__, which is how trucks were stored before
+the slotted entity layer, so the before and after numbers come from the same code.
+
+Usage:
+    python -m benchmarks.bench_memory --trucks 50000
+"""
+import argparse
+import contextlib
+import io
+import tracemalloc
+from simulation.config import SimulationConfig
+from simulation.fleet import TruckFleet
+from simulation.rng import LoadTimeStream
+from simulation.run import LunarMiningSimulation
+from simulation.truck import MiningTruck
+
+# MiningTruck without __slots__, every instance gets a __dict__ again
+DictMiningTruck = type("DictMiningTruck", (), {name: value for name, value in vars(MiningTruck).items()
+                                               if name not in MiningTruck.__slots__ + ("__slots__",)})
+
+
+def measure(build) -> tuple[int, int]:
+    """
+    Get the memory still allocated after build() returns and the peak while it ran, in bytes
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    return current - before, peak - before
+
+
+def run_fleet(num_trucks: int, fleet: str):
+    """
+    Build and run a one day simulation on the event engine
+    """
+    simulation = LunarMiningSimulation(num_trucks, max(1, num_trucks // 40), engine="event", seed=0, fleet=fleet,
+                                       config=SimulationConfig(horizon_minutes=24 * 60))
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation.run()
+    return simulation
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure bytes per truck for each fleet representation')
+    parser.add_argument('--trucks', type=int, default=50000)
+    args = parser.parse_args()
+    n = args.trucks
+    stream = LoadTimeStream(0)
+
+    cases = {
+        "dict objects": lambda: [DictMiningTruck(i, stream) for i in range(n)],
+        "slotted objects": lambda: [MiningTruck(i, stream) for i in range(n)],
+        "array fleet": lambda: TruckFleet(n, stream),
+        "run, slotted objects": lambda: run_fleet(n, "objects"),
+        "run, array fleet": lambda: run_fleet(n, "arrays"),
+    }
+    for name, build in cases.items():
+        current, peak = measure(build)
+        print(f"{name}: {current / n:.1f} bytes per truck retained, {peak / n:.1f} bytes per truck peak")
+
+
+if __name__ == "__main__":
+    main()
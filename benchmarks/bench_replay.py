@@ -0,0 +1,57 @@
+"""
+Compare rebuilding the state of a run at a minute from its event log with simulating the run up to that minute.
+
+Usage:
+    python -m benchmarks.bench_replay --trucks 2000 --stations 50 --minutes 4320
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+from simulation.config import SimulationConfig
+from simulation.eventlog import EventLogFile
+from simulation.run import LunarMiningSimulation
+
+
+def run(num_trucks: int, num_stations: int, minutes: int, seed: int, engine: str = "tick", **options) -> float:
+    """
+    Run one simulation over minutes and return its wall time in seconds
+    """
+    simulation = LunarMiningSimulation(num_trucks, num_stations, engine=engine, seed=seed,
+                                       config=SimulationConfig(horizon_minutes=minutes), **options)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation.run()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark replaying an event log against re-simulating')
+    parser.add_argument('--trucks', type=int, default=2000)
+    parser.add_argument('--stations', type=int, default=50)
+    parser.add_argument('--minutes', type=int, default=72 * 60)
+    parser.add_argument('--interval', type=int, default=60, help='minutes between index checkpoints')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "run.log")
+        plain = run(args.trucks, args.stations, args.minutes, args.seed)
+        logged = run(args.trucks, args.stations, args.minutes, args.seed, event_log=path,
+                     event_log_interval=args.interval)
+        print(f"run: {plain:.3f}s, logged run: {logged:.3f}s, log {os.path.getsize(path) / 1e6:.1f} MB")
+        with EventLogFile(path) as log:
+            for minute in (args.minutes // 4, args.minutes // 2, args.minutes - 1):
+                start = time.perf_counter()
+                log.state_at(minute)
+                replay = time.perf_counter() - start
+                tick = run(args.trucks, args.stations, minute, args.seed)
+                event = run(args.trucks, args.stations, minute, args.seed, engine="event")
+                print(f"minute {minute}: replay {replay * 1000:.1f}ms, tick {tick:.3f}s ({tick / replay:.0f}x), "
+                      f"event {event:.3f}s ({event / replay:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
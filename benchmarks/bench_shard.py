@@ -0,0 +1,54 @@
+"""
+Measure how the shard engine scales with its worker processes on one large operation, against the event and
+kernel engines in one process.
+
+Usage:
+    python -m benchmarks.bench_shard --trucks 100000 --stations 2500 --workers 1 2 4 8
+"""
+import argparse
+import contextlib
+import io
+import os
+import time
+from simulation.config import SimulationConfig
+from simulation.run import LunarMiningSimulation
+
+
+def time_run(engine: str, num_trucks: int, num_stations: int, config: SimulationConfig, seed: int,
+             workers: int = None) -> float:
+    """
+    Run one simulation of an array-backed fleet and return its wall time in seconds
+    """
+    simulation = LunarMiningSimulation(num_trucks, num_stations, engine=engine, seed=seed, fleet="arrays",
+                                       config=config, workers=workers)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation.run()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the shard engine over a number of worker processes')
+    parser.add_argument('--trucks', type=int, default=100000)
+    parser.add_argument('--stations', type=int, default=2500)
+    parser.add_argument('--minutes', type=int, default=24 * 60)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--engines', nargs='+', default=["event", "kernel"],
+                        help='single process engines to compare against')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    config = SimulationConfig(horizon_minutes=args.minutes)
+    print(f"{args.trucks} trucks, {args.stations} stations, {args.minutes} minutes, {os.cpu_count()} CPUs")
+
+    for engine in args.engines:
+        seconds = time_run(engine, args.trucks, args.stations, config, args.seed)
+        print(f"{engine}: {seconds:.3f}s")
+    baseline = None
+    for workers in args.workers:
+        seconds = time_run("shard", args.trucks, args.stations, config, args.seed, workers)
+        baseline = baseline or seconds
+        print(f"shard, {workers} workers: {seconds:.3f}s, {baseline / seconds:.1f}x {args.workers[0]} workers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Compare the wall time of many small runs started one command line at a time with the same runs in one --batch
+process, and report the time to import the command line.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 50
+    python -m benchmarks.bench_startup --runs 20 --engine kernel
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def run_lines(lines: list[str]) -> list[list[str]]:
+    """
+    Get the command line of one process per run
+    """
+    return [[sys.executable, "-m", "simulation.run", *line.split()] for line in lines]
+
+
+def timed(commands: list[list[str]], stdin: str = None) -> float:
+    """
+    Run commands one after the other and return their wall time in seconds
+    """
+    start = time.perf_counter()
+    for command in commands:
+        subprocess.run(command, input=stdin, text=True, stdout=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark single runs against a batch of the same runs')
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--trucks', type=int, default=20)
+    parser.add_argument('--stations', type=int, default=3)
+    parser.add_argument('--minutes', type=int, default=24 * 60)
+    parser.add_argument('--engine', default="event")
+    args = parser.parse_args()
+    lines = [f"{args.trucks} {args.stations} --engine {args.engine} --seed {seed} --horizon {args.minutes}"
+             for seed in range(args.runs)]
+
+    imports = timed([[sys.executable, "-c", "import simulation.run"]] * 5) / 5
+    print(f"import simulation.run: {imports * 1000:.1f}ms")
+    single = timed(run_lines(lines))
+    print(f"{args.runs} single runs: {single:.3f}s, {single / args.runs * 1000:.1f}ms per run")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "batch.txt")
+        with open(path, "w") as file:
+            file.write("\n".join(lines) + "\n")
+        batch = timed([[sys.executable, "-m", "simulation.run", "--batch", path]])
+    print(f"{args.runs} runs in one batch: {batch:.3f}s, {batch / args.runs * 1000:.1f}ms per run, "
+          f"{single / batch:.1f}x single runs")
+    stdin = timed([[sys.executable, "-m", "simulation.run", "--batch", "-"]], stdin="\n".join(lines))
+    print(f"{args.runs} runs in one batch from stdin: {stdin:.3f}s, {single / stdin:.1f}x single runs")
+
+
+if __name__ == "__main__":
+    main()
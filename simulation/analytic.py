@@ -0,0 +1,302 @@
+import argparse
+import contextlib
+import io
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from simulation.config import SimulationConfig, DEFAULT_CONFIG, class_counts
+from simulation.run import ENGINES
+
+# Truck and station counts of the default validation grid
+VALIDATION_TRUCKS = (10, 50, 100, 200, 400)
+VALIDATION_STATIONS = (1, 2, 5, 10)
+
+# Values compared against the simulator, as named in QueueingEstimate
+VALIDATED = ("deliveries", "queue_time", "queue_length")
+
+
+# Trucks added one at a time by the exact recursion, from the Schweitzer solution of the fleet without them
+EXACT_STEPS = 64
+
+
+@dataclass(frozen=True)
+class QueueingEstimate:
+    """
+    Approximate results of an operation from its queueing model.
+
+    Args:
+        throughput (float): Loads delivered per minute by the whole fleet, once the start has worn off.
+        utilization (float): Share of the bay minutes of the stations spent unloading.
+        wait_minutes (float): Minutes a truck waits for a bay on each visit to a station.
+        deliveries (float): Loads delivered by the whole fleet over the horizon.
+        queue_time (float): Minutes a truck spends queued over the horizon.
+        queue_length (float): Time averaged number of trucks at a station, waiting or unloading.
+    """
+    throughput: float
+    utilization: float
+    wait_minutes: float
+    deliveries: float
+    queue_time: float
+    queue_length: float
+
+
+def exact_throughput(num_trucks: int, delay: float, demand: float, start: int = 0,
+                     throughput: float = 0.0) -> float:
+    """
+    Get the throughput of a closed network of a delay and one fixed time server with the mean value analysis
+    recursion over the number of trucks.
+
+    Args:
+        num_trucks (int): Trucks cycling through the network.
+        delay (float): Minutes a truck spends in the delay station per cycle.
+        demand (float): Minutes of service per cycle at the server.
+        start (int): Trucks of the solution the recursion starts from, 0 for the exact recursion.
+        throughput (float): Throughput of that solution.
+    """
+    # Little's law gives the queue of the starting solution from its throughput
+    queue = start - throughput * delay
+    for n in range(start + 1, num_trucks + 1):
+        # An arriving truck waits for the queue it sees, less the half unload already done on the truck in service
+        response = demand * (1 + queue - throughput * demand / 2)
+        # Which can overshoot the rate of the server by a fraction of a truck once it is saturated
+        throughput = min(n / (delay + response), 1 / demand)
+        queue = throughput * response
+    return throughput
+
+
+def schweitzer_throughput(num_trucks: int, delay: float, demand: float) -> float:
+    """
+    Get the throughput of the network of exact_throughput with the Schweitzer approximation, where arrivals
+    see (n - 1) / n of the mean queue of n trucks. It is exact for one truck.
+
+    With s = (n - 1) / n, R = D (1 + s X R - s D X / 2) and X = n / (Z + R) give A X^2 - B X + n = 0,
+    solved here for its smaller root.
+    """
+    share = (num_trucks - 1) / num_trucks
+    a = demand * share * (delay + demand / 2)
+    b = delay + demand + num_trucks * demand * share
+    return min(2 * num_trucks / (b + math.sqrt(max(0.0, b * b - 4 * a * num_trucks))), 1 / demand)
+
+
+def estimate(num_trucks: int, num_stations: int, config: SimulationConfig = None,
+             minutes: int = None) -> QueueingEstimate:
+    """
+    Estimate an operation with mean value analysis of the closed network its trucks cycle through.
+
+    Every truck loads, drives to the stations, queues for a bay, unloads and drives back. Loading and driving
+    never wait for each other, so together they are one delay station, and the stations are pooled into one
+    queue with a server per bay, as dispatching to the shortest queue keeps them close to a shared line.
+    The pooled queue uses Seidmann's approximation, a single server with the unload time divided by the bays
+    plus a delay of the rest, and an arriving truck finds half an unload left on the truck in a bay, as unloads
+    take a fixed time. The Schweitzer fixed point solves the fleet without its last EXACT_STEPS trucks, and the
+    exact recursion adds those one at a time, which shrinks the error of the fixed point around the knee
+    while costing the same for any fleet. Small fleets start from one truck, where the fixed point is exact,
+    so estimates change smoothly with the fleet.
+
+    Counts over the horizon come from the renewal function of each truck's cycle: every truck starts loading
+    at minute 0, so the first arrival and delivery come after a full load and drive. Saturated stations unload
+    at the rate of the model from the first arrival instead. Mixed fleets share one wait, with the load and
+    drive times of their classes averaged over the trucks for the throughput.
+
+    Args:
+        num_trucks (int): Trucks of the operation.
+        num_stations (int): Unload stations of the operation.
+        config (SimulationConfig): Durations and classes of the operation, defaults to the original 72 hours.
+        minutes (int): Minutes the counts cover, defaults to the horizon of the config.
+
+    Returns:
+        QueueingEstimate of the operation
+    """
+    if num_trucks <= 0:
+        raise ValueError("Invalid value passed for num_trucks. Value must be > 0")
+    if num_stations <= 0:
+        raise ValueError("Invalid value passed for num_stations. Value must be > 0")
+    config = config if config is not None else DEFAULT_CONFIG
+    horizon = minutes if minutes is not None else config.horizon_minutes
+
+    # Mean, variance and travel time of every truck class, load times are uniform over whole minutes
+    counts = class_counts(config.truck_table, num_trucks)
+    classes = [((c.load_min + c.load_max) / 2, ((c.load_max - c.load_min + 1) ** 2 - 1) / 12, c.travel_minutes)
+               for c in config.truck_table]
+    delay = sum(count * (load + 2 * travel) for count, (load, _, travel) in zip(counts, classes)) / num_trucks
+
+    # The stations pooled into one queue with a server per bay, unloading for the mean time of a bay
+    bays = 0
+    unload_minutes = 0
+    for station, count in zip(config.station_table, class_counts(config.station_table, num_stations)):
+        bays += count * station.bays
+        unload_minutes += count * station.bays * station.unload_minutes
+    unload = unload_minutes / bays
+    demand = unload / bays
+    delay += unload - demand
+
+    start = max(1, num_trucks - EXACT_STEPS)
+    throughput = exact_throughput(num_trucks, delay, demand, start, schweitzer_throughput(start, delay, demand))
+    wait = max(0.0, num_trucks / throughput - delay - demand)
+    # Once the first truck arrives the stations unload at least at that rate, which is all they do when saturated
+    earliest = min(c.load_min + c.travel_minutes for c in config.truck_table) + unload
+    busy = throughput * max(0, horizon - earliest)
+
+    deliveries = queue_time = at_stations = 0.0
+    for count, (load, variance, travel) in zip(counts, classes):
+        if not count:
+            continue
+        cycle = load + 2 * travel + wait + unload
+        # Renewal function of a cycle started at minute 0: (t - first) / cycle + (variance + cycle^2) / 2 cycle^2
+        offset = (variance + cycle * cycle) / (2 * cycle * cycle)
+        arrivals = max(0.0, (horizon - load - travel) / cycle + offset)
+        finished = max(0.0, (horizon - load - travel - wait - unload) / cycle + offset)
+        deliveries += count * finished
+        # Trucks still at a station at the end have spent about half of their visit there
+        visits = (arrivals + finished) / 2
+        queue_time += count * visits * wait
+        at_stations += count * visits * (wait + unload)
+    deliveries = max(deliveries, busy)
+
+    return QueueingEstimate(throughput=throughput, utilization=min(1.0, throughput * demand), wait_minutes=wait,
+                            deliveries=deliveries, queue_time=queue_time / num_trucks,
+                            queue_length=at_stations / (horizon * num_stations) if horizon else 0.0)
+
+
+def simulate(task: tuple) -> tuple:
+    """
+    Run one replicate of the validation grid in a worker.
+
+    Args:
+        task (tuple): (num_trucks, num_stations, seed, engine, config) of the replicate.
+
+    Returns:
+        (num_trucks, num_stations, deliveries, mean queue time, mean queue length of the stations)
+    """
+    from simulation.run import LunarMiningSimulation
+
+    num_trucks, num_stations, seed, engine, config = task
+    simulation = LunarMiningSimulation(num_trucks, num_stations, engine=engine, seed=seed, config=config)
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = simulation.run()
+    queue_length = sum(station.get_average_queue_length() for station in simulation.stations) / num_stations
+    return num_trucks, num_stations, results.total_deliveries, results.mean_queue_time, queue_length
+
+
+def validate(trucks: list[int] = VALIDATION_TRUCKS, stations: list[int] = VALIDATION_STATIONS,
+             replicates: int = 3, seed: int = 0, engine: str = "event", config: SimulationConfig = None,
+             workers: int = None) -> list[dict]:
+    """
+    Compare the estimates of the model with the mean of simulated replicates over a grid of truck and station
+    counts.
+
+    Errors are relative to the simulated value, or absolute where it is below 1, since trucks of a
+    large enough operation barely queue.
+
+    Args:
+        trucks (list[int]): Truck counts of the grid.
+        stations (list[int]): Station counts of the grid.
+        replicates (int): Simulated replicates of every configuration.
+        seed (int): Seed the replicate seeds are derived from.
+        engine (str): Engine running the replicates.
+        config (SimulationConfig): Durations and horizon of every run, defaults to the original 72 hour operation.
+        workers (int): Worker processes, defaults to the number of CPUs.
+
+    Returns:
+        one row per configuration, with the simulated and estimated value and the error of every validated value
+    """
+    from simulation.sweep import replicate_seed
+
+    if replicates <= 0:
+        raise ValueError("Invalid value passed for replicates. Value must be > 0")
+    config = config if config is not None else DEFAULT_CONFIG
+    tasks = [(n, m, replicate_seed(seed, r), engine, config) for n in trucks for m in stations
+             for r in range(replicates)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = list(map(simulate, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(simulate, tasks, chunksize=max(1, len(tasks) // (workers * 8))))
+
+    totals: dict[tuple, list[float]] = {}
+    for n, m, *values in results:
+        total = totals.setdefault((n, m), [0.0] * len(VALIDATED))
+        for index, value in enumerate(values):
+            total[index] += value
+
+    rows = []
+    for n in trucks:
+        for m in stations:
+            model = estimate(n, m, config)
+            row = {"num_trucks": n, "num_stations": m}
+            for metric, total in zip(VALIDATED, totals[(n, m)]):
+                simulated = total / replicates
+                estimated = getattr(model, metric)
+                row[f"{metric}_sim"] = simulated
+                row[f"{metric}_model"] = estimated
+                row[f"{metric}_error"] = (estimated - simulated) / max(1.0, abs(simulated))
+            rows.append(row)
+    return rows
+
+
+def time_estimate(num_trucks: int, num_stations: int, config: SimulationConfig, repeat: int = 10000) -> float:
+    """
+    Get the mean seconds one estimate takes
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        estimate(num_trucks, num_stations, config)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='LunarMiningQueueingModel',
+        description='Estimates an operation from a queueing model of its truck cycle instead of simulating it'
+    )
+    parser.add_argument('num_trucks', type=int, nargs='?')
+    parser.add_argument('num_stations', type=int, nargs='?')
+    parser.add_argument('--minutes', type=int, default=None, help='minutes estimated, overrides the config horizon')
+    parser.add_argument('--config', metavar='FILE', default=None,
+                        help='TOML file with the horizon, durations and classes of the operation')
+    parser.add_argument('--validate', action='store_true',
+                        help='print the error of the model against the simulator over a grid of operations')
+    parser.add_argument('--trucks', type=str, default=None, help='truck counts of the validation grid, e.g. 5:50:5')
+    parser.add_argument('--stations', type=str, default=None, help='station counts of the validation grid')
+    parser.add_argument('--replicates', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', choices=ENGINES, default="event")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    config = SimulationConfig.from_toml(args.config) if args.config else DEFAULT_CONFIG
+    config = config.replace(horizon_minutes=args.minutes)
+
+    if not args.validate:
+        if args.num_trucks is None or args.num_stations is None:
+            parser.error("num_trucks and num_stations are required without --validate")
+        model = estimate(args.num_trucks, args.num_stations, config)
+        print(f"Throughput: {model.throughput:.4f} loads per minute, utilization {model.utilization:.1%}")
+        print(f"Wait per visit: {model.wait_minutes:.2f} minutes")
+        print(f"Deliveries in {config.horizon_minutes} minutes: {model.deliveries:.1f}")
+        print(f"Mean queue time: {model.queue_time:.2f} minutes")
+        print(f"Mean queue length: {model.queue_length:.3f}")
+        print(f"Estimated in {time_estimate(args.num_trucks, args.num_stations, config) * 1e6:.1f} microseconds")
+        return
+
+    from simulation.sweep import parse_range
+
+    trucks = parse_range(args.trucks) if args.trucks else list(VALIDATION_TRUCKS)
+    stations = parse_range(args.stations) if args.stations else list(VALIDATION_STATIONS)
+    rows = validate(trucks, stations, args.replicates, seed=args.seed, engine=args.engine, config=config,
+                    workers=args.workers)
+    header = list(rows[0])
+    print(",".join(header))
+    for row in rows:
+        print(",".join(str(row[key]) if isinstance(row[key], int) else f"{row[key]:.3f}" for key in header))
+    for metric in VALIDATED:
+        errors = [abs(row[f"{metric}_error"]) for row in rows]
+        print(f"# {metric}: mean absolute error {sum(errors) / len(errors):.1%}, largest {max(errors):.1%}")
+    seconds = sum(time_estimate(n, m, config, 1000) for n in trucks for m in stations) / len(rows)
+    print(f"# one estimate takes {seconds * 1e6:.1f} microseconds")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import multiprocessing
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from simulation.config import SimulationConfig
+from simulation.dispatch import DISPATCHERS
+from simulation.run import LunarMiningSimulation, ENGINES, FLEETS, KERNEL_DISPATCHERS
+from simulation.sweep import parse_range
+
+# Version of the JSON result format, baselines of another version are not compared
+FORMAT_VERSION = 1
+
+# Metrics checked against a baseline, a larger value is a regression
+COMPARED_METRICS = ("wall_seconds", "tracemalloc_peak_bytes")
+
+# Fields that identify one benchmark case
+CASE_FIELDS = ("engine", "dispatch", "fleet", "num_trucks", "num_stations", "minutes")
+
+
+def available_engines() -> list[str]:
+    """
+    Get the engines that can run here, the vector engine needs NumPy
+    """
+    return [engine for engine in ENGINES if engine != "vector" or importlib.util.find_spec("numpy") is not None]
+
+
+def variants(engines: list[str] = None, dispatchers: list[str] = None,
+             fleets: list[str] = None) -> list[tuple[str, str, str]]:
+    """
+    Get every (engine, dispatch, fleet) combination the simulation supports.
+
+    New engines, dispatchers and fleets are picked up from their registries, so they are benchmarked
+    without changes here.
+
+    Args:
+        engines (list[str]): Engines to include, defaults to every engine that can run here.
+        dispatchers (list[str]): Dispatchers to include, defaults to all of them.
+        fleets (list[str]): Fleet representations to include, defaults to all of them.
+    """
+    combinations = []
+    for engine in engines or available_engines():
+        for dispatch in dispatchers or list(DISPATCHERS):
+            for fleet in fleets or list(FLEETS):
+                # The tick engine steps truck objects, it cannot run an array-backed fleet
+                if fleet == "arrays" and engine == "tick":
+                    continue
+                # The kernel engine only joins the shortest queue
+                if engine == "kernel" and dispatch not in KERNEL_DISPATCHERS:
+                    continue
+                combinations.append((engine, dispatch, fleet))
+    return combinations
+
+
+def peak_rss_bytes() -> int:
+    """
+    Get the peak resident set size of this process in bytes, or None where the resource module is missing
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_once(case: dict):
+    """
+    Build and run the simulation of one case with its output discarded
+    """
+    simulation = LunarMiningSimulation(case["num_trucks"], case["num_stations"], engine=case["engine"],
+                                       dispatch=case["dispatch"], seed=case["seed"], fleet=case["fleet"],
+                                       config=SimulationConfig(horizon_minutes=case["minutes"]))
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation.run()
+
+
+def run_case(case: dict, warmup: int = 1, repeat: int = 3) -> dict:
+    """
+    Benchmark one case.
+
+    The case is run warmup times untimed, then repeat times timed, then once more under tracemalloc,
+    which slows the run down too much to be timed.
+
+    Args:
+        case (dict): engine, dispatch, fleet, num_trucks, num_stations, minutes and seed of the run.
+        warmup (int): Untimed runs before timing starts.
+        repeat (int): Timed runs.
+
+    Returns:
+        the case with its wall time, throughput and memory metrics added
+    """
+    if repeat <= 0:
+        raise ValueError("Invalid value passed for number of repeats. Value must be > 0")
+    for _ in range(warmup):
+        run_once(case)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run_once(case)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    run_once(case)
+    traced_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # The fastest run is the one least disturbed by the rest of the machine
+    wall = min(times)
+    result = dict(case)
+    result.update({
+        "repeat": repeat,
+        "wall_seconds": wall,
+        "wall_seconds_mean": statistics.mean(times),
+        "ticks_per_second": case["minutes"] / wall,
+        "truck_minutes_per_second": case["num_trucks"] * case["minutes"] / wall,
+        "tracemalloc_peak_bytes": traced_peak,
+        "peak_rss_bytes": peak_rss_bytes(),
+    })
+    return result
+
+
+def benchmark(trucks: list[int], stations: list[int], minutes: list[int], cases: list[tuple[str, str, str]] = None,
+              warmup: int = 1, repeat: int = 3, seed: int = 0, isolate: bool = True):
+    """
+    Benchmark every variant over every fleet size, station count and simulation length.
+
+    Args:
+        trucks (list[int]): Truck counts to simulate.
+        stations (list[int]): Station counts to simulate.
+        minutes (list[int]): Simulated minutes of each run.
+        cases (list[tuple]): (engine, dispatch, fleet) variants, defaults to every variant from variants().
+        warmup (int): Untimed runs of each case.
+        repeat (int): Timed runs of each case.
+        seed (int): Seed of every run, so all variants simulate the same trucks.
+        isolate (bool): Run each case in a fresh process, so peak RSS belongs to that case alone.
+
+    Yields:
+        result dict of each case, in order
+    """
+    if cases is None:
+        cases = variants()
+    for num_trucks in trucks:
+        for num_stations in stations:
+            for length in minutes:
+                for engine, dispatch, fleet in cases:
+                    case = {"engine": engine, "dispatch": dispatch, "fleet": fleet, "num_trucks": num_trucks,
+                            "num_stations": num_stations, "minutes": length, "seed": seed}
+                    if not isolate:
+                        yield run_case(case, warmup, repeat)
+                        continue
+                    # A spawned worker starts with a clean heap, a forked one would inherit this process's peak
+                    context = multiprocessing.get_context("spawn")
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        yield executor.submit(run_case, case, warmup, repeat).result()
+
+
+def case_key(result: dict) -> tuple:
+    """
+    Get the fields identifying the case of a result
+    """
+    return tuple(result[field] for field in CASE_FIELDS)
+
+
+def compare(results: list[dict], baseline: dict, tolerance: float = 0.1) -> list[dict]:
+    """
+    Find regressions against a baseline.
+
+    Args:
+        results (list[dict]): Results of the current benchmark.
+        baseline (dict): Contents of a saved benchmark JSON file.
+        tolerance (float): Fraction a metric may grow by before it counts as a regression.
+
+    Returns:
+        one dict per regressed metric, with the case, metric, baseline and current values
+    """
+    if baseline.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Invalid value passed for baseline. Expected format version {FORMAT_VERSION}")
+    saved = {case_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        previous = saved.get(case_key(result))
+        if previous is None:
+            continue
+        for metric in COMPARED_METRICS:
+            if previous.get(metric) and result[metric] > previous[metric] * (1 + tolerance):
+                regressions.append({"case": dict(zip(CASE_FIELDS, case_key(result))), "metric": metric,
+                                    "baseline": previous[metric], "current": result[metric]})
+    return regressions
+
+
+def report(results: list[dict]) -> dict:
+    """
+    Wrap results in the JSON document written by the benchmark
+    """
+    return {
+        "version": FORMAT_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='LunarMiningBench',
+        description='Benchmarks every simulation engine, dispatcher and fleet over fleet size, station count and '
+                    'simulation length'
+    )
+    parser.add_argument('--trucks', type=parse_range, default=[100, 1000], help='truck counts, e.g. 100,1000')
+    parser.add_argument('--stations', type=parse_range, default=[5], help='station counts, same format as --trucks')
+    parser.add_argument('--minutes', type=parse_range, default=[24 * 60], help='simulated minutes, same format')
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=None)
+    parser.add_argument('--dispatch', nargs='+', choices=list(DISPATCHERS), default=None)
+    parser.add_argument('--fleets', nargs='+', choices=FLEETS, default=None)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None, help='write the results as JSON to this file')
+    parser.add_argument('--baseline', default=None, help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='fraction wall time or memory may grow by before it counts as a regression')
+    args = parser.parse_args()
+
+    results = []
+    for result in benchmark(args.trucks, args.stations, args.minutes, variants(args.engines, args.dispatch, args.fleets),
+                            warmup=args.warmup, repeat=args.repeat, seed=args.seed):
+        results.append(result)
+        rss = result["peak_rss_bytes"]
+        print(f"{result['engine']}/{result['dispatch']}/{result['fleet']} {result['num_trucks']} trucks, "
+              f"{result['num_stations']} stations, {result['minutes']} minutes: {result['wall_seconds']:.3f}s, "
+              f"{result['truck_minutes_per_second']:.0f} truck minutes/s, "
+              f"tracemalloc peak {result['tracemalloc_peak_bytes'] / 2 ** 20:.1f} MiB"
+              + (f", peak RSS {rss / 2 ** 20:.1f} MiB" if rss is not None else ""), flush=True)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report(results), file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for regression in regressions:
+            case = ", ".join(f"{field}={value}" for field, value in regression["case"].items())
+            print(f"Regression in {regression['metric']} for {case}: "
+                  f"{regression['baseline']:.4g} -> {regression['current']:.4g}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import hashlib
+import json
+import os
+import sqlite3
+from collections import OrderedDict
+
+# Version of the results a simulation gives for a seed, part of every key. Bump it whenever a change alters the
+# results of any configuration, and every result cached by an older version stops matching and is dropped
+RESULTS_VERSION = 1
+
+# File the command line tools cache results in when --cache is given without a path
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "lunar_mining_simulation", "results.sqlite")
+
+# Access counter of the results table, a clock shared by every process using the file that never ties
+LAST_ACCESS = "(SELECT COALESCE(MAX(accessed), 0) + 1 FROM results)"
+
+
+def cache_key(kind: str, /, **settings) -> str:
+    """
+    Get the content address of a result, a SHA-256 over the results version, the kind of result and every
+    setting that determines it.
+
+    Settings that do not change results, such as the engine or the fleet storage, must be left out,
+    so a result computed one way answers requests made the other ways.
+
+    Args:
+        kind (str): What the result is, such as "run" or "replicate".
+        settings: JSON-serializable settings of the result, a SimulationConfig as its to_dict().
+
+    Returns:
+        hex digest
+    """
+    text = json.dumps({"version": RESULTS_VERSION, "kind": kind, "settings": settings}, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, path: str = None, memory_bytes: int = 64 << 20, disk_bytes: int = 1 << 30):
+        """
+        Initialize a cache of JSON-serializable results keyed by cache_key.
+
+        Results are kept in memory, least recently used first out, and with a path also in an sqlite file shared
+        by every process that opens it. Both tiers are bounded by the size of the encoded results, and the file
+        drops results of other results versions when it is opened.
+
+        Args:
+            path (str): sqlite file of the disk tier, results are only kept in memory without one.
+            memory_bytes (int): Most bytes of encoded results kept in memory.
+            disk_bytes (int): Most bytes of encoded results kept in the file.
+        """
+        if memory_bytes < 0 or disk_bytes < 0:
+            raise ValueError("Invalid value passed for cache size. Values must be >= 0")
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        # key -> (result, encoded size)
+        self.memory: OrderedDict[str, tuple[object, int]] = OrderedDict()
+        self.memory_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.connection: sqlite3.Connection = None
+        if path is not None:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.connection = sqlite3.connect(path)
+            self.connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, version INTEGER, "
+                                    "value BLOB, size INTEGER, accessed INTEGER)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            self.connection.execute("DELETE FROM results WHERE version != ?", (RESULTS_VERSION,))
+            self.connection.commit()
+
+    def get(self, key: str):
+        """
+        Get a cached result, or None when it is not cached
+        """
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return self.memory[key][0]
+        if self.connection is not None:
+            row = self.connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.connection.execute(f"UPDATE results SET accessed = {LAST_ACCESS} WHERE key = ?", (key,))
+                self.connection.commit()
+                self.hits += 1
+                result = json.loads(row[0])
+                self.remember(key, result, len(row[0]))
+                return result
+        self.misses += 1
+        return None
+
+    def put(self, key: str, result):
+        """
+        Cache a result in memory and, with a file, on disk
+        """
+        encoded = json.dumps(result).encode()
+        self.remember(key, result, len(encoded))
+        if self.connection is not None and len(encoded) <= self.disk_bytes:
+            self.connection.execute(f"INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, {LAST_ACCESS})",
+                                    (key, RESULTS_VERSION, encoded, len(encoded)))
+            self.evict()
+            self.connection.commit()
+
+    def remember(self, key: str, result, size: int):
+        """
+        Keep a result in memory, dropping the least recently used ones beyond memory_bytes
+        """
+        if key in self.memory:
+            self.memory_used -= self.memory.pop(key)[1]
+        if size > self.memory_bytes:
+            return
+        self.memory[key] = (result, size)
+        self.memory_used += size
+        while self.memory_used > self.memory_bytes:
+            self.memory_used -= self.memory.popitem(last=False)[1][1]
+
+    def evict(self):
+        """
+        Delete the least recently used results from the file until it holds at most disk_bytes
+        """
+        used = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if used <= self.disk_bytes:
+            return
+        for key, size in self.connection.execute("SELECT key, size FROM results ORDER BY accessed").fetchall():
+            self.connection.execute("DELETE FROM results WHERE key = ?", (key,))
+            used -= size
+            if used <= self.disk_bytes:
+                break
+
+    def __len__(self) -> int:
+        if self.connection is not None:
+            return self.connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return len(self.memory)
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,308 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import deque
+from simulation.config import SimulationConfig
+from simulation.fleet import TruckFleet
+from simulation.history import DownsampledHistory
+from simulation.rng import MASK64
+from simulation.run import LunarMiningSimulation
+
+# First bytes of every checkpoint file
+MAGIC = b"LMSCKPT\x00"
+
+# Version of the file layout, files of another version are rejected
+VERSION = 3
+
+# magic, version, flags, num_trucks, num_stations, seed, minute, random numbers drawn by the dispatch policy,
+# length of the JSON config section
+HEADER = struct.Struct("<8sIIQQQQQQ")
+
+# Header flag set when stations kept a queue length history
+FLAG_HISTORY = 1
+
+# Header flag set when the trucks drew from an antithetic load time stream
+FLAG_ANTITHETIC = 2
+
+# Every section starts at a multiple of this many bytes, so it can be viewed in place with the right alignment
+ALIGNMENT = 64
+
+
+def align(position: int) -> int:
+    """
+    Round a file position up to the next section boundary
+    """
+    return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+def write_array(file, values: array):
+    """
+    Write an array little-endian at the next section boundary
+    """
+    file.write(bytes(align(file.tell()) - file.tell()))
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    values.tofile(file)
+
+
+def save(simulation: LunarMiningSimulation, path: str):
+    """
+    Write the full state of a simulation to a checkpoint file.
+
+    The file holds a fixed header, then one aligned section per array: every fleet column, then the station
+    counters, queues, statistics and history, each list of variable length stored flat with an offsets array.
+    The config of the run is stored as JSON right after the header. Load times are drawn from a counter-based
+    stream, so the seed and each truck's num_loads are its whole random state, with the number of random
+    numbers the dispatch policy drew. The file is written next to path and renamed into place, so a run killed
+    while saving leaves the previous checkpoint intact.
+
+    Args:
+        simulation (LunarMiningSimulation): Simulation to save.
+        path (str): File to write.
+    """
+    fleet = simulation.fleet if simulation.fleet is not None else TruckFleet.from_trucks(simulation.trucks)
+    stations = simulation.stations
+    record_history = simulation.config.history != "none"
+    config = array('B', json.dumps(simulation.config.to_dict()).encode())
+
+    queue_offsets = array('q', [0])
+    queue = array('i')
+    histogram_offsets = array('q', [0])
+    histogram_buckets = array('q')
+    histogram_minutes = array('q')
+    history_offsets = array('q', [0])
+    history = array('q')
+    for station in stations:
+        queue.extend(station.truck_queue)
+        queue_offsets.append(len(queue))
+        for bucket in sorted(station.queue_stats.histogram):
+            histogram_buckets.append(bucket)
+            histogram_minutes.append(station.queue_stats.histogram[bucket])
+        histogram_offsets.append(len(histogram_buckets))
+        if record_history:
+            # Downsampled histories are stored as their sums, every other history as its values
+            values = station.queue_length_over_time
+            history.extend(values.sums if isinstance(values, DownsampledHistory) else array('q', values))
+            history_offsets.append(len(history))
+
+    flags = (FLAG_HISTORY if record_history else 0) | (FLAG_ANTITHETIC if simulation.load_times.antithetic else 0)
+    header = HEADER.pack(MAGIC, VERSION, flags, len(fleet), len(stations), simulation.seed & MASK64,
+                         simulation.minute, simulation.dispatcher.draws, len(config))
+    sections = [config] + list(fleet.columns()) + [
+        array('q', [station.num_trucks_unloaded for station in stations]),
+        queue_offsets, queue,
+        array('q', [station.queue_stats.count for station in stations]),
+        array('q', [station.queue_stats.total for station in stations]),
+        array('q', [station.queue_stats.total_of_squares for station in stations]),
+        array('q', [station.queue_stats.max for station in stations]),
+        histogram_offsets, histogram_buckets, histogram_minutes,
+    ]
+    if record_history:
+        sections += [history_offsets, history]
+    if simulation.config.history == "downsample":
+        sections += [array('q', [station.queue_length_over_time.resolution for station in stations]),
+                     array('q', [station.queue_length_over_time.minutes for station in stations])]
+
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(header)
+        for section in sections:
+            write_array(file, section)
+    os.replace(temporary, path)
+
+
+class CheckpointFile:
+    def __init__(self, path: str):
+        """
+        Open a checkpoint file memory-mapped, without reading its arrays.
+
+        view() gives zero-copy views of single sections, for analysing large fleets in place,
+        and load() builds a simulation from the whole file.
+
+        Args:
+            path (str): Checkpoint file to open.
+        """
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < HEADER.size:
+            self.close()
+            raise ValueError(f"Invalid value passed for checkpoint. {path} is not a checkpoint file")
+        (magic, self.version, flags, self.num_trucks, self.num_stations, self.seed, self.minute,
+         self.dispatch_draws, config_length) = HEADER.unpack_from(self.map)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"Invalid value passed for checkpoint. {path} is not a checkpoint file")
+        if self.version != VERSION:
+            self.close()
+            raise ValueError(f"Invalid value passed for checkpoint. Version {self.version} is not supported, "
+                             f"expected version {VERSION}")
+        self.record_history = bool(flags & FLAG_HISTORY)
+        self.antithetic = bool(flags & FLAG_ANTITHETIC)
+
+        # Locate every section, those of variable length are sized by the last entry of their offsets
+        self.sections: dict[str, tuple[int, str, int]] = {}
+        try:
+            self.position = align(HEADER.size)
+            self.add_section("config", "B", config_length)
+            self.config = SimulationConfig.from_dict(json.loads(self.array("config").tobytes()))
+            self.locate_sections()
+        except (struct.error, ValueError):
+            self.position = len(self.map) + ALIGNMENT
+        if self.position > align(len(self.map)):
+            self.close()
+            raise ValueError(f"Invalid value passed for checkpoint. {path} is truncated")
+
+    def locate_sections(self):
+        """
+        Find the start, type and length of every section after the config
+        """
+        for name, typecode in zip(TruckFleet.__slots__, ("b", "i", "i", "i", "i", "i", "i")):
+            self.add_section(name, typecode, self.num_trucks)
+        m = self.num_stations
+        self.add_section("num_trucks_unloaded", "q", m)
+        self.add_section("queue_offsets", "q", m + 1)
+        self.add_section("queue", "i", self.last("queue_offsets"))
+        for name in ("count", "total", "total_of_squares", "max"):
+            self.add_section(name, "q", m)
+        self.add_section("histogram_offsets", "q", m + 1)
+        self.add_section("histogram_buckets", "q", self.last("histogram_offsets"))
+        self.add_section("histogram_minutes", "q", self.last("histogram_offsets"))
+        if self.record_history:
+            self.add_section("history_offsets", "q", m + 1)
+            self.add_section("history", "q", self.last("history_offsets"))
+        if self.config.history == "downsample":
+            self.add_section("history_resolution", "q", m)
+            self.add_section("history_minutes", "q", m)
+
+    def add_section(self, name: str, typecode: str, count: int):
+        """
+        Record where the next section starts and move past it
+        """
+        self.sections[name] = (self.position, typecode, count)
+        self.position = align(self.position + count * array(typecode).itemsize)
+
+    def last(self, name: str) -> int:
+        """
+        Get the last entry of an int64 section without viewing it
+        """
+        start, _, count = self.sections[name]
+        return struct.unpack_from("<q", self.map, start + (count - 1) * 8)[0]
+
+    def view(self, name: str) -> memoryview:
+        """
+        Get a zero-copy view of a section, valid until the file is closed.
+
+        Args:
+            name (str): Section name, a TruckFleet column or a station section.
+        """
+        if sys.byteorder == "big":
+            raise ValueError("Invalid value passed for checkpoint. Sections can only be viewed in place "
+                             "on little-endian machines, use array() instead")
+        start, typecode, count = self.sections[name]
+        return memoryview(self.map)[start:start + count * array(typecode).itemsize].cast(typecode)
+
+    def array(self, name: str) -> array:
+        """
+        Copy a section into a new array
+        """
+        start, typecode, count = self.sections[name]
+        values = array(typecode)
+        with memoryview(self.map) as view:
+            with view[start:start + count * values.itemsize] as section:
+                values.frombytes(section)
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self) -> "CheckpointFile":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def load(path: str, seed: int = None, engine: str = "tick", dispatch: str = "indexed", fleet: str = "objects",
+         config: SimulationConfig = None, **kwargs) -> LunarMiningSimulation:
+    """
+    Build a simulation from a checkpoint file.
+
+    With the saved seed, running the loaded simulation continues the saved run exactly. With a new seed the
+    trucks and stations start from the saved state but draw their remaining load times from a new stream,
+    so many independent replicates can be forked from one warmed-up state.
+
+    Args:
+        path (str): Checkpoint file to read.
+        seed (int): Seed of the load times still to be drawn, defaults to the saved seed.
+        engine (str): Engine of the loaded simulation.
+        dispatch (str): Dispatcher of the loaded simulation.
+        fleet (str): How the loaded trucks are stored, "objects" or "arrays".
+        config (SimulationConfig): Config the run continues with, defaults to the saved config. Queue length
+            histories are only restored when the history settings are unchanged, otherwise they start empty.
+        kwargs: Other LunarMiningSimulation arguments, such as sink or instrumentation. The run stays antithetic
+            if it was saved antithetic, unless antithetic is given.
+
+    Returns:
+        Simulation at the saved minute
+    """
+    with CheckpointFile(path) as checkpoint:
+        columns = [checkpoint.array(name) for name in TruckFleet.__slots__]
+        loaded = TruckFleet(0)
+        for name, column in zip(TruckFleet.__slots__, columns):
+            setattr(loaded, name, column)
+
+        saved = checkpoint.config
+        config = config if config is not None else saved
+        kwargs.setdefault("antithetic", checkpoint.antithetic)
+        simulation = LunarMiningSimulation(checkpoint.num_trucks, checkpoint.num_stations, engine=engine,
+                                           dispatch=dispatch, seed=checkpoint.seed if seed is None else seed,
+                                           fleet=loaded if fleet == "arrays" else fleet, config=config, **kwargs)
+        simulation.minute = checkpoint.minute
+        simulation.dispatcher.draws = checkpoint.dispatch_draws
+        if simulation.fleet is None:
+            loaded.write_to(simulation.trucks)
+
+        unloaded = checkpoint.array("num_trucks_unloaded")
+        queue_offsets = checkpoint.array("queue_offsets")
+        queue = checkpoint.array("queue")
+        count, total, total_of_squares, maximum = (checkpoint.array(name)
+                                                    for name in ("count", "total", "total_of_squares", "max"))
+        histogram_offsets = checkpoint.array("histogram_offsets")
+        histogram_buckets = checkpoint.array("histogram_buckets")
+        histogram_minutes = checkpoint.array("histogram_minutes")
+        restore_history = checkpoint.record_history and all(
+            getattr(config, name) == getattr(saved, name)
+            for name in ("history", "history_window", "history_resolution", "history_points"))
+        if restore_history:
+            history_offsets = checkpoint.array("history_offsets")
+            history = checkpoint.array("history")
+        if restore_history and config.history == "downsample":
+            history_resolution = checkpoint.array("history_resolution")
+            history_minutes = checkpoint.array("history_minutes")
+
+    for s, station in enumerate(simulation.stations):
+        station.num_trucks_unloaded = unloaded[s]
+        station.truck_queue = deque(queue[queue_offsets[s]:queue_offsets[s + 1]])
+        stats = station.queue_stats
+        stats.count, stats.total, stats.total_of_squares, stats.max = count[s], total[s], total_of_squares[s], maximum[s]
+        start, stop = histogram_offsets[s], histogram_offsets[s + 1]
+        stats.histogram = dict(zip(histogram_buckets[start:stop], histogram_minutes[start:stop]))
+        if restore_history:
+            values = history[history_offsets[s]:history_offsets[s + 1]]
+            if config.history == "full":
+                station.queue_length_over_time = array('H' if max(values, default=0) < 1 << 16 else 'L', values)
+            elif config.history == "window":
+                station.queue_length_over_time.values.extend(values)
+            else:
+                station.queue_length_over_time.sums = values
+                station.queue_length_over_time.resolution = history_resolution[s]
+                station.queue_length_over_time.minutes = history_minutes[s]
+        # Queues were filled without the dispatcher seeing them
+        simulation.dispatcher.queue_changed(station)
+    return simulation
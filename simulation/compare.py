@@ -0,0 +1,128 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+from simulation.config import SimulationConfig, DEFAULT_CONFIG
+from simulation.dispatch import DISPATCHERS
+from simulation.run import ENGINES
+from simulation.stats import mean_confidence_interval
+from simulation.sweep import parse_range, replicate_seed, run_replicate
+
+# Values compared between policies, in the order of the results of run_replicate
+METRICS = ("deliveries", "queue_time")
+
+
+def run_policy(task: tuple) -> tuple:
+    """
+    Run one replicate of one policy in a worker.
+
+    Args:
+        task (tuple): (policy, num_trucks, num_stations, replicate, seed, engine, minutes, config)
+
+    Returns:
+        (policy, num_trucks, num_stations, replicate, deliveries, queue_time)
+    """
+    policy, num_trucks, num_stations, replicate, seed, engine, minutes, config = task
+    deliveries, queue_time = run_replicate(num_trucks, num_stations, seed, engine, minutes, policy, config)
+    return policy, num_trucks, num_stations, replicate, deliveries, queue_time
+
+
+def compare_policies(policies: list[str], trucks: list[int], stations: list[int], replicates: int, seed: int = 0,
+                     baseline: str = "indexed", engine: str = "event", minutes: int = None,
+                     workers: int = None, config: SimulationConfig = None) -> list[dict]:
+    """
+    Run every dispatch policy on every (num_trucks, num_stations) configuration with common random numbers.
+
+    Replicate r of every policy uses the same seed, so all policies see the same load times and each replicate
+    gives a paired difference from the baseline policy. The noise shared by a pair cancels out, so the
+    confidence interval of a paired difference is usually far narrower than the one of two independent runs,
+    which is reported next to it.
+
+    Args:
+        policies (list[str]): Names of the policies to compare, from DISPATCHERS.
+        trucks (list[int]): Truck counts to simulate.
+        stations (list[int]): Station counts to simulate.
+        replicates (int): Replicates of every policy and configuration.
+        seed (int): Seed of the whole comparison, every replicate derives its own seed from it.
+        baseline (str): Policy every other policy is compared against.
+        engine (str): Simulation engine used for every replicate.
+        minutes (int): Simulated minutes of every replicate, defaults to the horizon of the config.
+        workers (int): Worker processes, defaults to the number of CPUs. 1 runs everything in this process.
+        config (SimulationConfig): Durations and horizon of every replicate, defaults to the original
+            72 hour operation.
+
+    Returns:
+        one row per configuration and policy, with the mean and 95% confidence interval half width of each
+        metric, and of its paired and unpaired difference from the baseline
+    """
+    if replicates <= 0:
+        raise ValueError("Invalid value passed for number of replicates. Value must be > 0")
+    for policy in policies + [baseline]:
+        if policy not in DISPATCHERS:
+            raise ValueError(f"Invalid value passed for dispatch. Value must be one of {', '.join(DISPATCHERS)}")
+    if baseline not in policies:
+        policies = [baseline] + policies
+    tasks = [(policy, n, m, r, replicate_seed(seed, r), engine, minutes, config)
+             for n in trucks for m in stations for policy in policies for r in range(replicates)]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        results = list(map(run_policy, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run_policy, tasks, chunksize=max(1, len(tasks) // (workers * 8))))
+
+    # Results arrive in task order, so each list is in replicate order
+    values: dict[tuple, list[tuple[int, float]]] = {}
+    for policy, n, m, replicate, deliveries, queue_time in results:
+        values.setdefault((n, m, policy), []).append((deliveries, queue_time))
+
+    rows = []
+    for n in trucks:
+        for m in stations:
+            reference = values[(n, m, baseline)]
+            for policy in policies:
+                row = {"num_trucks": n, "num_stations": m, "policy": policy}
+                for index, metric in enumerate(METRICS):
+                    own = [value[index] for value in values[(n, m, policy)]]
+                    base = [value[index] for value in reference]
+                    row[f"{metric}_mean"], row[f"{metric}_ci"] = mean_confidence_interval(own)
+                    differences = [a - b for a, b in zip(own, base)]
+                    row[f"{metric}_diff"], row[f"{metric}_diff_ci"] = mean_confidence_interval(differences)
+                    # Half width the difference would have if the two policies were run on independent streams
+                    row[f"{metric}_diff_ci_unpaired"] = (row[f"{metric}_ci"] ** 2
+                                                         + mean_confidence_interval(base)[1] ** 2) ** 0.5
+                rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='LunarMiningPolicyComparison',
+        description='Compares dispatch policies on common random numbers over a grid of truck and station counts'
+    )
+    parser.add_argument('--trucks', type=parse_range, required=True, help='truck counts, e.g. 10, 5,10,20 or 5:50:5')
+    parser.add_argument('--stations', type=parse_range, required=True, help='station counts, same format as --trucks')
+    parser.add_argument('--policies', nargs='+', choices=list(DISPATCHERS), default=list(DISPATCHERS))
+    parser.add_argument('--baseline', choices=list(DISPATCHERS), default="indexed")
+    parser.add_argument('--replicates', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', choices=ENGINES, default="event")
+    parser.add_argument('--minutes', type=int, default=None, help='simulated minutes, overrides the config horizon')
+    parser.add_argument('--config', metavar='FILE', default=None,
+                        help='TOML file with the horizon and durations of every replicate')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    config = SimulationConfig.from_toml(args.config) if args.config else DEFAULT_CONFIG
+
+    rows = compare_policies(args.policies, args.trucks, args.stations, args.replicates, seed=args.seed,
+                            baseline=args.baseline, engine=args.engine, minutes=args.minutes, workers=args.workers,
+                            config=config)
+    header = list(rows[0])
+    print(",".join(header))
+    for row in rows:
+        print(",".join(row[key] if isinstance(row[key], str) else str(row[key]) if isinstance(row[key], int)
+                       else f"{row[key]:.3f}" for key in header))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import dataclasses
+from array import array
+from dataclasses import dataclass
+from functools import cached_property
+from simulation.history import DownsampledHistory, WindowHistory
+
+# Ways of keeping each station's queue length history, selectable with --history
+HISTORY_MODES = ("none", "full", "window", "downsample")
+
+
+@dataclass(frozen=True)
+class TruckClass:
+    """
+    Parameters of one class of trucks, settings left as None take the value of the config.
+
+    Args:
+        name (str): Name of the class.
+        weight (int): Share of the fleet in this class, relative to the weights of the other classes.
+        load_min (int): Shortest load time.
+        load_max (int): Longest load time.
+        travel_minutes (int): Drive between a mining site and the stations, each way.
+    """
+    name: str = ""
+    weight: int = 1
+    load_min: int = None
+    load_max: int = None
+    travel_minutes: int = None
+
+
+@dataclass(frozen=True)
+class StationClass:
+    """
+    Parameters of one class of stations, settings left as None take the value of the config.
+
+    Args:
+        name (str): Name of the class.
+        weight (int): Share of the stations in this class, relative to the weights of the other classes.
+        unload_minutes (int): Time to unload in a bay.
+        bays (int): Trucks unloading at the same time, the first bays trucks of the queue.
+    """
+    name: str = ""
+    weight: int = 1
+    unload_minutes: int = None
+    bays: int = 1
+
+
+def fill_in(c, defaults: dict):
+    """
+    Get a copy of a TruckClass or StationClass with the settings it leaves as None taken from defaults
+    """
+    return dataclasses.replace(c, **{name: value for name, value in defaults.items() if getattr(c, name) is None})
+
+
+def class_indices(classes: tuple, count: int) -> array:
+    """
+    Assign count trucks or stations to classes in contiguous blocks of ids sized by the class weights.
+
+    Args:
+        classes (tuple): TruckClass or StationClass of every class.
+        count (int): Number of trucks or stations.
+
+    Returns:
+        array with the index of the class of every truck or station
+    """
+    indices = array('i')
+    for index, size in enumerate(class_counts(classes, count)):
+        indices.extend(array('i', [index]) * size)
+    return indices
+
+
+def class_counts(classes: tuple, count: int) -> list[int]:
+    """
+    Get the number of trucks or stations class_indices assigns to each class, without listing them.
+    """
+    total = sum(c.weight for c in classes)
+    counts = []
+    start = cumulative = 0
+    for c in classes:
+        cumulative += c.weight
+        stop = round(count * cumulative / total)
+        counts.append(stop - start)
+        start = stop
+    return counts
+
+
+@dataclass(frozen=True)
+class SimulationConfig:
+    """
+    Horizon, durations and history settings of a simulation.
+
+    Durations are in minutes. Load times are drawn uniformly between load_min and load_max inclusive,
+    travel takes travel_minutes each way and unloading takes unload_minutes.
+
+    A fleet mixing kinds of trucks or stations lists them in truck_classes and station_classes, each class
+    overriding some of these durations, and stations with bays unloading several trucks at once. Trucks and
+    stations are split between the classes by weight, in blocks of consecutive ids, see truck_class_indices.
+
+    Args:
+        horizon_minutes (int): Minutes simulated by run().
+        load_min (int): Shortest load time.
+        load_max (int): Longest load time.
+        travel_minutes (int): Drive between a mining site and the stations, each way.
+        unload_minutes (int): Time to unload at the head of a queue.
+        history (str): Queue length history kept by every station. "none" keeps only running statistics,
+            "full" every minute, "window" the last history_window minutes, and "downsample" the mean of every
+            history_resolution minutes, merged into coarser means to stay within history_points values.
+        history_window (int): Minutes kept by the "window" history.
+        history_resolution (int): Minutes averaged into one value by the "downsample" history.
+        history_points (int): Most values kept by the "downsample" history.
+        truck_classes (tuple[TruckClass]): Classes of trucks, or dicts of their settings. Every truck uses the
+            durations above without any.
+        station_classes (tuple[StationClass]): Classes of stations, or dicts of their settings. Every station
+            has a single bay and the unload time above without any.
+    """
+    horizon_minutes: int = 72 * 60
+    load_min: int = 1 * 60
+    load_max: int = 5 * 60
+    travel_minutes: int = 30
+    unload_minutes: int = 5
+    history: str = "none"
+    history_window: int = 24 * 60
+    history_resolution: int = 60
+    history_points: int = 1024
+    truck_classes: tuple = ()
+    station_classes: tuple = ()
+
+    def __post_init__(self):
+        for field in dataclasses.fields(self):
+            value = getattr(self, field.name)
+            if field.type in (int, "int") and (not isinstance(value, int) or isinstance(value, bool)):
+                raise ValueError(f"Invalid value passed for {field.name}. Value must be an integer")
+        if self.horizon_minutes < 0:
+            raise ValueError("Invalid value passed for horizon. Value must be >= 0")
+        if not 0 < self.load_min <= self.load_max:
+            raise ValueError("Invalid value passed for load time. Values must be 0 < load_min <= load_max")
+        if self.travel_minutes <= 0:
+            raise ValueError("Invalid value passed for travel time. Value must be > 0")
+        if self.unload_minutes <= 0:
+            raise ValueError("Invalid value passed for unload time. Value must be > 0")
+        if not isinstance(self.history, str) or self.history not in HISTORY_MODES:
+            raise ValueError(f"Invalid value passed for history. Value must be one of {', '.join(HISTORY_MODES)}")
+        if self.history_window <= 0 or self.history_resolution <= 0:
+            raise ValueError("Invalid value passed for history window or resolution. Values must be > 0")
+        if self.history_points < 2 or self.history_points % 2:
+            raise ValueError("Invalid value passed for history points. Value must be an even number >= 2")
+        # Classes read from TOML or JSON are dicts, frozen fields can only be converted through object
+        for name, kind in (("truck_classes", TruckClass), ("station_classes", StationClass)):
+            classes = getattr(self, name)
+            if not isinstance(classes, (tuple, list)):
+                raise ValueError(f"Invalid value passed for {name}. Value must be a list of classes")
+            try:
+                classes = tuple(c if isinstance(c, kind) else kind(**c) for c in classes)
+            except TypeError:
+                raise ValueError(f"Invalid value passed for {name}. Classes take the settings "
+                                 f"{', '.join(field.name for field in dataclasses.fields(kind))}") from None
+            object.__setattr__(self, name, classes)
+        for c in self.truck_table + self.station_table:
+            for field in dataclasses.fields(c):
+                value = getattr(c, field.name)
+                if field.name != "name" and (not isinstance(value, int) or isinstance(value, bool) or value <= 0):
+                    raise ValueError(f"Invalid value passed for {field.name} of class {c.name!r}. "
+                                     f"Value must be an integer > 0")
+            if isinstance(c, TruckClass) and c.load_min > c.load_max:
+                raise ValueError(f"Invalid value passed for load time of class {c.name!r}. "
+                                 f"Values must be 0 < load_min <= load_max")
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "SimulationConfig":
+        """
+        Create a config from a dict of field values, missing fields keep their defaults.
+
+        A horizon can also be given in days with horizon_days.
+        """
+        values = dict(values)
+        if "horizon_days" in values:
+            values["horizon_minutes"] = int(values.pop("horizon_days") * 24 * 60)
+        fields = {field.name for field in dataclasses.fields(cls)}
+        unknown = set(values) - fields
+        if unknown:
+            raise ValueError(f"Invalid value passed for config. Unknown settings {', '.join(sorted(unknown))}")
+        return cls(**values)
+
+    @classmethod
+    def from_toml(cls, path: str) -> "SimulationConfig":
+        """
+        Load a config from a TOML file, with settings at the top level or in a [simulation] table.
+
+        Uses tomllib, or the tomli package before Python 3.11.
+        """
+        try:
+            import tomllib
+        except ImportError:
+            import tomli as tomllib
+        with open(path, "rb") as file:
+            values = tomllib.load(file)
+        return cls.from_dict(values.get("simulation", values))
+
+    def to_dict(self) -> dict:
+        values = dataclasses.asdict(self)
+        values["truck_classes"] = list(values["truck_classes"])
+        values["station_classes"] = list(values["station_classes"])
+        return values
+
+    @cached_property
+    def truck_table(self) -> tuple:
+        """
+        Parameter table of the truck classes with every setting filled in, indexed by class.
+        A config without truck classes has a single class with its own durations.
+        """
+        defaults = {"load_min": self.load_min, "load_max": self.load_max, "travel_minutes": self.travel_minutes}
+        return tuple(fill_in(c, defaults) for c in self.truck_classes or (TruckClass(),))
+
+    @cached_property
+    def station_table(self) -> tuple:
+        """
+        Parameter table of the station classes with every setting filled in, indexed by class.
+        A config without station classes has a single class of one bay stations with its unload time.
+        """
+        defaults = {"unload_minutes": self.unload_minutes}
+        return tuple(fill_in(c, defaults) for c in self.station_classes or (StationClass(),))
+
+    def truck_class_indices(self, num_trucks: int) -> array:
+        """
+        Get the index in truck_table of the class of every truck
+        """
+        return class_indices(self.truck_table, num_trucks)
+
+    def station_class_indices(self, num_stations: int) -> array:
+        """
+        Get the index in station_table of the class of every station
+        """
+        return class_indices(self.station_table, num_stations)
+
+    def replace(self, **changes) -> "SimulationConfig":
+        """
+        Get a copy with some settings changed, settings given as None are left as they are
+        """
+        return dataclasses.replace(self, **{name: value for name, value in changes.items() if value is not None})
+
+    def new_history(self):
+        """
+        Create an empty queue length history for one station, None when no history is kept
+        """
+        if self.history == "full":
+            return array('H')
+        if self.history == "window":
+            return WindowHistory(self.history_window)
+        if self.history == "downsample":
+            return DownsampledHistory(self.history_resolution, self.history_points)
+        return None
+
+
+# Settings of the original 72 hour operation
+DEFAULT_CONFIG = SimulationConfig()
@@ -0,0 +1,278 @@
+import heapq
+import math
+from functools import reduce
+from simulation.rng import derive_seed, mix64
+from simulation.station import MiningUnloadStation
+
+
+class DispatchPolicy:
+    def __init__(self, stations: list[MiningUnloadStation], seed: int = 0):
+        """
+        Initialize a dispatch policy, which picks the station each arriving truck queues at.
+
+        The simulation calls select() once per arriving truck, in truck id order within a minute on every engine,
+        and stations call queue_changed() whenever their queue grows or shrinks. Policies that need randomness
+        draw from a counter-based stream of the simulation seed, so a run is reproducible, engines agree,
+        and every policy sees the same load times for the same seed.
+
+        Args:
+            stations (list[MiningUnloadStation]): Stations to choose from, indexed by station id.
+            seed (int): Seed of the simulation.
+        """
+        self.stations = stations
+        self.key = mix64(derive_seed(seed, "dispatch"))
+        # Random numbers or turns used so far, saved in checkpoints so resumed runs continue the same sequence
+        self.draws = 0
+
+    def random_index(self, n: int) -> int:
+        """
+        Draw a station index below n from the policy's stream
+        """
+        value = mix64(self.key ^ self.draws)
+        self.draws += 1
+        return value % n
+
+    def queue_changed(self, station: MiningUnloadStation):
+        """
+        Called by a station whenever its queue changes, policies without an index have nothing to update.
+        """
+
+    def select(self, truck_id: int = None) -> MiningUnloadStation:
+        """
+        Pick the station an arriving truck queues at.
+
+        Args:
+            truck_id (int): ID of the arriving truck.
+        """
+        raise NotImplementedError
+
+
+class LinearShortestQueue(DispatchPolicy):
+    def __init__(self, stations: list[MiningUnloadStation], seed: int = 0):
+        """
+        Initialize a dispatcher that scans every station for the shortest queue.
+
+        Args:
+            stations (list[MiningUnloadStation]): Stations to choose from, indexed by station id.
+            seed (int): Seed of the simulation, unused.
+        """
+        super().__init__(stations, seed)
+
+    def select(self, truck_id: int = None) -> MiningUnloadStation:
+        """
+        Find the station with the shortest queue, the fewest trucks waiting for a bay,
+        the lowest station id wins a tie.
+
+        Return:
+            Mining Unload Station with the shortest queue
+        """
+        shortest_queue_station = self.stations[0]
+        for station in self.stations:
+            if station.get_backlog() < shortest_queue_station.get_backlog():
+                shortest_queue_station = station
+        return shortest_queue_station
+
+
+class IndexedShortestQueue(DispatchPolicy):
+    def __init__(self, stations: list[MiningUnloadStation], seed: int = 0):
+        """
+        Initialize a dispatcher that keeps stations in a min-heap keyed on (queue length, station id),
+        the queue length less the station's bays beyond the first, so stations with more bays take longer queues.
+
+        Stations push a fresh entry every time their queue changes and outdated entries are discarded
+        lazily when they reach the top of the heap, so finding the shortest queue is O(log M).
+        An entry is current when its length equals the station's queue length. Queues that grew without
+        notifying the index are still handled, their outdated entry surfaces early and is replaced.
+
+        Args:
+            stations (list[MiningUnloadStation]): Stations to choose from, indexed by station id.
+            seed (int): Seed of the simulation, unused.
+        """
+        super().__init__(stations, seed)
+        self.weights = [self.weight(station) for station in stations]
+        self.extra_bays = [station.bays - 1 for station in stations]
+        self.rebuild()
+
+    def weight(self, station: MiningUnloadStation) -> int:
+        """
+        Get what each truck in a station's queue adds to its cost, 1 so stations are ranked by queue length
+        """
+        return 1
+
+    def cost(self, station: MiningUnloadStation) -> int:
+        """
+        Get the value stations are ranked by, the queue length less the bays beyond the first, times the station's
+        weight. It may only grow as the queue grows.
+        queue_changed and select compute it inline, they run for every truck.
+        """
+        return (len(station.truck_queue) - self.extra_bays[station.station_id]) * self.weights[station.station_id]
+
+    def rebuild(self):
+        """
+        Rebuild the heap from the current queue lengths, dropping every outdated entry.
+        """
+        self.heap = [(self.cost(station), station.station_id) for station in self.stations]
+        heapq.heapify(self.heap)
+
+    def queue_changed(self, station: MiningUnloadStation):
+        """
+        Record the new queue length of a station.
+
+        Args:
+            station: Mining Unload Station whose queue just changed
+        """
+        station_id = station.station_id
+        heapq.heappush(self.heap, ((len(station.truck_queue) - self.extra_bays[station_id]) *
+                                   self.weights[station_id], station_id))
+        if len(self.heap) > 4 * len(self.stations) + 64:
+            # Too many outdated entries have piled up
+            self.rebuild()
+
+    def select(self, truck_id: int = None) -> MiningUnloadStation:
+        """
+        Find the station with the shortest queue, the lowest station id wins a tie.
+
+        Return:
+            Mining Unload Station with the shortest queue
+        """
+        heap = self.heap
+        stations = self.stations
+        weights = self.weights
+        extra_bays = self.extra_bays
+        while True:
+            length, station_id = heap[0]
+            actual = (len(stations[station_id].truck_queue) - extra_bays[station_id]) * weights[station_id]
+            if actual == length:
+                return stations[station_id]
+            if actual > length:
+                # The queue grew without notifying the index, replace the entry with its real length
+                heapq.heapreplace(heap, (actual, station_id))
+            else:
+                heapq.heappop(heap)
+
+
+class ShortestExpectedWait(IndexedShortestQueue):
+    def __init__(self, stations: list[MiningUnloadStation], seed: int = 0):
+        """
+        Initialize a dispatcher that picks the station where an arriving truck would wait the least,
+        the trucks ahead of it that hold or wait for its bay times the station's unload time per bay, kept in the
+        same lazy heap as IndexedShortestQueue.
+
+        Args:
+            stations (list[MiningUnloadStation]): Stations to choose from, indexed by station id.
+            seed (int): Seed of the simulation, unused.
+        """
+        # Unload times per bay are scaled by the least common multiple of the bays to stay integers
+        self.bays_multiple = reduce(lambda a, b: a * b // math.gcd(a, b), (station.bays for station in stations), 1)
+        super().__init__(stations, seed)
+
+    def weight(self, station: MiningUnloadStation) -> int:
+        return station.unload_minutes * self.bays_multiple // station.bays
+
+
+class JoinIdleQueue(DispatchPolicy):
+    def __init__(self, stations: list[MiningUnloadStation], seed: int = 0):
+        """
+        Initialize a dispatcher that sends a truck to an idle station, one with a free bay, the lowest id first,
+        or to a random station when every station is busy.
+
+        Stations that become idle are pushed on a heap of ids, and entries of stations that have become
+        busy again are dropped lazily, so a selection is O(log M).
+
+        Args:
+            stations (list[MiningUnloadStation]): Stations to choose from, indexed by station id.
+            seed (int): Seed of the random choice between busy stations.
+        """
+        super().__init__(stations, seed)
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Rebuild the heap of idle stations, dropping every outdated entry.
+        """
+        self.idle = [station.station_id for station in self.stations if station.get_backlog() < 0]
+
+    def queue_changed(self, station: MiningUnloadStation):
+        if station.get_backlog() < 0:
+            heapq.heappush(self.idle, station.station_id)
+            if len(self.idle) > 2 * len(self.stations) + 64:
+                self.rebuild()
+
+    def select(self, truck_id: int = None) -> MiningUnloadStation:
+        idle = self.idle
+        stations = self.stations
+        while idle:
+            station = stations[idle[0]]
+            if station.get_backlog() < 0:
+                return station
+            heapq.heappop(idle)
+        return stations[self.random_index(len(stations))]
+
+
+class PowerOfTwoChoices(DispatchPolicy):
+    def __init__(self, stations: list[MiningUnloadStation], seed: int = 0):
+        """
+        Initialize a dispatcher that samples two different stations at random and picks the shorter queue,
+        the lower station id on a tie. A selection is O(1).
+
+        Args:
+            stations (list[MiningUnloadStation]): Stations to choose from, indexed by station id.
+            seed (int): Seed of the random samples.
+        """
+        super().__init__(stations, seed)
+
+    def select(self, truck_id: int = None) -> MiningUnloadStation:
+        stations = self.stations
+        if len(stations) == 1:
+            return stations[0]
+        first = self.random_index(len(stations))
+        # Draw from the other M - 1 stations, so the two samples differ
+        second = (first + 1 + self.random_index(len(stations) - 1)) % len(stations)
+        a, b = stations[min(first, second)], stations[max(first, second)]
+        return b if b.get_backlog() < a.get_backlog() else a
+
+
+class RoundRobin(DispatchPolicy):
+    def __init__(self, stations: list[MiningUnloadStation], seed: int = 0):
+        """
+        Initialize a dispatcher that sends arriving trucks to each station in turn. A selection is O(1).
+
+        Args:
+            stations (list[MiningUnloadStation]): Stations to choose from, indexed by station id.
+            seed (int): Seed of the simulation, unused.
+        """
+        super().__init__(stations, seed)
+
+    def select(self, truck_id: int = None) -> MiningUnloadStation:
+        station = self.stations[self.draws % len(self.stations)]
+        self.draws += 1
+        return station
+
+
+class Affinity(DispatchPolicy):
+    def __init__(self, stations: list[MiningUnloadStation], seed: int = 0):
+        """
+        Initialize a dispatcher that always sends a truck to the same station, truck_id mod M. A selection is O(1).
+
+        Args:
+            stations (list[MiningUnloadStation]): Stations to choose from, indexed by station id.
+            seed (int): Seed of the simulation, unused.
+        """
+        super().__init__(stations, seed)
+
+    def select(self, truck_id: int = None) -> MiningUnloadStation:
+        if truck_id is None:
+            raise ValueError("Invalid value passed for truck id. The affinity policy needs the arriving truck")
+        return self.stations[truck_id % len(self.stations)]
+
+
+# Dispatchers that can assign arriving trucks, selectable with --dispatch
+DISPATCHERS = {
+    "indexed": IndexedShortestQueue,
+    "linear": LinearShortestQueue,
+    "expected-wait": ShortestExpectedWait,
+    "idle": JoinIdleQueue,
+    "two-choices": PowerOfTwoChoices,
+    "round-robin": RoundRobin,
+    "affinity": Affinity,
+}
@@ -0,0 +1,369 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+from itertools import islice
+from simulation.checkpoint import align, write_array
+from simulation.config import SimulationConfig
+from simulation.fleet import TruckFleet, NO_STATION
+from simulation.rng import MASK64
+from simulation.station import MiningUnloadStation
+from simulation.sweep import parse_range
+from simulation.truck import TruckState, QUEUED, UNLOADING, STATION_TO_SITE, LOADING
+
+# First bytes of every event log
+MAGIC = b"LMSEVLOG"
+
+# Version of the file layout, logs of another version are rejected
+VERSION = 1
+
+# magic, version, num_trucks, num_stations, seed, minutes between index checkpoints, first and last minute logged,
+# number of index checkpoints, offset of the index, length of the JSON config section
+HEADER = struct.Struct("<8sIQQQQQQQQQ")
+
+# One fixed-width record per event: minute, truck id, station id or NO_STATION, minutes required in the state
+# the truck entered, and that state
+RECORD = struct.Struct("<IIiiB3x")
+
+# Simulated minutes between index checkpoints by default
+DEFAULT_INTERVAL = 60
+
+# One event of a log, the truck entered state in minute, at station_id when it joined, waits at or left a station
+EventRecord = namedtuple("EventRecord", ["minute", "truck_id", "state", "station_id", "minutes_required"])
+
+
+def logged_ticks(simulation, records: list):
+    """
+    Run the tick loop over simulation_minutes, packing a record for every event into records.
+
+    A truck that changes state gets a record of the state it entered. Trucks joining a queue are recorded once
+    assigned, as QUEUED or UNLOADING at their station, and trucks leaving a station as STATION_TO_SITE at the
+    station they left. Trucks a station moves from the line into a freed bay are recorded as UNLOADING after
+    every truck of the minute.
+    """
+    pack = RECORD.pack
+    trucks = simulation.trucks
+    start = simulation.minute
+    for minute in range(start, start + simulation.simulation_minutes):
+        for truck in trucks:
+            state = truck.state
+            station_id = truck.station_id
+            truck.tick()
+            if truck.needs_unload_station():
+                simulation.assign_truck_to_station(truck)
+                station_id = truck.station_id
+            elif truck.state is state:
+                continue
+            records.append(pack(minute, truck.truck_id, NO_STATION if station_id is None else station_id,
+                                truck.minutes_required_in_state, truck.state))
+
+        for station in simulation.stations:
+            queue = station.truck_queue
+            length = len(queue)
+            station.process_queue(trucks)
+            unloaded = length - len(queue)
+            if unloaded:
+                # Trucks that moved up past the last bay were waiting and are now unloading
+                for i in islice(queue, max(0, station.bays - unloaded), station.bays):
+                    records.append(pack(minute, i, station.station_id, trucks[i].minutes_required_in_state,
+                                        UNLOADING))
+
+
+class EventLogWriter:
+    def __init__(self, path: str, simulation, interval: int = None):
+        """
+        Initialize a writer that logs every event of a simulation's run to a compact binary file.
+
+        The log starts at the simulation's current minute. Every interval minutes it writes an index checkpoint,
+        the state of every truck and station queue, followed by the fixed-width records of the events until the
+        next one. An index of the checkpoints is written when the writer is closed, so EventLogFile can replay
+        the state of any logged minute from the checkpoint before it. The file is written next to path and
+        renamed into place when closed.
+
+        Args:
+            path (str): File to write.
+            simulation (LunarMiningSimulation): Simulation whose run is logged, its trucks must be objects.
+            interval (int): Simulated minutes between index checkpoints, DEFAULT_INTERVAL by default.
+        """
+        if interval is not None and interval <= 0:
+            raise ValueError("Invalid value passed for event log interval. Value must be > 0")
+        self.path = path
+        self.simulation = simulation
+        self.interval = interval or DEFAULT_INTERVAL
+        self.start = simulation.minute
+        # Minute, offset of the checkpoint and offsets of its first record and of the end of its records,
+        # for every index checkpoint
+        self.index = array('q')
+        self.config = array('B', json.dumps(simulation.config.to_dict()).encode())
+        self.file = open(path + ".tmp", "w+b")
+        self.file.write(bytes(HEADER.size))
+        write_array(self.file, self.config)
+        self.write_checkpoint()
+
+    def advance(self, simulation):
+        """
+        Advance the simulation over its simulation_minutes with the logged tick loop, after an index checkpoint
+        when the period starts on one.
+        """
+        if simulation.minute > self.start and (simulation.minute - self.start) % self.interval == 0:
+            self.write_checkpoint()
+        records = []
+        logged_ticks(simulation, records)
+        self.file.write(b"".join(records))
+
+    def write_checkpoint(self):
+        """
+        Write the state of every truck and station queue at the simulation's current minute
+        """
+        simulation = self.simulation
+        fleet = TruckFleet.from_trucks(simulation.trucks)
+        stations = simulation.stations
+        queue_offsets = array('q', [0])
+        queue = array('i')
+        for station in stations:
+            queue.extend(station.truck_queue)
+            queue_offsets.append(len(queue))
+        if self.index:
+            # Records of the previous checkpoint end here
+            self.index.append(self.file.tell())
+        self.index.extend((simulation.minute, align(self.file.tell())))
+        for section in fleet.columns() + (array('q', [station.num_trucks_unloaded for station in stations]),
+                                          queue_offsets, queue):
+            write_array(self.file, section)
+        self.index.append(self.file.tell())
+
+    def close(self):
+        """
+        Write the index and the header, and move the log into place
+        """
+        simulation = self.simulation
+        self.index.append(self.file.tell())
+        index_offset = align(self.file.tell())
+        write_array(self.file, self.index)
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, len(simulation.trucks), len(simulation.stations),
+                                    simulation.seed & MASK64, self.interval, self.start, simulation.minute,
+                                    len(self.index) // 4, index_offset, len(self.config)))
+        self.file.close()
+        os.replace(self.path + ".tmp", self.path)
+
+
+class EventLogFile:
+    def __init__(self, path: str):
+        """
+        Open an event log memory-mapped, without reading its records.
+
+        Args:
+            path (str): Event log to open.
+        """
+        with open(path, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.map) < HEADER.size or HEADER.unpack_from(self.map)[0] != MAGIC:
+            self.close()
+            raise ValueError(f"Invalid value passed for event log. {path} is not an event log")
+        (_, version, self.num_trucks, self.num_stations, self.seed, self.interval, self.start, self.end,
+         checkpoints, index_offset, config_length) = HEADER.unpack_from(self.map)
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"Invalid value passed for event log. Version {version} is not supported, "
+                             f"expected version {VERSION}")
+        if index_offset + checkpoints * 4 * 8 > len(self.map):
+            self.close()
+            raise ValueError(f"Invalid value passed for event log. {path} is truncated")
+        config, _ = self.read(align(HEADER.size), "B", config_length)
+        self.config = SimulationConfig.from_dict(json.loads(config.tobytes()))
+        index, _ = self.read(index_offset, "q", checkpoints * 4)
+        # Minute of every index checkpoint, with the offsets of the checkpoint and of the start and end of
+        # its records
+        self.minutes = index[0::4]
+        self.checkpoints = index[1::4]
+        self.record_offsets = index[2::4]
+        self.record_ends = index[3::4]
+
+    def read(self, position: int, typecode: str, count: int) -> tuple[array, int]:
+        """
+        Copy an array written at the next section boundary from position.
+
+        Returns:
+            (the array, the position right after it)
+        """
+        values = array(typecode)
+        start = align(position)
+        with memoryview(self.map) as view:
+            with view[start:start + count * values.itemsize] as section:
+                values.frombytes(section)
+        if sys.byteorder == "big":
+            values.byteswap()
+        return values, start + count * values.itemsize
+
+    def check_minute(self, minute: int):
+        """
+        Check a minute was logged
+        """
+        if not self.start <= minute <= self.end:
+            raise ValueError(f"Invalid value passed for minute. Value must be between {self.start} and {self.end}")
+
+    def raw_records(self, checkpoint: int):
+        """
+        Iterate the records after an index checkpoint as tuples of RECORD's fields
+        """
+        with memoryview(self.map) as view:
+            with view[self.record_offsets[checkpoint]:self.record_ends[checkpoint]] as records:
+                yield from RECORD.iter_unpack(records)
+
+    def records(self, start: int = None, stop: int = None):
+        """
+        Iterate the events from minute start up to minute stop, seeking to the index checkpoint before start.
+
+        Args:
+            start (int): First minute, the first logged minute by default.
+            stop (int): Minute after the last one, the end of the log by default.
+
+        Yields:
+            EventRecord of every event in the order they happened
+        """
+        start = self.start if start is None else start
+        stop = self.end if stop is None else stop
+        self.check_minute(start)
+        states = list(TruckState)
+        for checkpoint in range(max(0, bisect_right(self.minutes, start) - 1), len(self.minutes)):
+            if self.minutes[checkpoint] >= stop:
+                return
+            for minute, truck_id, station_id, required, state in self.raw_records(checkpoint):
+                if minute >= stop:
+                    return
+                if minute >= start:
+                    yield EventRecord(minute, truck_id, states[state], None if station_id == NO_STATION else station_id,
+                                      required)
+
+    def state_at(self, minute: int) -> tuple[TruckFleet, list[MiningUnloadStation]]:
+        """
+        Rebuild the state of every truck and station after minute simulated minutes, as a run with that horizon
+        would leave it.
+
+        Starts from the index checkpoint at or before minute and applies the records after it, so at most
+        interval minutes of events are replayed whatever the minute.
+
+        Returns:
+            (fleet of every truck, stations with their queues and unloaded trucks), queue statistics are not logged
+        """
+        self.check_minute(minute)
+        checkpoint = bisect_right(self.minutes, minute) - 1
+        start = self.minutes[checkpoint]
+        position = self.checkpoints[checkpoint]
+        columns = []
+        for typecode in ("b", "i", "i", "i", "i", "i", "i"):
+            column, position = self.read(position, typecode, self.num_trucks)
+            columns.append(column.tolist())
+        state, elapsed, required, station_of, delivered, queued_time, num_loads = columns
+        unloaded, position = self.read(position, "q", self.num_stations)
+        queue_offsets, position = self.read(position, "q", self.num_stations + 1)
+        queue, position = self.read(position, "i", queue_offsets[-1])
+
+        config = self.config
+        stations = []
+        for s, c in enumerate(config.station_class_indices(self.num_stations)):
+            station_class = config.station_table[c]
+            station = MiningUnloadStation(s, unload_minutes=station_class.unload_minutes, bays=station_class.bays)
+            station.truck_queue.extend(queue[queue_offsets[s]:queue_offsets[s + 1]])
+            station.num_trucks_unloaded = unloaded[s]
+            stations.append(station)
+
+        # A truck that entered its state in minute x has spent minute - 1 - x minutes in it, and a queued truck
+        # has waited every minute from queued_since on top of queued_time
+        entered = [start - 1 - e for e in elapsed]
+        queued_since = [start] * self.num_trucks
+        for x, i, s, minutes, new in self.raw_records(checkpoint):
+            if x >= minute:
+                break
+            if state[i] == QUEUED:
+                # Moved from the line into a bay after waiting during minute x
+                queued_time[i] += x + 1 - queued_since[i]
+            elif new == QUEUED or new == UNLOADING:
+                # Joined the queue of station s
+                stations[s].truck_queue.append(i)
+            if new == QUEUED:
+                queued_since[i] = x + 1
+            elif new == STATION_TO_SITE:
+                # Unloaded, the station's line moves at the end of the minute
+                delivered[i] += 1
+                stations[s].truck_queue.popleft()
+                stations[s].num_trucks_unloaded += 1
+            elif new == LOADING:
+                num_loads[i] += 1
+            state[i] = new
+            entered[i] = x
+            required[i] = minutes
+            station_of[i] = s if new == QUEUED or new == UNLOADING else NO_STATION
+
+        for i in range(self.num_trucks):
+            if state[i] == QUEUED:
+                elapsed[i] = 0
+                queued_time[i] += minute - queued_since[i]
+            else:
+                elapsed[i] = minute - 1 - entered[i]
+        fleet = TruckFleet(0)
+        for name, typecode, values in zip(TruckFleet.__slots__, ("b", "i", "i", "i", "i", "i", "i"), columns):
+            setattr(fleet, name, array(typecode, values))
+        return fleet, stations
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self) -> "EventLogFile":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='LunarMiningReplay',
+        description='Replays an event log written with --event-log, printing the state of trucks and stations at a '
+                    'minute, or the events between two minutes'
+    )
+    parser.add_argument('path', help='event log file')
+    parser.add_argument('--minute', type=int, default=None,
+                        help='print the state after this many simulated minutes, the end of the log by default')
+    parser.add_argument('--events', type=int, nargs=2, metavar=('START', 'STOP'), default=None,
+                        help='print the events from minute START up to minute STOP instead')
+    parser.add_argument('--trucks', type=parse_range, default=None, help='only these truck ids, e.g. 7, 1,2,3 or 0:99')
+    parser.add_argument('--stations', type=parse_range, default=None,
+                        help='only these station ids, same format as --trucks')
+    args = parser.parse_args()
+    trucks = set(args.trucks) if args.trucks else None
+    stations = set(args.stations) if args.stations else None
+
+    try:
+        with EventLogFile(args.path) as log:
+            if args.events:
+                for event in log.records(*args.events):
+                    if (trucks is None or event.truck_id in trucks) and (
+                            stations is None or event.station_id in stations):
+                        at = f" at station {event.station_id}" if event.station_id is not None else ""
+                        print(f"{event.minute}: Truck {event.truck_id} {event.state}{at} "
+                              f"for {event.minutes_required} minutes")
+                return
+            minute = args.minute if args.minute is not None else log.end
+            fleet, replayed = log.state_at(minute)
+    except ValueError as error:
+        parser.error(str(error))
+    print(f"Minute {minute}")
+    for station in replayed:
+        if stations is None or station.station_id in stations:
+            print(f"{station}, {station.num_trucks_unloaded} unloaded")
+    for truck in fleet:
+        if trucks is None or truck.truck_id in trucks:
+            station = f" at station {truck.station_id}" if truck.station_id is not None else ""
+            print(f"Truck {truck.truck_id}: {truck.state} {truck.minutes_elapsed_in_state}/"
+                  f"{truck.minutes_required_in_state}{station}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import heapq
+from array import array
+from simulation.fleet import TruckFleet, NO_STATION
+from simulation.rng import mix64
+from simulation.truck import LOADING, SITE_TO_STATION, QUEUED, UNLOADING, STATION_TO_SITE
+
+# Event kinds, each one wakes a truck when it changes state
+ARRIVE = 0       # Truck finished driving to the station area and joins a queue
+UNLOAD_DONE = 1  # Truck at the head of a queue finished unloading
+RETURN = 2       # Truck reached a mining site and starts loading, only scheduled for trucks of a resumed run
+
+
+class EventEngine:
+    def __init__(self, simulation):
+        """
+        Initialize a heap-based discrete-event engine for a simulation.
+
+        Instead of ticking every truck every minute, each truck has exactly one pending event in the heap
+        and is only woken when its state changes. Events are ordered by (minute, truck_id), and all stations
+        pop their finished trucks after every truck event of that minute, so per-truck and per-station results
+        match the tick engine minute for minute. Each event is packed into a single int,
+        ((minute * num_trucks + truck_id) << 2) | kind, which orders the same way and compares much faster
+        than a tuple.
+
+        Load times come from a counter-based stream, so a truck can draw its next load time when it finishes
+        unloading. The return drive, loading and the drive back are then one event instead of two, and the
+        states the truck went through are filled in when the run stops.
+
+        Args:
+            simulation (LunarMiningSimulation): Simulation whose trucks and stations are advanced in place,
+                either truck objects or an array-backed fleet.
+        """
+        self.simulation = simulation
+
+    def run(self):
+        """
+        Advance the simulation over simulation_minutes by jumping from event to event.
+        """
+        sim = self.simulation
+        stations = sim.stations
+        end = sim.simulation_minutes
+        fleet = sim.fleet if sim.fleet is not None else TruckFleet.from_trucks(sim.trucks)
+        num_trucks = len(fleet)
+        load_times = sim.load_times
+        step = load_times.step
+        # Parameters of every truck's class, and each truck's stream key, so a draw is a single mix64,
+        # bit for bit equal to LoadTimeStream.draw
+        first, span, travel = sim.truck_parameters()
+        truck_keys = [mix64(load_times.key ^ i) for i in range(num_trucks)]
+        select = sim.dispatcher.select
+        unload = [station.unload_minutes for station in stations]
+        bays = [station.bays for station in stations]
+
+        # Per-truck state, copied out of the fleet and written back when the run finishes.
+        # entered[i] is the minute in which the truck's current state began, duration[i] how long it lasts
+        state = fleet.state.tolist()
+        entered = [-1 - elapsed for elapsed in fleet.elapsed]
+        duration = fleet.required.tolist()
+        arrived = [0] * num_trucks
+        delivered = fleet.delivered.tolist()
+        queued_time = fleet.queued_time.tolist()
+        station_of = fleet.station_id.tolist()
+        num_loads = fleet.num_loads.tolist()
+        # Load time drawn at unloading by a truck driving back to the mining site, 0 for trucks that were
+        # already driving back when the run started, which get a RETURN event instead
+        next_load = [0] * num_trucks
+
+        # Minute from which each station's current queue length counts towards its statistics
+        last_change = [0] * len(stations)
+
+        heap = []
+        for i in range(num_trucks):
+            # The minute in which the current state ends
+            finish = entered[i] + duration[i]
+            if state[i] == LOADING:
+                # Loading and the drive to the station are merged into one arrival event
+                heap.append(((finish + travel[i]) * num_trucks + i) << 2 | ARRIVE)
+            elif state[i] == SITE_TO_STATION:
+                heap.append((finish * num_trucks + i) << 2 | ARRIVE)
+            elif state[i] == UNLOADING:
+                heap.append((finish * num_trucks + i) << 2 | UNLOAD_DONE)
+            elif state[i] == STATION_TO_SITE:
+                heap.append((finish * num_trucks + i) << 2 | RETURN)
+            elif station_of[i] == NO_STATION:
+                # Queued without a station, the tick engine counts one queued minute before assigning it
+                if end > 0:
+                    queued_time[i] += 1
+                heap.append(i << 2 | ARRIVE)
+            else:
+                arrived[i] = -1
+        heapq.heapify(heap)
+
+        heappush = heapq.heappush
+        heappop = heapq.heappop
+        # Events of a minute are those below the first event of the next minute
+        end_event = end * num_trucks << 2
+        while heap and heap[0] < end_event:
+            minute = (heap[0] >> 2) // num_trucks
+            next_minute = (minute + 1) * num_trucks << 2
+            finished_stations = []
+            while heap and heap[0] < next_minute:
+                event = heappop(heap)
+                kind = event & 3
+                i = (event >> 2) - minute * num_trucks
+                if kind == ARRIVE:
+                    station = select(i)
+                    queue = station.truck_queue
+                    s = station.station_id
+                    station.record_queue_length(minute - last_change[s])
+                    last_change[s] = minute
+                    station.add_truck(i)
+                    station_of[i] = s
+                    arrived[i] = minute
+                    duration[i] = unload[s]
+                    if len(queue) <= bays[s]:
+                        # Joined a queue with a free bay, unloading starts right away
+                        state[i] = UNLOADING
+                        entered[i] = minute
+                        heappush(heap, ((minute + unload[s]) * num_trucks + i) << 2 | UNLOAD_DONE)
+                    else:
+                        state[i] = QUEUED
+                elif kind == UNLOAD_DONE:
+                    state[i] = STATION_TO_SITE
+                    entered[i] = minute
+                    duration[i] = travel[i]
+                    delivered[i] += 1
+                    finished_stations.append(stations[station_of[i]])
+                    station_of[i] = NO_STATION
+                    # Drive back, load and drive to the stations again in one event
+                    load_time = first[i] + step * (mix64(truck_keys[i] ^ num_loads[i]) % span[i])
+                    num_loads[i] += 1
+                    next_load[i] = load_time
+                    heappush(heap, ((minute + 2 * travel[i] + load_time) * num_trucks + i) << 2 | ARRIVE)
+                else:
+                    load_time = first[i] + step * (mix64(truck_keys[i] ^ num_loads[i]) % span[i])
+                    num_loads[i] += 1
+                    state[i] = LOADING
+                    entered[i] = minute
+                    duration[i] = load_time
+                    heappush(heap, ((minute + load_time + travel[i]) * num_trucks + i) << 2 | ARRIVE)
+
+            # Stations move their lines only after every truck has been processed for this minute,
+            # trucks finish in the order they started, so each finished truck frees the head of its queue
+            for station in finished_stations:
+                queue = station.truck_queue
+                s = station.station_id
+                station.record_queue_length(minute + 1 - last_change[s])
+                last_change[s] = minute + 1
+                station.remove_head()
+                station.num_trucks_unloaded += 1
+                if len(queue) >= bays[s]:
+                    # The first truck waiting for a bay starts unloading in the freed one
+                    waiting = queue[bays[s] - 1]
+                    queued_time[waiting] += minute - arrived[waiting]
+                    state[waiting] = UNLOADING
+                    entered[waiting] = minute
+                    heappush(heap, ((minute + unload[s]) * num_trucks + waiting) << 2 | UNLOAD_DONE)
+
+        for station in stations:
+            station.record_queue_length(end - last_change[station.station_id])
+
+        elapsed = [0] * num_trucks
+        for i in range(num_trucks):
+            if state[i] == STATION_TO_SITE and next_load[i]:
+                if entered[i] + duration[i] < end:
+                    # Reached the mining site and started on the load time drawn when it unloaded
+                    state[i] = LOADING
+                    entered[i] += duration[i]
+                    duration[i] = next_load[i]
+                else:
+                    # Still driving back, the load time is drawn again when the run continues
+                    num_loads[i] -= 1
+            if state[i] == LOADING and entered[i] + duration[i] < end:
+                # Finished loading but has not reached the station yet
+                state[i] = SITE_TO_STATION
+                entered[i] += duration[i]
+                duration[i] = travel[i]
+            if state[i] == QUEUED:
+                queued_time[i] += end - 1 - arrived[i]
+            else:
+                elapsed[i] = end - 1 - entered[i]
+
+        fleet.state = array('b', state)
+        fleet.elapsed = array('i', elapsed)
+        fleet.required = array('i', duration)
+        fleet.station_id = array('i', station_of)
+        fleet.delivered = array('i', delivered)
+        fleet.queued_time = array('i', queued_time)
+        fleet.num_loads = array('i', num_loads)
+        if sim.fleet is None:
+            fleet.write_to(sim.trucks)
@@ -0,0 +1,270 @@
+import argparse
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from simulation.config import SimulationConfig, DEFAULT_CONFIG
+from simulation.run import ENGINES
+from simulation.stats import mean_confidence_interval
+from simulation.sweep import parse_range, replicate_seed, run_replicate
+
+# Values estimated for every configuration, in the order of the results of run_replicate
+METRICS = ("deliveries", "queue_time")
+
+# Replicates every configuration runs before its confidence intervals are trusted to stop it
+MIN_REPLICATES = 5
+
+
+def run_replicates(task: tuple) -> tuple:
+    """
+    Run one replicate of one configuration in a worker, as an antithetic pair when asked to.
+
+    Args:
+        task (tuple): (num_trucks, num_stations, replicate, seed, engine, config, antithetic)
+
+    Returns:
+        (num_trucks, num_stations, replicate, results of each run), each result is (deliveries, queue_time)
+    """
+    num_trucks, num_stations, replicate, seed, engine, config, antithetic = task
+    results = [run_replicate(num_trucks, num_stations, seed, engine, config=config)]
+    if antithetic:
+        results.append(run_replicate(num_trucks, num_stations, seed, engine, config=config, antithetic=True))
+    return num_trucks, num_stations, replicate, results
+
+
+class ExperimentSummary:
+    def __init__(self, num_trucks: int, num_stations: int, relative: float, widths: dict[str, float]):
+        """
+        Initialize the results of one (num_trucks, num_stations) configuration of an experiment.
+
+        Every replicate is one observation, the mean of its antithetic pair when pairs are run.
+
+        Args:
+            num_trucks (int): Number of trucks simulated.
+            num_stations (int): Number of stations simulated.
+            relative (float): Target confidence interval half width of every metric, as a fraction of its mean.
+            widths (dict[str, float]): Target half width of a metric in its own unit, a metric is precise enough
+                once its half width is within either target.
+        """
+        self.num_trucks = num_trucks
+        self.num_stations = num_stations
+        self.relative = relative
+        self.widths = widths
+        # Results of every run of each replicate, kept by replicate so the order workers finish in does not matter
+        self.results: dict[int, list[tuple[int, float]]] = {}
+
+    def add(self, replicate: int, results: list[tuple[int, float]]):
+        """
+        Add the runs of one replicate
+        """
+        self.results[replicate] = results
+
+    @property
+    def runs(self) -> int:
+        """
+        Number of simulations run
+        """
+        return sum(len(results) for results in self.results.values())
+
+    def observations(self, metric: str) -> list[float]:
+        """
+        Get one value of a metric per replicate, averaged over its antithetic pair, in replicate order
+        """
+        index = METRICS.index(metric)
+        return [sum(result[index] for result in self.results[r]) / len(self.results[r]) for r in sorted(self.results)]
+
+    def target(self, metric: str) -> float:
+        """
+        Get the half width a metric's confidence interval has to reach
+        """
+        mean = mean_confidence_interval(self.observations(metric))[0]
+        return max(self.widths.get(metric, 0.0), self.relative * abs(mean))
+
+    def needed(self) -> int:
+        """
+        Estimate how many replicates reach every target, from the variance of the replicates so far
+        """
+        needed = len(self.results)
+        for metric in METRICS:
+            values = self.observations(metric)
+            mean, half_width = mean_confidence_interval(values)
+            target = self.target(metric)
+            if half_width <= target:
+                continue
+            if target == 0:
+                return math.inf
+            # The half width shrinks with the square root of the number of replicates
+            needed = max(needed, math.ceil(len(values) * (half_width / target) ** 2))
+        return needed
+
+    def independent_runs(self) -> int:
+        """
+        Estimate how many independent runs without antithetic pairs would reach the same half widths
+        """
+        runs = 0
+        for metric in METRICS:
+            index = METRICS.index(metric)
+            values = [result[index] for r in sorted(self.results) for result in self.results[r]]
+            mean, half_width = mean_confidence_interval(values)
+            target = self.target(metric)
+            if target > 0 and math.isfinite(half_width):
+                runs = max(runs, math.ceil(len(values) * (half_width / target) ** 2))
+        return runs
+
+    def row(self, fixed: int) -> dict:
+        """
+        Get the mean, 95% confidence interval half width and target of every metric, and the runs used
+        next to those of a fixed number of replicates.
+
+        Args:
+            fixed (int): Runs of a fixed design for every configuration.
+        """
+        row = {"num_trucks": self.num_trucks, "num_stations": self.num_stations, "replicates": len(self.results)}
+        for metric in METRICS:
+            row[f"{metric}_mean"], row[f"{metric}_ci"] = mean_confidence_interval(self.observations(metric))
+            row[f"{metric}_target"] = self.target(metric)
+        row["runs"] = self.runs
+        row["runs_fixed"] = fixed
+        row["runs_saved"] = row["runs_fixed"] - self.runs
+        row["runs_independent"] = self.independent_runs()
+        return row
+
+
+def run_experiment(trucks: list[int], stations: list[int], relative: float = 0.01, widths: dict[str, float] = None,
+                   seed: int = 0, engine: str = "event", antithetic: bool = True, max_replicates: int = 500,
+                   fixed: int = 100, workers: int = None, config: SimulationConfig = None) -> list[dict]:
+    """
+    Run replicates of every (num_trucks, num_stations) configuration until their confidence intervals are narrow
+    enough, instead of a fixed number of replicates.
+
+    Every configuration starts with MIN_REPLICATES replicates. From their variance it estimates how many replicates
+    reach the targets and runs that many more, at most doubling, until every metric's 95% confidence interval
+    is within its target or max_replicates is reached.
+
+    Two kinds of variance reduction come from the seeded load times. With antithetic, each replicate runs its
+    seed and the mirrored load times of the same seed, whose long loads are the other's short ones, so the mean
+    of the pair varies less than two independent runs. Replicate r of every configuration uses the same seed,
+    common random numbers, so the difference between neighbouring configurations is measured on the same load
+    times and its interval is narrow as well.
+
+    Args:
+        trucks (list[int]): Truck counts to simulate.
+        stations (list[int]): Station counts to simulate.
+        relative (float): Target half width of every metric, as a fraction of its mean.
+        widths (dict[str, float]): Target half widths by metric in their own unit, a metric stops at either
+            target, so metrics whose mean is close to 0 can still stop.
+        seed (int): Seed of the whole experiment, every replicate derives its own seed from it.
+        engine (str): Simulation engine used for every run.
+        antithetic (bool): Run every replicate as an antithetic pair.
+        max_replicates (int): Most replicates run for a configuration.
+        fixed (int): Runs per configuration of the fixed design the runs are compared against.
+        workers (int): Worker processes, defaults to the number of CPUs. 1 runs everything in this process.
+        config (SimulationConfig): Durations and horizon of every run, defaults to the original 72 hour operation.
+
+    Returns:
+        one row per configuration in grid order, see ExperimentSummary.row, with the paired difference of each
+        metric from the previous configuration over their common replicates
+    """
+    if relative < 0:
+        raise ValueError("Invalid value passed for relative width. Value must be >= 0")
+    if max_replicates < MIN_REPLICATES:
+        raise ValueError(f"Invalid value passed for maximum replicates. Value must be >= {MIN_REPLICATES}")
+    widths = widths or {}
+    for metric in widths:
+        if metric not in METRICS:
+            raise ValueError(f"Invalid value passed for width. Metric must be one of {', '.join(METRICS)}")
+    config = config if config is not None else DEFAULT_CONFIG
+    summaries = {(n, m): ExperimentSummary(n, m, relative, widths) for n in trucks for m in stations}
+
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        # Replicates to run next for every configuration that has not reached its targets
+        next_count = {key: MIN_REPLICATES for key in summaries}
+        while next_count:
+            tasks = [(n, m, r, replicate_seed(seed, r), engine, config, antithetic)
+                     for (n, m), count in next_count.items()
+                     for r in range(len(summaries[(n, m)].results), len(summaries[(n, m)].results) + count)]
+            if executor is None:
+                results = map(run_replicates, tasks)
+            else:
+                results = executor.map(run_replicates, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+            for n, m, replicate, runs in results:
+                summaries[(n, m)].add(replicate, runs)
+
+            for key in list(next_count):
+                summary = summaries[key]
+                done = len(summary.results)
+                needed = min(summary.needed(), max_replicates)
+                if needed <= done:
+                    del next_count[key]
+                else:
+                    next_count[key] = min(needed - done, done)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    rows = []
+    previous = None
+    for key, summary in summaries.items():
+        row = summary.row(fixed)
+        for metric in METRICS:
+            row[f"{metric}_diff"], row[f"{metric}_diff_ci"] = math.nan, math.nan
+            if previous is not None:
+                # Common random numbers pair replicate r of both configurations
+                common = min(len(summary.results), len(previous.results))
+                differences = [a - b for a, b in zip(summary.observations(metric)[:common],
+                                                     previous.observations(metric)[:common])]
+                row[f"{metric}_diff"], row[f"{metric}_diff_ci"] = mean_confidence_interval(differences)
+        rows.append(row)
+        previous = summary
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='LunarMiningExperiment',
+        description='Runs replicates of every truck and station count until the confidence intervals of total '
+                    'deliveries and mean queue time reach a target width'
+    )
+    parser.add_argument('--trucks', type=parse_range, required=True, help='truck counts, e.g. 10, 5,10,20 or 5:50:5')
+    parser.add_argument('--stations', type=parse_range, required=True, help='station counts, same format as --trucks')
+    parser.add_argument('--relative', type=float, default=0.01,
+                        help='target 95%% confidence interval half width as a fraction of the mean, 0.01 by default')
+    parser.add_argument('--deliveries-width', type=float, default=None, metavar='LOADS',
+                        help='also stop once the total deliveries interval is within LOADS')
+    parser.add_argument('--queue-time-width', type=float, default=1.0, metavar='MINUTES',
+                        help='also stop once the mean queue time interval is within MINUTES, 1 by default')
+    parser.add_argument('--no-antithetic', action='store_true', help='run independent replicates instead of pairs')
+    parser.add_argument('--max-replicates', type=int, default=500)
+    parser.add_argument('--fixed', type=int, default=100,
+                        help='runs per configuration of the fixed design the runs are compared to')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', choices=ENGINES, default="event")
+    parser.add_argument('--config', metavar='FILE', default=None,
+                        help='TOML file with the horizon and durations of every run')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    config = SimulationConfig.from_toml(args.config) if args.config else DEFAULT_CONFIG
+    widths = {metric: width for metric, width in (("deliveries", args.deliveries_width),
+                                                  ("queue_time", args.queue_time_width)) if width is not None}
+
+    try:
+        rows = run_experiment(args.trucks, args.stations, relative=args.relative, widths=widths, seed=args.seed,
+                              engine=args.engine, antithetic=not args.no_antithetic,
+                              max_replicates=args.max_replicates, fixed=args.fixed, workers=args.workers,
+                              config=config)
+    except ValueError as error:
+        parser.error(str(error))
+    header = list(rows[0])
+    print(",".join(header))
+    for row in rows:
+        print(",".join(str(row[key]) if isinstance(row[key], int) else f"{row[key]:.3f}" for key in header))
+    runs = sum(row["runs"] for row in rows)
+    fixed = sum(row["runs_fixed"] for row in rows)
+    print(f"{runs} runs instead of {fixed} with {args.fixed} runs per configuration, "
+          f"{fixed - runs} saved", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+from array import array
+from collections import deque
+
+
+class WindowHistory:
+    __slots__ = ("window", "values")
+
+    def __init__(self, window: int):
+        """
+        Initialize a queue length history that only keeps the most recent minutes.
+
+        Args:
+            window (int): Number of minutes kept, older minutes are dropped as new ones are added.
+        """
+        if window <= 0:
+            raise ValueError("Invalid value passed for history window. Value must be > 0")
+        self.window = window
+        self.values: deque[int] = deque(maxlen=window)
+
+    def add(self, length: int, minutes: int = 1):
+        """
+        Record that the queue had the given length for a number of minutes.
+        """
+        self.values.extend([length] * min(minutes, self.window))
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class DownsampledHistory:
+    __slots__ = ("resolution", "max_points", "sums", "minutes")
+
+    def __init__(self, resolution: int = 60, max_points: int = 1024):
+        """
+        Initialize a queue length history that keeps the mean length of every resolution minutes.
+
+        When max_points means have been kept, neighbouring pairs are merged and the resolution doubles,
+        so the history covers the whole run in at most max_points values however long the run is.
+
+        Args:
+            resolution (int): Minutes averaged into one value at first.
+            max_points (int): Most values kept, must be even.
+        """
+        if resolution <= 0:
+            raise ValueError("Invalid value passed for history resolution. Value must be > 0")
+        if max_points < 2 or max_points % 2:
+            raise ValueError("Invalid value passed for history points. Value must be an even number >= 2")
+        self.resolution = resolution
+        self.max_points = max_points
+        # Sum of the queue length over the minutes of each value, the last one may be partly filled
+        self.sums = array('q')
+        self.minutes = 0
+
+    def add(self, length: int, minutes: int = 1):
+        """
+        Record that the queue had the given length for a number of minutes.
+        """
+        while minutes > 0:
+            filled = self.minutes % self.resolution
+            if filled == 0:
+                if len(self.sums) == self.max_points:
+                    self.merge()
+                self.sums.append(0)
+            taken = min(minutes, self.resolution - filled)
+            self.sums[-1] += length * taken
+            self.minutes += taken
+            minutes -= taken
+
+    def merge(self):
+        """
+        Merge neighbouring values, halving the number kept and doubling the resolution
+        """
+        sums = self.sums
+        self.sums = array('q', [sums[i] + sums[i + 1] for i in range(0, len(sums), 2)])
+        self.resolution *= 2
+
+    def __iter__(self):
+        """
+        Iterate the mean queue length of each value, oldest first
+        """
+        for i, total in enumerate(self.sums):
+            yield total / min(self.resolution, self.minutes - i * self.resolution)
+
+    def __len__(self) -> int:
+        return len(self.sums)
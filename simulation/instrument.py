@@ -0,0 +1,238 @@
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+from simulation.truck import TruckState
+
+# Statistics of one traced period: the minute it started, how many times trucks entered each state,
+# and the wall time in seconds of each phase of the loop
+PeriodTrace = namedtuple("PeriodTrace", ["start_minute", "transitions", "phases"])
+
+# Phases of the tick loop, other engines are timed as a single "engine" phase
+TICK_PHASES = ("trucks", "dispatch", "stations")
+
+
+def fleet_counts(simulation) -> tuple[list[int], int]:
+    """
+    Count the trucks in each state and the load times drawn by the whole fleet.
+
+    Returns:
+        (number of trucks in each TruckState, total load times drawn)
+    """
+    if simulation.fleet is not None:
+        states = simulation.fleet.state
+        num_loads = sum(simulation.fleet.num_loads)
+    else:
+        states = [truck.state for truck in simulation.trucks]
+        num_loads = sum(truck.num_loads for truck in simulation.trucks)
+    counts = [0] * len(TruckState)
+    for state, count in Counter(states).items():
+        counts[state] = count
+    return counts, num_loads
+
+
+def count_transitions(before: tuple[list[int], int], after: tuple[list[int], int]) -> dict[TruckState, int]:
+    """
+    Get how many times trucks entered each state between two fleet_counts().
+
+    The states form a cycle, so every truck that left a state entered the next one. A truck enters LOADING once
+    per load time drawn, and the trucks entering each following state are those that entered the state before it,
+    less the growth in the number of trucks still in it. This needs no counting inside the engines.
+    """
+    (counts_before, loads_before), (counts_after, loads_after) = before, after
+    transitions = {}
+    entered = loads_after - loads_before
+    for state in TruckState:
+        transitions[state] = entered
+        entered -= counts_after[state] - counts_before[state]
+    return transitions
+
+
+def traced_ticks(simulation) -> dict[str, float]:
+    """
+    Run the tick loop over simulation_minutes, timing trucks, dispatch and stations separately.
+
+    Trucks that need a station are assigned after every truck has ticked instead of right away, in the same
+    truck id order, which gives the same result since ticking a truck never looks at the stations.
+
+    Returns:
+        wall time in seconds of each phase in TICK_PHASES
+    """
+    clock = time.perf_counter
+    trucks = simulation.trucks
+    stations = simulation.stations
+    phases = dict.fromkeys(TICK_PHASES, 0.0)
+    for minute in range(simulation.simulation_minutes):
+        start = clock()
+        waiting = []
+        for truck in trucks:
+            truck.tick()
+            if truck.needs_unload_station():
+                waiting.append(truck)
+        ticked = clock()
+        for truck in waiting:
+            simulation.assign_truck_to_station(truck)
+        dispatched = clock()
+        for station in stations:
+            station.process_queue(trucks)
+        phases["trucks"] += ticked - start
+        phases["dispatch"] += dispatched - ticked
+        phases["stations"] += clock() - dispatched
+    return phases
+
+
+def timed_advance(simulation) -> dict[str, float]:
+    """
+    Run the simulation's engine over simulation_minutes as a single timed phase
+    """
+    start = time.perf_counter()
+    simulation.advance()
+    return {"engine": time.perf_counter() - start}
+
+
+class Instrumentation:
+    def __init__(self, interval: int = 60):
+        """
+        Initialize an opt-in tracer that counts state transitions and times the simulation loop.
+
+        A traced run is cut into periods of interval simulated minutes, or of the snapshot interval when snapshots
+        are written, and each period is run by the engine on its own, as engines can continue from any state.
+        Nothing is added to the engines themselves, so an untraced run pays nothing for it.
+
+        Args:
+            interval (int): Simulated minutes per traced period, one simulated hour by default.
+        """
+        if interval <= 0:
+            raise ValueError("Invalid value passed for trace interval. Value must be > 0")
+        self.interval = interval
+        self.periods: list[PeriodTrace] = []
+        # Simulated minutes traced so far, the start of the next period
+        self.minute = 0
+
+    def advance(self, simulation):
+        """
+        Advance a simulation over its simulation_minutes as one traced period.
+
+        Args:
+            simulation (LunarMiningSimulation): Simulation to advance.
+        """
+        before = fleet_counts(simulation)
+        # The tick loop is replaced by one timing each phase, other engines are timed as a whole
+        phases = traced_ticks(simulation) if simulation.engine == "tick" else timed_advance(simulation)
+        self.periods.append(PeriodTrace(self.minute, count_transitions(before, fleet_counts(simulation)), phases))
+        self.minute += simulation.simulation_minutes
+
+    @property
+    def transitions(self) -> dict[TruckState, int]:
+        """
+        Times trucks entered each state over every traced period
+        """
+        return {state: sum(period.transitions[state] for period in self.periods) for state in TruckState}
+
+    @property
+    def phases(self) -> dict[str, float]:
+        """
+        Wall time in seconds of each phase over every traced period
+        """
+        totals = {}
+        for period in self.periods:
+            for phase, seconds in period.phases.items():
+                totals[phase] = totals.get(phase, 0.0) + seconds
+        return totals
+
+    def report(self, file=None):
+        """
+        Print the transitions and phase times of every period, followed by the totals.
+
+        Args:
+            file: Stream to print to, defaults to stderr so the simulation's own output is unchanged.
+        """
+        file = file or sys.stderr
+        phases = list(self.phases)
+        print("minute," + ",".join(state.name for state in TruckState) + "," + ",".join(f"{p}_ms" for p in phases),
+              file=file)
+        for period in self.periods:
+            print(f"{period.start_minute},"
+                  + ",".join(str(period.transitions[state]) for state in TruckState) + ","
+                  + ",".join(f"{period.phases.get(p, 0.0) * 1000:.3f}" for p in phases), file=file)
+        print("Transitions: " + ", ".join(f"{state} {count}" for state, count in self.transitions.items()), file=file)
+        print("Phases: " + ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in self.phases.items()), file=file)
+
+
+class StackSampler:
+    def __init__(self, interval: float = 0.001):
+        """
+        Initialize a sampling profiler that records the call stack of the calling thread.
+
+        A background thread looks at the stack every interval seconds, so the profiled code runs unmodified.
+        Samples are written in the folded format read by flamegraph.pl and speedscope, one line per distinct
+        stack with its frames separated by semicolons, followed by the number of samples.
+
+        Args:
+            interval (float): Seconds between samples.
+        """
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.thread_id = None
+        self.stopped = threading.Event()
+        self.sampler = None
+
+    def sample(self):
+        """
+        Take samples until stopped
+        """
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def __enter__(self) -> "StackSampler":
+        self.thread_id = threading.get_ident()
+        self.stopped.clear()
+        self.sampler = threading.Thread(target=self.sample, daemon=True)
+        self.sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.sampler.join()
+
+    def write(self, path: str):
+        """
+        Write the samples in folded format to a file
+        """
+        with open(path, "w") as file:
+            for stack, count in self.samples.most_common():
+                file.write(f"{stack} {count}\n")
+
+
+def profile(function, path: str):
+    """
+    Call a function under a profiler and write the profile to a file.
+
+    A path ending in .folded gets sampled stacks ready for a flamegraph, anything else a cProfile dump
+    that can be read with pstats or snakeviz.
+
+    Args:
+        function: Function to call without arguments.
+        path (str): File the profile is written to.
+
+    Returns:
+        what the function returned
+    """
+    if path.endswith(".folded"):
+        with StackSampler() as sampler:
+            result = function()
+        sampler.write(path)
+    else:
+        profiler = cProfile.Profile()
+        result = profiler.runcall(function)
+        profiler.dump_stats(path)
+    return result
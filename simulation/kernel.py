@@ -0,0 +1,308 @@
+from array import array
+from simulation.fleet import TruckFleet, NO_STATION
+from simulation.rng import mix64
+from simulation.truck import TruckState
+
+# Numba is optional, without it the same kernel runs as plain Python over lists
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# True when the kernel is compiled by Numba
+JIT = numba is not None
+
+# State codes stored in the fleet arrays, the same values as TruckState
+LOADING = TruckState.LOADING.value
+SITE_TO_STATION = TruckState.SITE_TO_STATION.value
+QUEUED = TruckState.QUEUED.value
+UNLOADING = TruckState.UNLOADING.value
+STATION_TO_SITE = TruckState.STATION_TO_SITE.value
+
+# Queue length changes the kernel logs before handing them to the stations, on top of the one change per truck
+# and per station a single minute can log
+LOG_CAPACITY = 1 << 16
+
+# Key of a leaf of the station tree that holds no station, above every real (queue length, station id) key
+NO_KEY = 1 << 62
+
+if JIT:
+    import numpy as np
+
+    # Compiled code keeps the draws in unsigned 64 bit integers, which wrap like the masked Python version
+    _u64 = np.uint64
+    _i64 = np.int64
+
+    @numba.njit(cache=True)
+    def _mix64(z):
+        z = z + np.uint64(0x9E3779B97F4A7C15)
+        z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return z ^ (z >> np.uint64(31))
+else:
+    _u64 = _i64 = int
+    _mix64 = mix64
+
+
+def _run_minutes(start, end, state, elapsed, required, station_of, delivered, queued_time, num_loads, truck_keys,
+                 first, step, span, travel, unload, bays, head, tail, next_in_queue, next_waiting, length, num_unloaded,
+                 tree, tree_offset, last_change, log_station, log_length, log_minutes):
+    """
+    Step every truck and then every station through the minutes from start to end, exactly as the tick engine.
+
+    Trucks look up their load time range and travel time in per-truck tables (first, span, travel), and stations
+    their unload time and bays in per-station ones. Station queues are linked lists through next_in_queue with
+    next_waiting pointing at the first truck waiting for a bay, and the shortest queue, the fewest trucks waiting
+    and the lowest station id on a tie, is the root of a tournament tree over
+    length * num_stations + tree_offset. Every change of a queue length is logged as
+    (station, length, minutes it lasted) for the stations to record afterwards.
+
+    Returns:
+        (minute reached, number of logged changes), the kernel stops early when the log could fill up
+    """
+    num_trucks = len(state)
+    num_stations = len(length)
+    leaves = len(tree) // 2
+    used = 0
+    for minute in range(start, end):
+        if used + num_trucks + num_stations > len(log_station):
+            return minute, used
+
+        for i in range(num_trucks):
+            current = state[i]
+            if current == QUEUED:
+                queued_time[i] += 1
+            else:
+                elapsed[i] += 1
+                if elapsed[i] != required[i]:
+                    continue
+                elapsed[i] = 0
+                if current == LOADING:
+                    state[i] = SITE_TO_STATION
+                    required[i] = travel[i]
+                    continue
+                if current == UNLOADING:
+                    state[i] = STATION_TO_SITE
+                    required[i] = travel[i]
+                    station_of[i] = NO_STATION
+                    delivered[i] += 1
+                    continue
+                if current == STATION_TO_SITE:
+                    state[i] = LOADING
+                    required[i] = first[i] + step * _i64(_mix64(truck_keys[i] ^ _u64(num_loads[i])) % span[i])
+                    num_loads[i] += 1
+                    continue
+                state[i] = QUEUED
+            if station_of[i] != NO_STATION:
+                continue
+
+            # Join the shortest queue
+            s = tree[1] % num_stations
+            if minute > last_change[s]:
+                log_station[used] = s
+                log_length[used] = length[s]
+                log_minutes[used] = minute - last_change[s]
+                used += 1
+            last_change[s] = minute
+            if length[s] == 0:
+                head[s] = i
+            else:
+                next_in_queue[tail[s]] = i
+            tail[s] = i
+            next_in_queue[i] = NO_STATION
+            required[i] = unload[s]
+            if length[s] < bays[s]:
+                state[i] = UNLOADING
+            elif length[s] == bays[s]:
+                next_waiting[s] = i
+            length[s] += 1
+            station_of[i] = s
+            node = leaves + s
+            tree[node] = length[s] * num_stations + tree_offset[s]
+            while node > 1:
+                node //= 2
+                tree[node] = min(tree[2 * node], tree[2 * node + 1])
+
+        # Stations whose head trucks finished unloading move their line, each freed bay goes to a waiting truck
+        for s in range(num_stations):
+            if length[s] == 0 or state[head[s]] == UNLOADING:
+                continue
+            log_station[used] = s
+            log_length[used] = length[s]
+            log_minutes[used] = minute + 1 - last_change[s]
+            used += 1
+            last_change[s] = minute + 1
+            while length[s] > 0 and state[head[s]] != UNLOADING:
+                head[s] = next_in_queue[head[s]]
+                length[s] -= 1
+                num_unloaded[s] += 1
+                waiting = next_waiting[s]
+                if waiting != NO_STATION:
+                    state[waiting] = UNLOADING
+                    next_waiting[s] = next_in_queue[waiting]
+            node = leaves + s
+            tree[node] = length[s] * num_stations + tree_offset[s]
+            while node > 1:
+                node //= 2
+                tree[node] = min(tree[2 * node], tree[2 * node + 1])
+    return end, used
+
+
+def _step_trucks(start, stop, state, elapsed, required, station_of, delivered, queued_time, num_loads, truck_keys,
+                 first, step, span, travel, arrived, finished):
+    """
+    Step the trucks from start to stop through one minute, the truck half of a minute of _run_minutes for engines
+    that dispatch trucks and move station lines themselves.
+
+    Trucks that need a station are written to arrived, and the stations of trucks that finished unloading to
+    finished, both from index start and in truck id order.
+
+    Returns:
+        (number of trucks that need a station, number of trucks that finished unloading)
+    """
+    num_arrived = start
+    num_finished = start
+    for i in range(start, stop):
+        current = state[i]
+        if current == QUEUED:
+            queued_time[i] += 1
+        else:
+            elapsed[i] += 1
+            if elapsed[i] != required[i]:
+                continue
+            elapsed[i] = 0
+            if current == LOADING:
+                state[i] = SITE_TO_STATION
+                required[i] = travel[i]
+                continue
+            if current == UNLOADING:
+                state[i] = STATION_TO_SITE
+                required[i] = travel[i]
+                finished[num_finished] = station_of[i]
+                num_finished += 1
+                station_of[i] = NO_STATION
+                delivered[i] += 1
+                continue
+            if current == STATION_TO_SITE:
+                state[i] = LOADING
+                required[i] = first[i] + step * _i64(_mix64(truck_keys[i] ^ _u64(num_loads[i])) % span[i])
+                num_loads[i] += 1
+                continue
+            state[i] = QUEUED
+        if station_of[i] == NO_STATION:
+            arrived[num_arrived] = i
+            num_arrived += 1
+    return num_arrived - start, num_finished - start
+
+
+# Compiled once and cached on disk next to this module, so later runs skip the compilation
+run_minutes = numba.njit(cache=True)(_run_minutes) if JIT else _run_minutes
+step_trucks = numba.njit(cache=True)(_step_trucks) if JIT else _step_trucks
+
+
+class KernelEngine:
+    def __init__(self, simulation):
+        """
+        Initialize an engine that runs the whole per-minute loop of the tick engine in one kernel over typed arrays.
+
+        The kernel is compiled with Numba when it is installed and runs as plain Python over lists otherwise.
+        Either way it steps trucks and stations minute by minute in the tick engine's order and draws from the
+        same load time streams, so results match the tick engine bit for bit for the same seed. Stations only
+        pick the shortest queue, so the simulation must use the indexed or linear dispatcher.
+
+        Args:
+            simulation (LunarMiningSimulation): Simulation whose trucks and stations are advanced in place,
+                either truck objects or an array-backed fleet.
+        """
+        self.simulation = simulation
+
+    def run(self):
+        """
+        Advance the simulation over simulation_minutes in the kernel, handing queue length changes to the
+        stations whenever the kernel's log fills up.
+        """
+        sim = self.simulation
+        stations = sim.stations
+        end = sim.simulation_minutes
+        load_times = sim.load_times
+        fleet = sim.fleet if sim.fleet is not None else TruckFleet.from_trucks(sim.trucks)
+        num_trucks = len(fleet)
+        num_stations = len(stations)
+
+        # Parameters of every truck's and every station's class
+        first, span, travel = sim.truck_parameters()
+        unload = [station.unload_minutes for station in stations]
+        bays = [station.bays for station in stations]
+
+        # Station queues as linked lists through the trucks, and a tournament tree over the trucks waiting for a bay
+        head = [NO_STATION] * num_stations
+        tail = [NO_STATION] * num_stations
+        next_in_queue = [NO_STATION] * num_trucks
+        length = [len(station.truck_queue) for station in stations]
+        next_waiting = [station.truck_queue[station.bays] if len(station.truck_queue) > station.bays else NO_STATION
+                        for station in stations]
+        for s, station in enumerate(stations):
+            previous = NO_STATION
+            for i in station.truck_queue:
+                if previous == NO_STATION:
+                    head[s] = i
+                else:
+                    next_in_queue[previous] = i
+                previous = i
+            tail[s] = previous
+        leaves = 1 << max(num_stations - 1, 0).bit_length()
+        tree = [NO_KEY] * (2 * leaves)
+        # Ranks stations by length - bays, shifted by the most bays so every key stays positive
+        tree_offset = [(max(bays) - bays[s]) * num_stations + s for s in range(num_stations)]
+        for s in range(num_stations):
+            tree[leaves + s] = length[s] * num_stations + tree_offset[s]
+        for node in range(leaves - 1, 0, -1):
+            tree[node] = min(tree[2 * node], tree[2 * node + 1])
+        num_unloaded = [station.num_trucks_unloaded for station in stations]
+        # Minute from which each station's current queue length counts towards its statistics
+        last_change = [0] * num_stations
+
+        columns = fleet.columns()
+        if JIT:
+            # Compiled code works on the fleet's arrays in place and on NumPy copies of the rest
+            trucks = [np.frombuffer(column, dtype=f"i{column.itemsize}") for column in columns]
+            truck_keys = np.array([mix64(load_times.key ^ i) for i in range(num_trucks)], dtype=np.uint64)
+            span = np.array(span, dtype=np.uint64)
+            (first, travel, unload, bays, head, tail, next_in_queue, next_waiting, length, num_unloaded, tree_offset,
+             last_change) = (np.array(values, dtype=np.int64)
+                             for values in (first, travel, unload, bays, head, tail, next_in_queue, next_waiting,
+                                            length, num_unloaded, tree_offset, last_change))
+            tree = np.array(tree, dtype=np.int64)
+            log = [np.zeros(LOG_CAPACITY + num_trucks + num_stations, dtype=np.int64) for _ in range(3)]
+        else:
+            trucks = [column.tolist() for column in columns]
+            truck_keys = [mix64(load_times.key ^ i) for i in range(num_trucks)]
+            log = [[0] * (LOG_CAPACITY + num_trucks + num_stations) for _ in range(3)]
+
+        minute = 0
+        while True:
+            minute, used = run_minutes(minute, end, *trucks, truck_keys, first, load_times.step, span, travel, unload,
+                                       bays, head, tail, next_in_queue, next_waiting, length, num_unloaded, tree,
+                                       tree_offset, last_change, *log)
+            for s, queue_length, minutes in zip(*(values[:used] for values in log)):
+                stations[s].record_queue_length(int(minutes), int(queue_length))
+            if minute == end:
+                break
+
+        if not JIT:
+            for name, values in zip(fleet.__slots__, trucks):
+                setattr(fleet, name, array(getattr(fleet, name).typecode, values))
+        for s, station in enumerate(stations):
+            queue = station.truck_queue
+            queue.clear()
+            i = head[s]
+            for _ in range(length[s]):
+                queue.append(int(i))
+                i = next_in_queue[i]
+            station.num_trucks_unloaded = int(num_unloaded[s])
+            station.record_queue_length(end - int(last_change[s]))
+            if station.dispatcher is not None:
+                station.dispatcher.queue_changed(station)
+
+        if sim.fleet is None:
+            fleet.write_to(sim.trucks)
@@ -0,0 +1,216 @@
+import argparse
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from simulation.analytic import estimate
+from simulation.config import SimulationConfig, DEFAULT_CONFIG
+from simulation.run import ENGINES
+from simulation.stats import mean_confidence_interval
+from simulation.sweep import parse_range, replicate_seed, run_replicate
+
+# Minutes in the day truck and station costs are given for
+MINUTES_PER_DAY = 24 * 60
+
+
+def run_candidate(task: tuple) -> tuple:
+    """
+    Run one replicate of one candidate in a worker.
+
+    Args:
+        task (tuple): (num_trucks, num_stations, replicate, seed, engine, config)
+
+    Returns:
+        (num_trucks, num_stations, replicate, deliveries)
+    """
+    num_trucks, num_stations, replicate, seed, engine, config = task
+    deliveries, _ = run_replicate(num_trucks, num_stations, seed, engine, config=config)
+    return num_trucks, num_stations, replicate, deliveries
+
+
+class ProfitModel:
+    def __init__(self, load_profit: float, truck_cost: float, station_cost: float, horizon_minutes: int):
+        """
+        Initialize the profit of an operation over a horizon.
+
+        Args:
+            load_profit (float): Profit of one delivered load.
+            truck_cost (float): Cost of operating one truck for a day.
+            station_cost (float): Cost of operating one station for a day.
+            horizon_minutes (int): Minutes the operation runs for.
+        """
+        if load_profit <= 0:
+            raise ValueError("Invalid value passed for load profit. Value must be > 0")
+        if truck_cost < 0 or station_cost < 0:
+            raise ValueError("Invalid value passed for cost. Value must be >= 0")
+        self.load_profit = load_profit
+        self.truck_cost = truck_cost
+        self.station_cost = station_cost
+        self.days = horizon_minutes / MINUTES_PER_DAY
+
+    def profit(self, num_trucks: int, num_stations: int, deliveries: float) -> float:
+        """
+        Get the profit of an operation that delivered deliveries loads over the horizon
+        """
+        cost = (num_trucks * self.truck_cost + num_stations * self.station_cost) * self.days
+        return deliveries * self.load_profit - cost
+
+
+def optimize(trucks: list[int], stations: list[int], load_profit: float, truck_cost: float, station_cost: float,
+             replicates: int = 1, eta: int = 3, max_replicates: int = 27, screen: int = None, seed: int = 0,
+             engine: str = "event", workers: int = None, config: SimulationConfig = None) -> list[dict]:
+    """
+    Search the (num_trucks, num_stations) grid for the most profitable operation with successive halving.
+
+    Every candidate starts with a few replicates. After each round only the best 1 / eta of the candidates by
+    mean profit go on, with eta times as many replicates, until one candidate is left or they reach
+    max_replicates. Poor candidates are dropped after a run or two, and the runs go to the candidates close to
+    the optimum, whose differences are small. Replicate r of every candidate uses the same seed, so they are
+    ranked on the same load times, and the replicates of earlier rounds are kept.
+
+    With screen, the queueing model of simulation.analytic ranks the whole grid first and only the screen
+    best candidates are simulated at all.
+
+    Args:
+        trucks (list[int]): Truck counts of the grid.
+        stations (list[int]): Station counts of the grid.
+        load_profit (float): Profit of one delivered load.
+        truck_cost (float): Cost of operating one truck for a day.
+        station_cost (float): Cost of operating one station for a day.
+        replicates (int): Replicates every candidate starts with.
+        eta (int): Factor candidates are cut by and replicates grow by every round.
+        max_replicates (int): Replicates after which the search stops.
+        screen (int): Candidates kept by the queueing model before simulating, all of them by default.
+        seed (int): Seed of the whole search, every replicate derives its own seed from it.
+        engine (str): Simulation engine used for every run.
+        workers (int): Worker processes, defaults to the number of CPUs. 1 runs everything in this process.
+        config (SimulationConfig): Durations and horizon of every run, defaults to the original 72 hour operation.
+
+    Returns:
+        one row per simulated candidate, the most profitable first, with the round it was dropped after, its
+        replicates, mean deliveries and mean profit with its 95% confidence interval, and the truck minutes
+        simulated for it
+    """
+    if replicates <= 0:
+        raise ValueError("Invalid value passed for replicates. Value must be > 0")
+    if eta < 2:
+        raise ValueError("Invalid value passed for eta. Value must be >= 2")
+    if max_replicates < replicates:
+        raise ValueError("Invalid value passed for maximum replicates. Value must be >= replicates")
+    if screen is not None and screen <= 0:
+        raise ValueError("Invalid value passed for screen. Value must be > 0")
+    config = config if config is not None else DEFAULT_CONFIG
+    model = ProfitModel(load_profit, truck_cost, station_cost, config.horizon_minutes)
+
+    candidates = [(n, m) for n in trucks for m in stations]
+    if screen is not None:
+        candidates.sort(key=lambda key: -model.profit(*key, estimate(*key, config).deliveries))
+        del candidates[screen:]
+    deliveries: dict[tuple, list[int]] = {key: [] for key in candidates}
+    dropped_after: dict[tuple, int] = {}
+
+    def mean_profit(key: tuple) -> float:
+        return model.profit(*key, sum(deliveries[key]) / len(deliveries[key]))
+
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        alive = candidates
+        count = replicates
+        round_number = 0
+        while True:
+            # Only the replicates a candidate has not run in earlier rounds
+            tasks = [(n, m, r, replicate_seed(seed, r), engine, config)
+                     for n, m in alive for r in range(len(deliveries[(n, m)]), count)]
+            if executor is None:
+                results = map(run_candidate, tasks)
+            else:
+                results = executor.map(run_candidate, tasks, chunksize=max(1, len(tasks) // (workers * 4)))
+            for n, m, _, value in results:
+                # Tasks are in replicate order, so the lists stay in replicate order
+                deliveries[(n, m)].append(value)
+
+            alive = sorted(alive, key=lambda key: (-mean_profit(key), key))
+            if len(alive) == 1 or count >= max_replicates:
+                break
+            keep = math.ceil(len(alive) / eta)
+            for key in alive[keep:]:
+                dropped_after[key] = round_number
+            alive = alive[:keep]
+            count = min(count * eta, max_replicates)
+            round_number += 1
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    rows = []
+    for key in candidates:
+        n, m = key
+        profits = [model.profit(n, m, value) for value in deliveries[key]]
+        profit_mean, profit_ci = mean_confidence_interval(profits)
+        rows.append({"num_trucks": n, "num_stations": m, "round": dropped_after.get(key, round_number),
+                     "replicates": len(profits), "deliveries_mean": sum(deliveries[key]) / len(profits),
+                     "profit_mean": profit_mean, "profit_ci": profit_ci,
+                     "truck_minutes": n * len(profits) * config.horizon_minutes})
+    # Survivors of the last round first, each round by profit on the replicates it had
+    rows.sort(key=lambda row: (-row["round"], -row["profit_mean"], row["num_trucks"], row["num_stations"]))
+    return rows
+
+
+def grid_truck_minutes(trucks: list[int], stations: list[int], replicates: int, config: SimulationConfig) -> int:
+    """
+    Get the truck minutes a full grid search running every candidate for replicates replicates simulates
+    """
+    return sum(trucks) * len(stations) * replicates * config.horizon_minutes
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='LunarMiningOptimizer',
+        description='Searches truck and station counts for the most profitable operation with successive halving'
+    )
+    parser.add_argument('--trucks', type=parse_range, required=True, help='truck counts, e.g. 10, 5,10,20 or 5:50:5')
+    parser.add_argument('--stations', type=parse_range, required=True, help='station counts, same format as --trucks')
+    parser.add_argument('--load-profit', type=float, required=True, help='profit of one delivered load')
+    parser.add_argument('--truck-cost', type=float, required=True, help='cost of operating one truck for a day')
+    parser.add_argument('--station-cost', type=float, required=True,
+                        help='cost of operating one station for a day')
+    parser.add_argument('--replicates', type=int, default=1, help='replicates every candidate starts with')
+    parser.add_argument('--eta', type=int, default=3,
+                        help='candidates are cut by and replicates grow by this factor every round, 3 by default')
+    parser.add_argument('--max-replicates', type=int, default=27)
+    parser.add_argument('--screen', type=int, default=None, metavar='N',
+                        help='only simulate the N candidates the queueing model ranks best')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', choices=ENGINES, default="event")
+    parser.add_argument('--minutes', type=int, default=None, help='simulated minutes, overrides the config horizon')
+    parser.add_argument('--config', metavar='FILE', default=None,
+                        help='TOML file with the horizon and durations of every run')
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    config = SimulationConfig.from_toml(args.config) if args.config else DEFAULT_CONFIG
+    config = config.replace(horizon_minutes=args.minutes)
+
+    try:
+        rows = optimize(args.trucks, args.stations, args.load_profit, args.truck_cost, args.station_cost,
+                        replicates=args.replicates, eta=args.eta, max_replicates=args.max_replicates,
+                        screen=args.screen, seed=args.seed, engine=args.engine, workers=args.workers, config=config)
+    except ValueError as error:
+        parser.error(str(error))
+    header = list(rows[0])
+    print(",".join(header))
+    for row in rows:
+        print(",".join(str(row[key]) if isinstance(row[key], int) else f"{row[key]:.3f}" for key in header))
+    best = rows[0]
+    simulated = sum(row["truck_minutes"] for row in rows)
+    grid = grid_truck_minutes(args.trucks, args.stations, best["replicates"], config)
+    print(f"Best: {best['num_trucks']} trucks, {best['num_stations']} stations, profit {best['profit_mean']:.1f} "
+          f"+/- {best['profit_ci']:.1f}", file=sys.stderr)
+    # A zero minute horizon simulates no truck minutes at all
+    if simulated:
+        print(f"{simulated} truck minutes simulated instead of {grid} for a grid of {best['replicates']} "
+              f"replicates, {grid / simulated:.1f}x fewer", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+from array import array
+from functools import cached_property
+from simulation.fleet import TruckFleet
+from simulation.stats import sample_percentile
+from simulation.truck import TruckState
+
+# Percentiles of the minutes trucks spent queued reported by summary()
+SUMMARY_PERCENTILES = (50, 90, 99)
+
+
+def as_numpy(column: array):
+    """
+    View a fleet column as a NumPy array without copying it, None when NumPy is not installed
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    return np.frombuffer(column, dtype=f"i{column.itemsize}")
+
+
+class SimulationResults:
+    def __init__(self, simulation):
+        """
+        Initialize the results of a simulation, returned by its run().
+
+        Nothing is computed up front. Aggregates are computed the first time they are asked for and kept,
+        from the fleet's flat per-truck arrays, with NumPy when it is installed, so the summary of an
+        array-backed fleet of a million trucks takes milliseconds. A fleet of truck objects is copied into arrays
+        once, on the first query. Range queries return array slices instead of an object per truck or station.
+
+        Results describe the simulation as it is when they are first computed. Running it further leaves
+        computed aggregates as they were, and run() returns new results.
+
+        Args:
+            simulation (LunarMiningSimulation): Simulation that was run.
+        """
+        self.simulation = simulation
+
+    @cached_property
+    def fleet(self) -> TruckFleet:
+        """
+        Per-truck arrays of the simulation, its own for an array-backed fleet, a copy for truck objects
+        """
+        simulation = self.simulation
+        return simulation.fleet if simulation.fleet is not None else TruckFleet.from_trucks(simulation.trucks)
+
+    @cached_property
+    def total_deliveries(self) -> int:
+        """
+        Loads delivered by the whole fleet
+        """
+        values = as_numpy(self.fleet.delivered)
+        return int(values.sum(dtype="i8")) if values is not None else sum(self.fleet.delivered)
+
+    @cached_property
+    def total_queued_time(self) -> int:
+        """
+        Minutes every truck of the fleet spent queued, together
+        """
+        values = as_numpy(self.fleet.queued_time)
+        return int(values.sum(dtype="i8")) if values is not None else sum(self.fleet.queued_time)
+
+    @property
+    def mean_queue_time(self) -> float:
+        """
+        Mean minutes a truck spent queued
+        """
+        return self.total_queued_time / len(self.fleet)
+
+    @cached_property
+    def utilization(self) -> array:
+        """
+        Share of each station's bay minutes spent unloading, over the minutes its statistics cover.
+
+        Every finished unload counts the station's unload time, and trucks still unloading their minutes so far.
+        """
+        fleet = self.fleet
+        utilization = array('d')
+        for station in self.simulation.stations:
+            busy = station.num_trucks_unloaded * station.unload_minutes
+            for position, truck_id in enumerate(station.truck_queue):
+                if position == station.bays:
+                    break
+                if fleet.state[truck_id] == TruckState.UNLOADING:
+                    busy += fleet.elapsed[truck_id]
+            minutes = station.queue_stats.count * station.bays
+            utilization.append(min(1.0, busy / minutes) if minutes else 0.0)
+        return utilization
+
+    @property
+    def mean_utilization(self) -> float:
+        """
+        Utilization averaged over the stations
+        """
+        return sum(self.utilization) / len(self.utilization)
+
+    def queue_time_percentiles(self, *percentiles: float) -> list[float]:
+        """
+        Get percentiles of the minutes each truck spent queued, interpolating linearly between the closest ranks.
+
+        Args:
+            percentiles (float): Percentiles between 0 and 100, SUMMARY_PERCENTILES by default.
+        """
+        percentiles = percentiles or SUMMARY_PERCENTILES
+        for q in percentiles:
+            if not 0 <= q <= 100:
+                raise ValueError("Invalid value passed for percentile. Value must be between 0 and 100")
+        values = as_numpy(self.fleet.queued_time)
+        if values is None:
+            return [sample_percentile(self.fleet.queued_time, q) for q in percentiles]
+        import numpy as np
+        return [float(value) for value in np.percentile(values, percentiles)]
+
+    def queue_time_histogram(self, bins: int = 10) -> tuple[list[float], list[int]]:
+        """
+        Get the distribution of the minutes each truck spent queued, over equally wide bins.
+
+        Args:
+            bins (int): Number of bins between the shortest and the longest queued time.
+
+        Returns:
+            (bins + 1 bin edges, number of trucks in each bin), the last bin includes its upper edge
+        """
+        if bins <= 0:
+            raise ValueError("Invalid value passed for bins. Value must be > 0")
+        values = as_numpy(self.fleet.queued_time)
+        if values is not None:
+            import numpy as np
+            counts, edges = np.histogram(values, bins=bins)
+            return edges.tolist(), counts.tolist()
+        low, high = min(self.fleet.queued_time), max(self.fleet.queued_time)
+        width = (high - low) / bins or 1
+        edges = [low + width * b for b in range(bins)] + [high]
+        counts = [0] * bins
+        for value in self.fleet.queued_time:
+            counts[min(int((value - low) / width), bins - 1)] += 1
+        return edges, counts
+
+    def trucks(self, start: int = 0, stop: int = None) -> dict[str, array]:
+        """
+        Get the results of a range of trucks as columns, without an object per truck.
+
+        Args:
+            start (int): First truck id.
+            stop (int): Truck id after the last one, the end of the fleet by default.
+
+        Returns:
+            truck_id, num_batches_delivered and total_queued_time of each truck, truck ids as a range and
+            the rest as arrays
+        """
+        fleet = self.fleet
+        ids = range(len(fleet))[start:stop]
+        return {"truck_id": ids,
+                "num_batches_delivered": fleet.delivered[ids.start:ids.stop],
+                "total_queued_time": fleet.queued_time[ids.start:ids.stop]}
+
+    def stations(self, start: int = 0, stop: int = None) -> dict[str, array]:
+        """
+        Get the results of a range of stations as columns.
+
+        Args:
+            start (int): First station id.
+            stop (int): Station id after the last one, every station by default.
+
+        Returns:
+            station_id as a range, and num_trucks_unloaded, average_queue_length and utilization as arrays
+        """
+        stations = self.simulation.stations[start:stop]
+        ids = range(len(self.simulation.stations))[start:stop]
+        return {"station_id": ids,
+                "num_trucks_unloaded": array('q', [station.num_trucks_unloaded for station in stations]),
+                "average_queue_length": array('d', [station.get_average_queue_length() for station in stations]),
+                "utilization": self.utilization[ids.start:ids.stop]}
+
+    def summary(self) -> dict:
+        """
+        Get fleet-level totals, the mean station utilization and percentiles of the minutes trucks spent queued
+        """
+        summary = {"trucks": len(self.fleet), "stations": len(self.simulation.stations),
+                   "total_deliveries": self.total_deliveries, "mean_queue_time": self.mean_queue_time}
+        for q, value in zip(SUMMARY_PERCENTILES, self.queue_time_percentiles(*SUMMARY_PERCENTILES)):
+            summary[f"queue_time_p{q}"] = value
+        summary["mean_utilization"] = self.mean_utilization
+        return summary
@@ -0,0 +1,111 @@
+import hashlib
+
+MASK64 = (1 << 64) - 1
+
+# Load times drawn at once by a truck, so most calls to get_load_time are a list pop
+LOAD_TIME_BLOCK = 8
+
+
+def derive_seed(seed: int, *keys) -> int:
+    """
+    Derive an independent 64 bit seed from a parent seed and a path of keys.
+
+    Used to spawn seeds for replicates, policies and other streams from one root seed,
+    the same keys always give the same seed.
+
+    Args:
+        seed (int): Parent seed.
+        keys: Ints or strings identifying the child stream.
+
+    Returns:
+        64 bit seed
+    """
+    text = ":".join(str(part) for part in (seed,) + keys)
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+
+def mix64(z: int) -> int:
+    """
+    Scramble a 64 bit integer with the SplitMix64 finalizer.
+    """
+    z = (z + 0x9E3779B97F4A7C15) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+class LoadTimeStream:
+    def __init__(self, seed: int, low: int = 1 * 60, high: int = 5 * 60, antithetic: bool = False):
+        """
+        Initialize a counter-based stream of truck load times.
+
+        The k-th load time of truck i is a pure function of (seed, i, k), so every truck has its own stream,
+        and results do not depend on the order trucks draw in. Engines, worker processes and checkpoints only
+        need to agree on how many load times each truck has drawn.
+
+        Args:
+            seed (int): Seed of the stream.
+            low (int): Shortest load time in minutes.
+            high (int): Longest load time in minutes, inclusive.
+            antithetic (bool): Mirror every load time within [low, high], so the stream is the antithetic twin
+                of the stream with the same seed, every long load of one is a short load of the other.
+        """
+        self.seed = seed
+        self.low = low
+        self.high = high
+        self.antithetic = antithetic
+        self.key = mix64(seed & MASK64)
+        # A draw is first + step * (a scrambled counter % span), counting down from high in an antithetic stream
+        self.first, self.step = (high, -1) if antithetic else (low, 1)
+
+    def draw(self, truck_id: int, index: int) -> int:
+        """
+        Get one load time.
+
+        Args:
+            truck_id (int): ID of the truck drawing.
+            index (int): How many load times the truck has drawn before this one.
+        """
+        return self.first + self.step * (mix64(mix64(self.key ^ truck_id) ^ index) % (self.high - self.low + 1))
+
+    def draw_block(self, truck_id: int, start: int, count: int) -> list[int]:
+        """
+        Get consecutive load times of one truck.
+
+        Args:
+            truck_id (int): ID of the truck drawing.
+            start (int): Index of the first load time.
+            count (int): Number of load times.
+        """
+        truck_key = mix64(self.key ^ truck_id)
+        span = self.high - self.low + 1
+        first = self.first
+        step = self.step
+        return [first + step * (mix64(truck_key ^ index) % span) for index in range(start, start + count)]
+
+    def draw_array(self, truck_ids, indices):
+        """
+        Get one load time for each truck in a NumPy array, bit for bit equal to draw().
+
+        Args:
+            truck_ids: NumPy array of truck IDs.
+            indices: NumPy array with the index of each truck's load time.
+
+        Returns:
+            NumPy int64 array of load times
+        """
+        import numpy as np
+        keys = _mix64_array(np.uint64(self.key) ^ truck_ids.astype(np.uint64))
+        draws = _mix64_array(keys ^ indices.astype(np.uint64)) % np.uint64(self.high - self.low + 1)
+        return self.step * draws.astype(np.int64) + self.first
+
+
+def _mix64_array(z):
+    """
+    Vectorized SplitMix64 finalizer over a NumPy uint64 array, wrapping on overflow like the masked version.
+    """
+    import numpy as np
+    z = z + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
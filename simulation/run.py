@@ -1,69 +1,311 @@
 import argparse
+import math
+import random
+import shlex
+import sys
+from contextlib import nullcontext
+from array import array
+from functools import reduce
+from simulation.config import SimulationConfig, DEFAULT_CONFIG, HISTORY_MODES
+from simulation.rng import LoadTimeStream
 from simulation.truck import MiningTruck, TruckState
+from simulation.fleet import TruckFleet
 from simulation.station import MiningUnloadStation
+from simulation.stats import QueueStats
+from simulation.dispatch import DISPATCHERS, DispatchPolicy
+from simulation.results import SimulationResults
+from simulation.sinks import ResultSink, TextSink, SINKS, open_sink
+
+# Engines that can advance a simulation, selectable with --engine
+ENGINES = ("tick", "event", "vector", "kernel", "shard")
+
+# Dispatchers the kernel engine can run, it only joins the shortest queue
+KERNEL_DISPATCHERS = ("indexed", "linear")
+
+# Ways of storing the trucks, selectable with --fleet
+FLEETS = ("objects", "arrays")
 
 class LunarMiningSimulation:
-    def __init__(self, num_trucks: int, num_stations: int):
+    def __init__(self, num_trucks: int, num_stations: int, engine: str = "tick", dispatch: str = "indexed",
+                 record_history: bool = False, seed: int = None, fleet: str = "objects", instrumentation=None,
+                 sink: ResultSink = None, snapshot_interval: int = None, checkpoint: str = None,
+                 checkpoint_interval: int = None, config: SimulationConfig = None, antithetic: bool = False,
+                 workers: int = None, event_log: str = None, event_log_interval: int = None):
         """
         Initialize Simulation.
 
         Args:
             num_trucks (int): Number of MiningTrucks to simulate.
             num_stations (int): Number of MiningUnloadStations to simulate.
+            engine (str): Engine used by run(), "tick" steps every truck every minute,
+                "event" only wakes trucks when they change state, "vector" advances the fleet as NumPy arrays,
+                "kernel" runs the tick loop over typed arrays, compiled with Numba when it is installed,
+                "shard" steps ranges of trucks in worker processes over shared memory and dispatches them here.
+            dispatch (str): Dispatch policy picking the station each arriving truck queues at, a name from
+                DISPATCHERS or a DispatchPolicy subclass. "indexed" (the default) and "linear" pick the shortest
+                queue, the lowest station id on a tie, with a heap or by scanning every station.
+            record_history (bool): Keep every station's queue length for every minute, not only running statistics.
+                Shorthand for a config with history "full", a config with another history takes precedence.
+            seed (int): Seed of the trucks' load times, the same seed gives the same results on every engine.
+                Defaults to a seed drawn from the random module.
+            fleet (str): How trucks are stored, "objects" creates a MiningTruck per truck, "arrays" keeps the
+                whole fleet in flat typed arrays for very large fleets. Only the event, vector, kernel and
+                shard engines can run an array-backed fleet. An existing TruckFleet, such as one read from a checkpoint,
+                is run in place.
+            instrumentation (Instrumentation): Tracer that runs the engine and records transitions and phase times,
+                runs are not instrumented without one.
+            sink (ResultSink): Where results and snapshots are written, defaults to text on stdout.
+            snapshot_interval (int): Simulated minutes between snapshots of every truck and station written to
+                the sink while the simulation runs, no snapshots are written by default.
+            checkpoint (str): File the full state is saved to when run() finishes, see simulation.checkpoint.
+            checkpoint_interval (int): Simulated minutes between checkpoints saved while the simulation runs.
+            config (SimulationConfig): Horizon, durations and history of the run, defaults to the original
+                72 hour operation.
+            antithetic (bool): Mirror every load time drawn from the seed within the load time range, so a run
+                and its antithetic twin see negatively correlated load times.
+            workers (int): Worker processes of the shard engine, defaults to the number of CPUs.
+            event_log (str): File every truck state change, station assignment and finished unload of run() is
+                logged to, see simulation.eventlog. Logged runs are stepped by the tick loop, whatever the engine,
+                and need truck objects.
+            event_log_interval (int): Simulated minutes between the index checkpoints of the event log, replays
+                seek to the checkpoint before the minute they rebuild. 60 by default.
         """
         # Validate that the number of trucks and unload stations are valid selections
         if num_trucks <= 0:
             raise ValueError("Invalid value passed for number of trucks to simulation. Value must be > 0")
         if num_stations <= 0:
             raise ValueError("Invalid value passed for number of stations to simulation. Value must be > 0")
+        if engine not in ENGINES:
+            raise ValueError(f"Invalid value passed for simulation engine. Value must be one of {', '.join(ENGINES)}")
+        if isinstance(dispatch, str) and dispatch not in DISPATCHERS:
+            raise ValueError(f"Invalid value passed for dispatch. Value must be one of {', '.join(DISPATCHERS)}")
+        if engine == "kernel" and dispatch not in KERNEL_DISPATCHERS:
+            raise ValueError(f"Invalid value passed for dispatch. The kernel engine only runs "
+                             f"{', '.join(KERNEL_DISPATCHERS)}")
+        if not isinstance(fleet, TruckFleet) and fleet not in FLEETS:
+            raise ValueError(f"Invalid value passed for fleet. Value must be one of {', '.join(FLEETS)}")
+        if isinstance(fleet, TruckFleet) and len(fleet) != num_trucks:
+            raise ValueError("Invalid value passed for fleet. The fleet must have num_trucks trucks")
+        if (isinstance(fleet, TruckFleet) or fleet == "arrays") and engine == "tick":
+            raise ValueError("Invalid value passed for fleet. The tick engine needs a fleet of truck objects")
+        if snapshot_interval is not None and snapshot_interval <= 0:
+            raise ValueError("Invalid value passed for snapshot interval. Value must be > 0")
+        if checkpoint_interval is not None and (checkpoint_interval <= 0 or checkpoint is None):
+            raise ValueError("Invalid value passed for checkpoint interval. Value must be > 0 with a checkpoint file")
+        if workers is not None and workers <= 0:
+            raise ValueError("Invalid value passed for workers. Value must be > 0")
+        if event_log_interval is not None and (event_log_interval <= 0 or event_log is None):
+            raise ValueError("Invalid value passed for event log interval. Value must be > 0 with an event log file")
+        if event_log is not None and (isinstance(fleet, TruckFleet) or fleet == "arrays"):
+            raise ValueError("Invalid value passed for fleet. An event log is recorded from truck objects")
+        if event_log is not None and instrumentation is not None:
+            raise ValueError("Invalid value passed for event log. Traced runs cannot be logged")
+        config = config if config is not None else DEFAULT_CONFIG
+        if record_history and config.history == "none":
+            config = config.replace(history="full")
+        self.config: SimulationConfig = config
         self.num_trucks: int = num_trucks
         self.num_stations: int = num_stations
+        self.engine: str = engine
+        self.seed: int = seed if seed is not None else random.getrandbits(64)
+        # Class of every truck, indexing the config's truck_table and load_time_streams
+        self.truck_class: array = config.truck_class_indices(num_trucks)
+        # One load time stream per truck class, all of the same seed, so a truck's draws only differ in range
+        self.load_time_streams = [LoadTimeStream(self.seed, truck_class.load_min, truck_class.load_max, antithetic)
+                                  for truck_class in config.truck_table]
+        # Stream of the first class, the stream of every truck without truck classes
+        self.load_times = self.load_time_streams[0]
+        self.instrumentation = instrumentation
+        self.sink: ResultSink = sink if sink is not None else TextSink()
+        self.snapshot_interval = snapshot_interval
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.workers = workers
+        self.event_log = event_log
+        self.event_log_interval = event_log_interval
 
-        # Run the simulation for 72 hours
-        self.simulation_minutes = 72 * 60
+        # Run the simulation over the configured horizon, 72 hours by default
+        self.simulation_minutes = config.horizon_minutes
+        # Minutes simulated so far, over every call to run()
+        self.minute = 0
 
-        self.trucks: list[MiningTruck] = []
-        for i in range(self.num_trucks):
-            self.trucks.append(MiningTruck(i))
+        # Array-backed fleet, None when trucks are objects
+        self.fleet: TruckFleet = None
+        if isinstance(fleet, TruckFleet):
+            self.fleet = fleet
+            self.trucks = self.fleet
+        elif fleet == "arrays":
+            self.fleet = TruckFleet(self.num_trucks, self.load_time_streams, self.truck_class)
+            # Iterating the fleet yields read-only records with the same fields as MiningTruck
+            self.trucks = self.fleet
+        else:
+            self.trucks: list[MiningTruck] = []
+            for i, c in enumerate(self.truck_class):
+                self.trucks.append(MiningTruck(i, self.load_time_streams[c], config, config.truck_table[c]))
 
         self.stations: list[MiningUnloadStation] = []
-        for i in range(self.num_stations):
-            self.stations.append(MiningUnloadStation(i))
+        for i, c in enumerate(config.station_class_indices(num_stations)):
+            station_class = config.station_table[c]
+            self.stations.append(MiningUnloadStation(i, history=config.new_history(),
+                                                     unload_minutes=station_class.unload_minutes,
+                                                     bays=station_class.bays))
+
+        # Stations keep the dispatcher up to date as their queues change
+        policy = DISPATCHERS[dispatch] if isinstance(dispatch, str) else dispatch
+        self.dispatcher: DispatchPolicy = policy(self.stations, seed=self.seed)
+        for station in self.stations:
+            station.dispatcher = self.dispatcher
 
     def get_station_shortest_queue(self) -> MiningUnloadStation:
         """
-        Find the station with the shortest queue.
+        Find the station with the shortest queue, the fewest trucks waiting for a bay, the lowest station id
+        on a tie.
+
+        Only looks at the queues, so it neither depends on nor advances the dispatch policy.
 
         Return:
             Mining Unload Station with the shortest queue
         """
-        shortest_queue_station = self.stations[0]
-        for station in self.stations:
-            if station.get_queue_length() < shortest_queue_station.get_queue_length():
-                shortest_queue_station = station
-        return shortest_queue_station
+        return min(self.stations, key=MiningUnloadStation.get_backlog)
+
+    def truck_parameters(self) -> tuple[list[int], list[int], list[int]]:
+        """
+        Look up the parameters of every truck in the tables of its class, for engines that keep trucks in arrays.
+
+        Returns:
+            (first, span, travel) of every truck, its k-th load time is first + step * (a scrambled counter % span)
+            with the step of load_times, and its drive takes travel minutes each way
+        """
+        streams = self.load_time_streams
+        firsts = [stream.first for stream in streams]
+        spans = [stream.high - stream.low + 1 for stream in streams]
+        travels = [truck_class.travel_minutes for truck_class in self.config.truck_table]
+        return ([firsts[c] for c in self.truck_class], [spans[c] for c in self.truck_class],
+                [travels[c] for c in self.truck_class])
 
     def assign_truck_to_station(self, truck: MiningTruck):
         """
-        Assign the given truck to the station with the shortest queue.
-        If it is at the front of the newly joined queue, start unloading.
+        Assign the given truck to the station picked by the dispatch policy, the shortest queue by default.
+        If a bay of the newly joined queue is free, start unloading.
 
         Args:
             truck: Mining Truck to assign to a station
         """
-        station = self.get_station_shortest_queue()
+        station = self.dispatcher.select(truck.truck_id)
         truck.station_id = station.station_id
-        station.truck_queue.append(truck.truck_id)
-        # If the truck just joined an empty queue, it should start unloading
-        if station.get_queue_length() == 1:
+        truck.minutes_required_in_state = station.unload_minutes
+        station.add_truck(truck.truck_id)
+        # If the truck just joined a queue with a free bay, it should start unloading
+        if station.get_queue_length() <= station.bays:
             truck.state = TruckState.UNLOADING
 
 
-    def run(self):
+    def run(self) -> SimulationResults:
         """
-        Run the simulation for 72 hours, checking truck and station status every minute.
+        Run the simulation over simulation_minutes, 72 hours by default, with the selected engine.
+
+        Returns:
+            results of the simulation, aggregated only when asked for
         """
         print(f"Running Simulation with {self.num_trucks} trucks and {self.num_stations} stations")
+        # Chosen once per run, the engines themselves never check for instrumentation, snapshots, checkpoints or
+        # event logs
+        if (self.instrumentation is None and self.snapshot_interval is None and self.checkpoint_interval is None
+                and self.event_log is None):
+            self.advance()
+            self.minute += self.simulation_minutes
+        else:
+            self.run_periods()
+        if self.checkpoint is not None:
+            self.save_checkpoint(self.checkpoint)
+        return SimulationResults(self)
+
+    def run_periods(self):
+        """
+        Run the simulation in short periods, tracing, snapshotting, checkpointing and logging in between.
+
+        Every engine can continue from the state left by another run, so each period is a short run of its own.
+        Periods are as long as the largest step that divides the instrumentation, snapshot, checkpoint and
+        event log intervals. The instrumentation traces every period and the event log logs it, while snapshots
+        and checkpoints are written at the end of the periods that complete their interval.
+        """
+        end = self.simulation_minutes
+        advance = self.instrumentation.advance if self.instrumentation is not None else LunarMiningSimulation.advance
+        event_log = None
+        if self.event_log is not None:
+            from simulation.eventlog import EventLogWriter
+            event_log = EventLogWriter(self.event_log, self, self.event_log_interval)
+            advance = event_log.advance
+        intervals = [interval for interval in (self.snapshot_interval, self.checkpoint_interval,
+                                               self.instrumentation and self.instrumentation.interval,
+                                               event_log and event_log.interval) if interval]
+        step = reduce(math.gcd, intervals)
+        try:
+            for start in range(0, end, step):
+                self.simulation_minutes = min(step, end - start)
+                advance(self)
+                self.minute += self.simulation_minutes
+                done = start + self.simulation_minutes
+                if self.snapshot_interval is not None and (done % self.snapshot_interval == 0 or done == end):
+                    self.write_snapshot(self.minute)
+                if self.checkpoint_interval is not None and done % self.checkpoint_interval == 0 and done < end:
+                    self.save_checkpoint(self.checkpoint)
+        finally:
+            self.simulation_minutes = end
+            if event_log is not None:
+                event_log.close()
+
+    def save_checkpoint(self, path: str):
+        """
+        Save the full state of the simulation to a checkpoint file, see simulation.checkpoint.load to restore it.
+        """
+        from simulation.checkpoint import save
+        save(self, path)
+
+    def reset_statistics(self):
+        """
+        Zero every delivery count, queued time and queue statistic, keeping trucks and stations where they are.
+
+        Used after loading a warmed-up checkpoint, so the results only cover the steady state that follows.
+        """
+        if self.fleet is not None:
+            self.fleet.delivered = array('i', bytes(4 * len(self.fleet)))
+            self.fleet.queued_time = array('i', bytes(4 * len(self.fleet)))
+        else:
+            for truck in self.trucks:
+                truck.num_batches_delivered = 0
+                truck.total_queued_time = 0
+        for station in self.stations:
+            station.num_trucks_unloaded = 0
+            station.queue_stats = QueueStats()
+            station.queue_length_over_time = self.config.new_history()
+
+    def advance(self):
+        """
+        Advance the simulation over simulation_minutes with the selected engine.
+        """
+        if self.engine == "event":
+            # Engines are imported by the runs that use them, so the command line starts faster
+            from simulation.events import EventEngine
+            EventEngine(self).run()
+        elif self.engine == "vector":
+            # NumPy is optional, only import it when the vectorized engine is used
+            from simulation.vectorized import VectorEngine
+            VectorEngine(self).run()
+        elif self.engine == "kernel":
+            # Numba is optional as well, and compiling the kernel is only paid for by runs that use it
+            from simulation.kernel import KernelEngine
+            KernelEngine(self).run()
+        elif self.engine == "shard":
+            from simulation.shard import ShardEngine
+            ShardEngine(self, self.workers).run()
+        else:
+            self.run_ticks()
+
+    def run_ticks(self):
+        """
+        Run the simulation, checking truck and station status every minute.
+        """
         for minute in range(self.simulation_minutes):
             for truck in self.trucks:
                 # For each truck, check for state changes
@@ -76,29 +318,274 @@ class LunarMiningSimulation:
                 # For each station, check if the line has moved
                 station.process_queue(self.trucks)
 
+    def write_snapshot(self, minute: int):
+        """
+        Write the state of every truck and the queue of every station to the sink.
+
+        Args:
+            minute (int): Simulated minute the snapshot is taken at.
+        """
+        self.sink.write("truck_snapshots", ((minute, truck.truck_id, str(truck.state), truck.station_id,
+                                             truck.num_batches_delivered, truck.total_queued_time)
+                                            for truck in self.trucks))
+        self.sink.write("station_snapshots", ((minute, station.station_id, station.get_queue_length(),
+                                               station.num_trucks_unloaded) for station in self.stations))
+
+    def result_rows(self) -> dict:
+        """
+        Get the rows of statistics for each truck and station, by table
+        """
+        return {"trucks": ((truck.truck_id, truck.num_batches_delivered, truck.total_queued_time)
+                           for truck in self.trucks),
+                "stations": ((station.station_id, station.num_trucks_unloaded, station.get_average_queue_length())
+                             for station in self.stations)}
+
     def output_results(self):
         """
-        Print statistics for each truck and station
+        Write statistics for each truck and station to the sink, printed as text by default
         """
-        for truck in self.trucks:
-            print(f"Truck {truck.truck_id}: {truck.num_batches_delivered} loads delivered, {truck.total_queued_time} minutes spent queued for an unload station")
-        for station in self.stations:
-            print(f"Station {station.station_id}: {station.num_trucks_unloaded} loads recieved, average queue length {'%.2f' % station.get_average_queue_length()}")
+        for table, rows in self.result_rows().items():
+            self.sink.write(table, rows)
+        self.sink.flush()
 
+    def output_summary(self, results: SimulationResults):
+        """
+        Write only the fleet-level summary of the results to the sink, see SimulationResults.summary
+        """
+        self.sink.write("summary", results.summary().items())
+        self.sink.flush()
 
-def main():
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Build the parser of the command line arguments of one run, also used for every line of a batch
+    """
     # Parse number of trucks and number of unload stations to simulate from command line arguments
     parser = argparse.ArgumentParser(
         prog='LunarMiningSimulation',
         description='Simulates a lunar mining operation with N trucks and M unload sites'
     )
-    parser.add_argument('num_trucks', type=int)
-    parser.add_argument('num_stations', type=int)
-    args = parser.parse_args()
+    # Optional for the --batch command line, whose values are the defaults of its lines
+    parser.add_argument('num_trucks', type=int, nargs='?')
+    parser.add_argument('num_stations', type=int, nargs='?')
+    parser.add_argument('--engine', choices=ENGINES, default="tick",
+                        help='tick steps every truck every minute, event only wakes trucks on state changes, '
+                             'vector advances the whole fleet as NumPy arrays, kernel runs the tick loop over typed '
+                             'arrays, compiled with Numba when it is installed, shard steps ranges of trucks in '
+                             '--workers processes')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes of the shard engine, the number of CPUs by default')
+    parser.add_argument('--dispatch', choices=list(DISPATCHERS), default="indexed",
+                        help='policy picking the station of each arriving truck, indexed and linear pick the shortest '
+                             'queue with a heap or a scan')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='seed of the trucks\' load times, the same seed gives the same results on every engine')
+    parser.add_argument('--antithetic', action='store_true',
+                        help='mirror every load time of the seed, the antithetic twin of the run without it')
+    parser.add_argument('--fleet', choices=FLEETS, default="objects",
+                        help='arrays stores trucks in flat typed arrays, for very large fleets on any engine but '
+                             'tick')
+    parser.add_argument('--trace', action='store_true',
+                        help='print state transitions and loop phase times per simulated hour to stderr')
+    parser.add_argument('--profile', metavar='PATH', default=None,
+                        help='write a profile of the run, folded stacks for a flamegraph if PATH ends in .folded, '
+                             'otherwise a cProfile dump')
+    parser.add_argument('--output-format', choices=list(SINKS), default="text",
+                        help='text prints results, csv, jsonl and parquet write one file per table to --output')
+    parser.add_argument('--output', metavar='PATH', default=None,
+                        help='file for text output, directory for every other format')
+    parser.add_argument('--snapshot-interval', type=int, default=None, metavar='MINUTES',
+                        help='write the state of every truck and station every MINUTES simulated minutes')
+    parser.add_argument('--checkpoint', metavar='PATH', default=None,
+                        help='save the full state of the simulation to PATH when it finishes')
+    parser.add_argument('--checkpoint-interval', type=int, default=None, metavar='MINUTES',
+                        help='also save the checkpoint every MINUTES simulated minutes while running')
+    parser.add_argument('--resume', metavar='PATH', default=None,
+                        help='continue the run saved in the checkpoint PATH until its horizon is simulated, '
+                             'with --seed the remaining load times are drawn from a new stream')
+    parser.add_argument('--config', metavar='FILE', default=None,
+                        help='TOML file with the horizon, durations and history of the run, the flags below override it')
+    parser.add_argument('--horizon', type=int, default=None, metavar='MINUTES',
+                        help='simulated minutes, 4320 (72 hours) by default')
+    parser.add_argument('--load-min', type=int, default=None, metavar='MINUTES', help='shortest load time, 60 by default')
+    parser.add_argument('--load-max', type=int, default=None, metavar='MINUTES', help='longest load time, 300 by default')
+    parser.add_argument('--travel', type=int, default=None, metavar='MINUTES',
+                        help='drive between the mining sites and the stations, 30 by default')
+    parser.add_argument('--unload', type=int, default=None, metavar='MINUTES', help='unload time, 5 by default')
+    parser.add_argument('--history', choices=HISTORY_MODES, default=None,
+                        help='queue length history kept by each station, window and downsample keep memory flat '
+                             'however long the horizon is')
+    parser.add_argument('--history-window', type=int, default=None, metavar='MINUTES',
+                        help='minutes kept by the window history')
+    parser.add_argument('--history-resolution', type=int, default=None, metavar='MINUTES',
+                        help='minutes averaged into one value by the downsample history')
+    parser.add_argument('--cache', metavar='PATH', nargs='?', const=None, default=False,
+                        help='answer a seeded run from the sqlite results cache PATH when it was already simulated '
+                             'with the same settings, and cache it otherwise, '
+                             '~/.cache/lunar_mining_simulation/results.sqlite by default')
+    parser.add_argument('--event-log', metavar='PATH', default=None,
+                        help='log every truck state change, station assignment and finished unload to PATH, '
+                             'replay it with python -m simulation.eventlog')
+    parser.add_argument('--event-log-interval', type=int, metavar='MINUTES', default=None,
+                        help='simulated minutes between the index checkpoints replays seek to, 60 by default')
+    parser.add_argument('--summary', action='store_true',
+                        help='write fleet totals, station utilization and queue time percentiles instead of a row '
+                             'per truck and station')
+    parser.add_argument('--batch', metavar='FILE', default=None,
+                        help='run every line of FILE, - for stdin, as the arguments of one run in this process, '
+                             'the arguments given here apply to every line that does not set them')
+    return parser
+
+
+def load_config(path: str, resources: dict) -> SimulationConfig:
+    """
+    Load a TOML config, once per path for all the runs of a batch
+    """
+    configs = resources.setdefault("configs", {})
+    if path not in configs:
+        configs[path] = SimulationConfig.from_toml(path)
+    return configs[path]
+
+
+def open_cache(path: str, resources: dict):
+    """
+    Open the results cache at path, kept open for all the runs of a batch
+    """
+    from simulation.cache import ResultCache
+    caches = resources.setdefault("caches", {})
+    if path not in caches:
+        caches[path] = ResultCache(path)
+    return caches[path]
+
+
+def run_command(parser: argparse.ArgumentParser, args: argparse.Namespace, sink: ResultSink = None,
+                resources: dict = None):
+    """
+    Run the simulation described by parsed command line arguments and write its results.
+
+    Args:
+        parser (argparse.ArgumentParser): Parser of the arguments, reports invalid ones.
+        args (argparse.Namespace): Arguments of the run.
+        sink (ResultSink): Sink shared by the runs of a batch, the run opens its own from --output-format and
+            --output without one and closes it when it finishes.
+        resources (dict): Config files and result caches reused by every run of a batch, see load_config and
+            open_cache. The caller closes the caches.
+    """
+    if args.num_trucks is None or args.num_stations is None:
+        parser.error("the following arguments are required: num_trucks, num_stations")
+    resources = resources if resources is not None else {}
+    overrides = dict(horizon_minutes=args.horizon, load_min=args.load_min, load_max=args.load_max,
+                     travel_minutes=args.travel, unload_minutes=args.unload, history=args.history,
+                     history_window=args.history_window, history_resolution=args.history_resolution)
+    try:
+        if args.config:
+            config = load_config(args.config, resources)
+        elif args.resume:
+            # A resumed run carries on with the config it was saved with
+            from simulation.checkpoint import CheckpointFile
+            with CheckpointFile(args.resume) as checkpoint:
+                config = checkpoint.config
+        else:
+            config = DEFAULT_CONFIG
+        config = config.replace(**overrides)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+
+    # Only whole seeded runs writing every row are cached, a run writing snapshots, checkpoints or a trace
+    # must actually run
+    cache = None
+    if args.cache is not False and args.seed is not None and not (
+            args.resume or args.snapshot_interval or args.checkpoint or args.trace or args.profile or args.summary or
+            args.event_log):
+        from simulation.cache import DEFAULT_PATH, cache_key
+        cache = open_cache(args.cache or DEFAULT_PATH, resources)
+        key = cache_key("run", num_trucks=args.num_trucks, num_stations=args.num_stations, dispatch=args.dispatch,
+                        seed=args.seed, antithetic=args.antithetic, config=config.to_dict())
+        result = cache.get(key)
+        if result is not None:
+            with open_sink(args.output_format, args.output) if sink is None else nullcontext(sink) as run_sink:
+                print(f"Running Simulation with {args.num_trucks} trucks and {args.num_stations} stations")
+                for table, rows in result.items():
+                    run_sink.write(table, map(tuple, rows))
+                run_sink.flush()
+            return
+
+    instrumentation = None
+    if args.trace:
+        from simulation.instrument import Instrumentation
+        instrumentation = Instrumentation()
+    with open_sink(args.output_format, args.output) if sink is None else nullcontext(sink) as run_sink:
+        options = dict(engine=args.engine, dispatch=args.dispatch, seed=args.seed, fleet=args.fleet, config=config,
+                       antithetic=args.antithetic, instrumentation=instrumentation, sink=run_sink,
+                       snapshot_interval=args.snapshot_interval, checkpoint=args.checkpoint,
+                       checkpoint_interval=args.checkpoint_interval, workers=args.workers, event_log=args.event_log,
+                       event_log_interval=args.event_log_interval)
+        if args.resume:
+            from simulation.checkpoint import load
+            if not args.antithetic:
+                # A run saved antithetic stays antithetic
+                del options["antithetic"]
+            simulation = load(args.resume, **options)
+            if (simulation.num_trucks, simulation.num_stations) != (args.num_trucks, args.num_stations):
+                parser.error(f"the checkpoint has {simulation.num_trucks} trucks and {simulation.num_stations} "
+                             f"stations")
+            simulation.simulation_minutes = max(0, simulation.simulation_minutes - simulation.minute)
+        else:
+            simulation = LunarMiningSimulation(args.num_trucks, args.num_stations, **options)
+        if args.profile:
+            from simulation.instrument import profile
+            results = profile(simulation.run, args.profile)
+        else:
+            results = simulation.run()
+        if args.summary:
+            simulation.output_summary(results)
+        else:
+            simulation.output_results()
+    if cache is not None:
+        cache.put(key, {table: list(rows) for table, rows in simulation.result_rows().items()})
+    if instrumentation is not None:
+        instrumentation.report()
+
+
+def main(argv: list[str] = None):
+    """
+    Run the simulation given on the command line, or with --batch every run of a batch file in this process.
+
+    A batch pays for starting the interpreter and importing the simulation once. Its runs share the imported
+    engines and the compiled kernel, config files and result caches are opened once, and runs that do not set
+    --output or --output-format write to one sink in order, each after its "Running Simulation" line.
+    Lines are split like a shell command line, and empty lines and # comments are skipped.
 
-    simulation = LunarMiningSimulation(args.num_trucks, args.num_stations)
-    simulation.run()
-    simulation.output_results()
+    Args:
+        argv (list[str]): Command line arguments, sys.argv by default.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    resources = {}
+    try:
+        if args.batch is None:
+            run_command(parser, args, resources=resources)
+            return
+        # Only a batch file opened here is closed after the batch, stdin stays open
+        source = nullcontext(sys.stdin) if args.batch == "-" else open(args.batch)
+        with source as lines, open_sink(args.output_format, args.output) as sink:
+            for number, line in enumerate(lines, 1):
+                words = shlex.split(line, comments=True)
+                if not words:
+                    continue
+                # Arguments of the batch command line are the defaults of every line
+                line_args = parser.parse_args(words, namespace=argparse.Namespace(**vars(args)))
+                # Positional arguments are always set, to None when a line leaves them out
+                for name in ("num_trucks", "num_stations"):
+                    if getattr(line_args, name) is None:
+                        setattr(line_args, name, getattr(args, name))
+                if line_args.batch != args.batch:
+                    parser.error(f"batch line {number}: batches cannot be nested")
+                own_sink = (line_args.output_format, line_args.output) != (args.output_format, args.output)
+                run_command(parser, line_args, sink=None if own_sink else sink, resources=resources)
+    finally:
+        for cache in resources.get("caches", {}).values():
+            cache.close()
 
 if __name__=="__main__":
     main()
\ No newline at end of file
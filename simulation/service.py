@@ -0,0 +1,556 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count
+from simulation.cache import cache_key
+from simulation.config import SimulationConfig
+from simulation.dispatch import DISPATCHERS
+from simulation.run import LunarMiningSimulation, ENGINES
+from simulation.sweep import ConfigurationSummary, replicate_chunks, run_chunk
+
+# Port the service listens on when no socket path is given
+DEFAULT_PORT = 8765
+
+# Largest request body accepted, job specs are small
+MAX_BODY_BYTES = 1 << 20
+
+# Settings of each kind of job and their defaults, None marks a required setting
+RUN_DEFAULTS = {"kind": "run", "num_trucks": None, "num_stations": None, "seed": None, "engine": "event",
+                "dispatch": "indexed", "config": {}, "truck_rows": False}
+SWEEP_DEFAULTS = {"kind": "sweep", "trucks": None, "stations": None, "replicates": 10, "seed": 0, "engine": "event",
+                  "minutes": None, "config": {}, "chunk_size": None}
+
+# Settings that change how a job runs but not its results, left out of the cache key
+UNCACHED_SETTINGS = ("engine", "chunk_size")
+
+# Reason phrases of the statuses the service answers with
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 503: "Service Unavailable"}
+
+
+def normalize(spec: dict) -> dict:
+    """
+    Check a job spec and fill in its defaults.
+
+    A run without a seed gets a random one, so every job has the seed it ran with in its spec.
+
+    Args:
+        spec (dict): Job as sent by a client, {"kind": "run", ...} or {"kind": "sweep", ...}.
+
+    Returns:
+        complete spec, with its config expanded to every SimulationConfig setting
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("Invalid value passed for job. Value must be a JSON object")
+    kind = spec.get("kind", "run")
+    if kind not in ("run", "sweep"):
+        raise ValueError("Invalid value passed for job kind. Value must be run or sweep")
+    defaults = RUN_DEFAULTS if kind == "run" else SWEEP_DEFAULTS
+    unknown = set(spec) - set(defaults)
+    if unknown:
+        raise ValueError(f"Invalid value passed for job. Unknown settings {', '.join(sorted(unknown))}")
+    spec = dict(defaults, **spec)
+    missing = [name for name, value in spec.items() if value is None and defaults[name] is None
+               and name not in ("seed", "minutes", "chunk_size")]
+    if missing:
+        raise ValueError(f"Invalid value passed for job. Missing settings {', '.join(missing)}")
+    for name in ("num_trucks", "num_stations", "seed", "replicates", "minutes", "chunk_size"):
+        if spec.get(name) is not None and (not isinstance(spec[name], int) or isinstance(spec[name], bool)):
+            raise ValueError(f"Invalid value passed for {name}. Value must be an integer")
+    if spec["engine"] not in ENGINES:
+        raise ValueError(f"Invalid value passed for simulation engine. Value must be one of {', '.join(ENGINES)}")
+    if not isinstance(spec["config"], dict):
+        raise ValueError("Invalid value passed for config. Value must be an object")
+    spec["config"] = SimulationConfig.from_dict(spec["config"]).to_dict()
+
+    if kind == "run":
+        if spec["dispatch"] not in DISPATCHERS:
+            raise ValueError(f"Invalid value passed for dispatch. Value must be one of {', '.join(DISPATCHERS)}")
+        if spec["num_trucks"] <= 0 or spec["num_stations"] <= 0:
+            raise ValueError("Invalid value passed for number of trucks or stations. Values must be > 0")
+        if not isinstance(spec["truck_rows"], bool):
+            raise ValueError("Invalid value passed for truck_rows. Value must be a boolean")
+        if spec["seed"] is None:
+            spec["seed"] = random.getrandbits(64)
+    else:
+        for name in ("trucks", "stations"):
+            if not isinstance(spec[name], list) or not spec[name] \
+                    or not all(isinstance(value, int) and value > 0 for value in spec[name]):
+                raise ValueError(f"Invalid value passed for {name}. Value must be a list of integers > 0")
+        if spec["replicates"] <= 0 or (spec["minutes"] is not None and spec["minutes"] < 0):
+            raise ValueError("Invalid value passed for replicates or minutes. Values must be > 0 and >= 0")
+        if spec["chunk_size"] is not None and spec["chunk_size"] <= 0:
+            raise ValueError("Invalid value passed for chunk size. Value must be > 0")
+    return spec
+
+
+def job_key(spec: dict) -> str:
+    """
+    Get the cache key of a normalized spec, its config and seed with the settings that do not change results
+    left out. Every engine gives the same results for a seed, so a run on one engine answers the others.
+    """
+    return cache_key("job", **{name: value for name, value in spec.items() if name not in UNCACHED_SETTINGS})
+
+
+def run_job(spec: dict) -> dict:
+    """
+    Run one simulation in a worker and reduce it to what the service sends back.
+
+    Returns:
+        total deliveries, mean minutes a truck spent queued, one row per station, and with truck_rows
+        one row per truck
+    """
+    config = SimulationConfig.from_dict(spec["config"])
+    simulation = LunarMiningSimulation(spec["num_trucks"], spec["num_stations"], engine=spec["engine"],
+                                       dispatch=spec["dispatch"], seed=spec["seed"], config=config,
+                                       fleet="objects" if spec["engine"] == "tick" else "arrays")
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = simulation.run()
+    stations = results.stations()
+    result = {
+        "deliveries": results.total_deliveries,
+        "queue_time": results.mean_queue_time,
+        "stations": [list(row) for row in zip(stations["station_id"], stations["num_trucks_unloaded"],
+                                              stations["average_queue_length"])],
+    }
+    if spec["truck_rows"]:
+        trucks = results.trucks()
+        result["trucks"] = [list(row) for row in zip(trucks["truck_id"], trucks["num_batches_delivered"],
+                                                     trucks["total_queued_time"])]
+    return result
+
+
+class Job:
+    __slots__ = ("id", "spec", "key", "status", "result", "error", "cached", "events", "updated")
+
+    def __init__(self, id: str, spec: dict, key: str):
+        """
+        Initialize a job of the service, with the events streamed to its followers.
+
+        Args:
+            id (str): ID clients refer to the job by.
+            spec (dict): Normalized spec of the job.
+            key (str): Cache key of the spec.
+        """
+        self.id = id
+        self.spec = spec
+        self.key = key
+        # queued, running, done or failed
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.cached = False
+        # Every event so far, so a follower that connects late still sees the whole job
+        self.events: list[dict] = []
+        self.updated = asyncio.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    async def emit(self, event: dict):
+        """
+        Record an event and wake every follower
+        """
+        self.events.append(event)
+        async with self.updated:
+            self.updated.notify_all()
+
+    async def follow(self):
+        """
+        Iterate the events of the job, waiting for new ones until it finishes
+        """
+        index = 0
+        while True:
+            while index < len(self.events):
+                yield self.events[index]
+                index += 1
+            if self.finished:
+                return
+            async with self.updated:
+                await self.updated.wait_for(lambda: index < len(self.events) or self.finished)
+
+    def summary(self) -> dict:
+        summary = {"id": self.id, "status": self.status, "cached": self.cached, "spec": self.spec}
+        if self.status == "done":
+            summary["result"] = self.result
+        elif self.status == "failed":
+            summary["error"] = self.error
+        return summary
+
+
+class SimulationService:
+    def __init__(self, workers: int = None, max_queued: int = 1024, max_jobs: int = 4096, cache_size: int = 256):
+        """
+        Initialize a service that runs simulation and sweep jobs on a process pool.
+
+        Jobs wait in a bounded queue and workers take them in order. Every job streams events while it runs:
+        queued, running, for sweeps progress and each configuration as soon as its replicates finish, and then
+        done with the result or failed with the error. Finished results are cached by config and seed, and a job
+        identical to a queued or running one follows that job instead of running again.
+
+        Memory stays bounded however many clients call: at most max_queued jobs wait, at most max_jobs jobs are
+        remembered, the oldest finished ones are forgotten first, and at most cache_size results are cached.
+
+        Args:
+            workers (int): Worker processes, defaults to the number of CPUs.
+            max_queued (int): Jobs that can wait to run, more are refused until the queue drains.
+            max_jobs (int): Jobs whose status and events are remembered.
+            cache_size (int): Finished results kept, the least recently used are dropped first.
+        """
+        if max_queued <= 0 or max_jobs < max_queued or cache_size < 0:
+            raise ValueError("Invalid value passed for service limits. Values must be max_jobs >= max_queued > 0")
+        self.workers = workers or os.cpu_count() or 1
+        self.max_jobs = max_jobs
+        self.cache_size = cache_size
+        self.queue: asyncio.Queue = None
+        self.executor: ProcessPoolExecutor = None
+        self.runners: list[asyncio.Task] = []
+        self.max_queued = max_queued
+        self.jobs: OrderedDict[str, Job] = OrderedDict()
+        self.cache: OrderedDict[str, dict] = OrderedDict()
+        # Queued and running jobs by cache key
+        self.active: dict[str, Job] = {}
+        self.ids = count(1)
+
+    async def start(self):
+        """
+        Start the worker pool and the tasks that take jobs off the queue
+        """
+        self.queue = asyncio.Queue(self.max_queued)
+        # Forked workers would inherit the client connections open when they start and keep them from closing,
+        # workers started from a server process or spawned hold no connections
+        method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context(method))
+        self.runners = [asyncio.ensure_future(self.work()) for _ in range(self.workers)]
+
+    async def close(self):
+        """
+        Stop taking jobs, cancel queued ones and shut the worker pool down.
+
+        Cancelling the runners cancels the sweep chunks they have in flight, and the pool drops every task
+        that has not started. Simulations already running in a worker finish in the background.
+        """
+        for runner in self.runners:
+            runner.cancel()
+        await asyncio.gather(*self.runners, return_exceptions=True)
+        self.runners = []
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def __aenter__(self) -> "SimulationService":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def submit(self, spec: dict) -> Job:
+        """
+        Queue a job, or answer it from the cache or from an identical job already queued or running.
+
+        Raises:
+            ValueError: when the spec is invalid.
+            asyncio.QueueFull: when max_queued jobs are already waiting.
+        """
+        spec = normalize(spec)
+        key = job_key(spec)
+        if key in self.active:
+            return self.active[key]
+        job = Job(str(next(self.ids)), spec, key)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            job.status, job.result, job.cached = "done", self.cache[key], True
+            job.events.append({"event": "done", "cached": True, "result": job.result})
+        else:
+            self.queue.put_nowait(job)
+            job.events.append({"event": "queued"})
+            self.active[key] = job
+        self.jobs[job.id] = job
+        self.forget()
+        return job
+
+    def forget(self):
+        """
+        Drop the oldest finished jobs once more than max_jobs are remembered
+        """
+        excess = len(self.jobs) - self.max_jobs
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished][:max(0, excess)]:
+            del self.jobs[job_id]
+
+    async def work(self):
+        """
+        Run queued jobs one at a time until cancelled
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            job.status = "running"
+            await job.emit({"event": "running"})
+            try:
+                if job.spec["kind"] == "run":
+                    result = await loop.run_in_executor(self.executor, run_job, job.spec)
+                else:
+                    result = await self.run_sweep(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                job.status, job.error = "failed", f"{type(error).__name__}: {error}"
+                await job.emit({"event": "failed", "error": job.error})
+            else:
+                if self.cache_size:
+                    self.cache[job.key] = result
+                    if len(self.cache) > self.cache_size:
+                        self.cache.popitem(last=False)
+                job.status, job.result = "done", result
+                await job.emit({"event": "done", "cached": False, "result": result})
+            finally:
+                self.active.pop(job.key, None)
+                self.queue.task_done()
+
+    async def run_sweep(self, job: Job) -> list[dict]:
+        """
+        Run a sweep on the worker pool, streaming progress and each configuration as it completes.
+
+        Returns:
+            one summary row per configuration, in the order they completed
+        """
+        spec = job.spec
+        loop = asyncio.get_running_loop()
+        chunks = replicate_chunks(spec["trucks"], spec["stations"], spec["replicates"], spec["seed"],
+                                  self.workers, spec["chunk_size"])
+        config = SimulationConfig.from_dict(spec["config"])
+        futures = [loop.run_in_executor(self.executor, run_chunk, chunk, spec["engine"], spec["minutes"], config)
+                   for chunk in chunks]
+        total = sum(len(chunk) for chunk in chunks)
+        pending: dict[tuple[int, int], ConfigurationSummary] = {}
+        rows = []
+        done = 0
+        try:
+            for future in asyncio.as_completed(futures):
+                results = await future
+                done += len(results)
+                await job.emit({"event": "progress", "done": done, "total": total})
+                for num_trucks, num_stations, replicate, deliveries, queue_time in results:
+                    key = (num_trucks, num_stations)
+                    if key not in pending:
+                        pending[key] = ConfigurationSummary(num_trucks, num_stations, spec["replicates"])
+                    pending[key].add(replicate, deliveries, queue_time)
+                    if pending[key].is_complete():
+                        rows.append(pending.pop(key).row())
+                        await job.emit({"event": "partial", "row": rows[-1]})
+        finally:
+            for future in futures:
+                future.cancel()
+        return rows
+
+    def health(self) -> dict:
+        """
+        Count the queued, running and remembered jobs and the cached results
+        """
+        running = sum(job.status == "running" for job in self.active.values())
+        return {"queued": self.queue.qsize(), "running": running, "jobs": len(self.jobs), "cached": len(self.cache),
+                "workers": self.workers}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Answer one HTTP request, the connection is closed afterwards.
+
+        Routes:
+            POST /jobs: submit the job in the JSON body, answers 202 with its id, 200 if it was cached.
+            GET /jobs/<id>: status of a job, with its result once done.
+            GET /jobs/<id>/events: the job's events as newline-delimited JSON, streamed until it finishes.
+            GET /health: queue and cache counts.
+        """
+        try:
+            method, target, _ = (await reader.readline()).decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length", 0))
+            if length > MAX_BODY_BYTES:
+                await self.respond(writer, 413, {"error": "request body too large"})
+                return
+            body = await reader.readexactly(length)
+            await self.route(method, target.split("?")[0].rstrip("/"), body, writer)
+        except (ValueError, asyncio.IncompleteReadError):
+            await self.respond(writer, 400, {"error": "malformed request"})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter):
+        parts = path.strip("/").split("/")
+        if parts == ["jobs"]:
+            if method != "POST":
+                return await self.respond(writer, 405, {"error": "use POST to submit a job"})
+            try:
+                job = self.submit(json.loads(body or b"{}"))
+            except (TypeError, ValueError) as error:
+                return await self.respond(writer, 400, {"error": str(error)})
+            except asyncio.QueueFull:
+                return await self.respond(writer, 503, {"error": f"{self.max_queued} jobs are already queued"})
+            return await self.respond(writer, 200 if job.finished else 202, job.summary())
+        if parts == ["health"]:
+            return await self.respond(writer, 200, self.health())
+        if len(parts) in (2, 3) and parts[0] == "jobs" and method == "GET":
+            job = self.jobs.get(parts[1])
+            if job is None:
+                return await self.respond(writer, 404, {"error": f"no job {parts[1]}"})
+            if len(parts) == 2:
+                return await self.respond(writer, 200, job.summary())
+            if parts[2] == "events":
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nConnection: close\r\n\r\n")
+                async for event in job.follow():
+                    writer.write(json.dumps(event).encode() + b"\n")
+                    await writer.drain()
+                return
+        await self.respond(writer, 404, {"error": f"no route {method} {path}"})
+
+    async def respond(self, writer: asyncio.StreamWriter, status: int, body: dict):
+        payload = json.dumps(body).encode()
+        writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+        await writer.drain()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, path: str = None) -> asyncio.AbstractServer:
+        """
+        Listen for requests on a TCP port, or on a Unix socket when a path is given.
+        """
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle, path=path)
+        return await asyncio.start_server(self.handle, host, port)
+
+
+class ServiceClient:
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT, path: str = None):
+        """
+        Initialize an asyncio client of a SimulationService.
+
+        Args:
+            host (str): Host the service listens on.
+            port (int): Port the service listens on.
+            path (str): Unix socket of the service, used instead of host and port when given.
+        """
+        self.host = host
+        self.port = port
+        self.path = path
+
+    async def request(self, method: str, target: str, body: dict = None):
+        """
+        Send one request and read the status line and headers of the answer.
+
+        Returns:
+            (status, reader, writer), the reader positioned at the body
+        """
+        if self.path is not None:
+            reader, writer = await asyncio.open_unix_connection(self.path)
+        else:
+            reader, writer = await asyncio.open_connection(self.host, self.port)
+        payload = json.dumps(body).encode() if body is not None else b""
+        writer.write(f"{method} {target} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+        await writer.drain()
+        status = int((await reader.readline()).split()[1])
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        return status, reader, writer
+
+    async def call(self, method: str, target: str, body: dict = None) -> dict:
+        """
+        Send a request and decode its JSON answer.
+
+        Raises:
+            ValueError: when the service rejects the request.
+            asyncio.QueueFull: when the service's queue is full.
+        """
+        status, reader, writer = await self.request(method, target, body)
+        try:
+            answer = json.loads(await reader.read())
+        finally:
+            writer.close()
+        if status == 503:
+            raise asyncio.QueueFull(answer["error"])
+        if status >= 400:
+            raise ValueError(f"Invalid value passed for request. {answer['error']}")
+        return answer
+
+    async def submit(self, spec: dict) -> dict:
+        return await self.call("POST", "/jobs", spec)
+
+    async def status(self, id: str) -> dict:
+        return await self.call("GET", f"/jobs/{id}")
+
+    async def health(self) -> dict:
+        return await self.call("GET", "/health")
+
+    async def events(self, id: str):
+        """
+        Iterate the events of a job as the service streams them
+        """
+        status, reader, writer = await self.request("GET", f"/jobs/{id}/events")
+        try:
+            if status != 200:
+                raise ValueError(f"Invalid value passed for job. {json.loads(await reader.read())['error']}")
+            async for line in reader:
+                yield json.loads(line)
+        finally:
+            writer.close()
+
+    async def run(self, spec: dict, on_event=None):
+        """
+        Submit a job and wait for its result, passing every event to on_event as it arrives.
+
+        Returns:
+            result of the job
+        """
+        job = await self.submit(spec)
+        async for event in self.events(job["id"]):
+            if on_event is not None:
+                on_event(event)
+            if event["event"] == "done":
+                return event["result"]
+            if event["event"] == "failed":
+                raise RuntimeError(event["error"])
+
+
+async def serve_forever(args):
+    async with SimulationService(args.workers, args.max_queued, cache_size=args.cache_size) as service:
+        server = await service.serve(args.host, args.port, args.socket)
+        where = args.socket or f"http://{args.host}:{args.port}"
+        print(f"Serving simulations on {where} with {service.workers} workers", flush=True)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='LunarMiningService',
+        description='Serves simulation and sweep jobs over HTTP, running them on a process pool'
+    )
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--socket', metavar='PATH', default=None, help='listen on a Unix socket instead of a port')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-queued', type=int, default=1024, help='jobs that can wait before new ones are refused')
+    parser.add_argument('--cache-size', type=int, default=256, help='finished results kept in memory')
+    args = parser.parse_args()
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(serve_forever(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import multiprocessing
+import os
+from array import array
+from multiprocessing import shared_memory
+from threading import BrokenBarrierError
+from simulation.fleet import TruckFleet
+from simulation.kernel import JIT, UNLOADING, step_trucks
+from simulation.rng import mix64
+
+# Bytes every array of a shared block is aligned to
+ALIGNMENT = 8
+
+
+def block_size(layout: list[tuple[str, int]]) -> int:
+    """
+    Get the bytes of a block holding one array per (typecode, length) of layout, each aligned to ALIGNMENT
+    """
+    return sum(-(-array(typecode).itemsize * length // ALIGNMENT) * ALIGNMENT for typecode, length in layout)
+
+
+def typed_views(buffer, layout: list[tuple[str, int]], compiled: bool = False) -> list:
+    """
+    View a block as one array per (typecode, length) of layout, without copying it.
+
+    Args:
+        buffer: Shared memory buffer or bytearray of block_size(layout) bytes.
+        layout (list[tuple[str, int]]): Typecode and length of every array, in the order they are stored.
+        compiled (bool): View the arrays as NumPy arrays for compiled code instead of typed memoryviews.
+    """
+    if compiled:
+        import numpy as np
+    views = []
+    offset = 0
+    for typecode, length in layout:
+        nbytes = array(typecode).itemsize * length
+        if compiled:
+            views.append(np.ndarray(length, dtype=np.dtype(typecode), buffer=buffer, offset=offset))
+        else:
+            views.append(memoryview(buffer)[offset:offset + nbytes].cast(typecode))
+        offset += -(-nbytes // ALIGNMENT) * ALIGNMENT
+    return views
+
+
+def close_block(block: shared_memory.SharedMemory):
+    """
+    Close this process's mapping of a shared block
+    """
+    try:
+        block.close()
+    except BufferError:
+        # Views held by the traceback of a failed run keep the mapping open until they are freed
+        pass
+
+
+def step_shard(buffer, layout: list[tuple[str, int]], start: int, stop: int, index: int, minutes: int, step: int,
+               barrier):
+    """
+    Step the trucks from start to stop through every minute, waiting for the coordinator after each minute.
+    """
+    *trucks, keys, first, span, travel, arrived, finished, counts = typed_views(buffer, layout, JIT)
+    for _ in range(minutes):
+        counts[2 * index], counts[2 * index + 1] = step_trucks(start, stop, *trucks, keys, first, step, span, travel,
+                                                               arrived, finished)
+        # Once every shard has stepped, the coordinator dispatches and moves the station lines
+        barrier.wait()
+        barrier.wait()
+
+
+def run_worker(name: str, layout: list[tuple[str, int]], start: int, stop: int, index: int, minutes: int, step: int,
+               barrier):
+    """
+    Run one shard of a ShardEngine in a worker process, over the shared block called name
+    """
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        step_shard(block.buf, layout, start, stop, index, minutes, step, barrier)
+    except BrokenBarrierError:
+        # The coordinator or another shard stopped the run
+        pass
+    except BaseException:
+        barrier.abort()
+        raise
+    finally:
+        close_block(block)
+
+
+class ShardEngine:
+    def __init__(self, simulation, workers: int = None):
+        """
+        Initialize an engine that splits the fleet into contiguous ranges of trucks stepped by worker processes,
+        for single operations too large for one core.
+
+        The fleet, the per-truck parameter tables and the workers' output live in one block of shared memory.
+        Every minute each worker steps its range of trucks, writing the trucks that need a station and the
+        stations of the trucks that finished unloading. The coordinator then dispatches the arriving trucks
+        in truck id order, as assign_truck_to_station does on the tick engine, with the simulation's dispatcher,
+        and moves the lines of the stations whose head trucks finished. Trucks only depend on each other
+        through the stations, so results match the tick engine bit for bit for the same seed.
+
+        Workers step trucks with the kernel engine's per-truck step, compiled by Numba when it is installed.
+        Only the work of stepping trucks is split, dispatch stays in the coordinator, so the speedup grows
+        with the number of trucks per station arrival.
+
+        Args:
+            simulation (LunarMiningSimulation): Simulation whose trucks and stations are advanced in place,
+                either truck objects or an array-backed fleet.
+            workers (int): Worker processes, defaults to the number of CPUs. 1 steps every truck in this process.
+        """
+        if workers is not None and workers <= 0:
+            raise ValueError("Invalid value passed for workers. Value must be > 0")
+        self.simulation = simulation
+        self.workers = workers or os.cpu_count() or 1
+
+    def run(self):
+        """
+        Advance the simulation over simulation_minutes, stepping the trucks in the workers minute by minute.
+        """
+        sim = self.simulation
+        fleet = sim.fleet if sim.fleet is not None else TruckFleet.from_trucks(sim.trucks)
+        num_trucks = len(fleet)
+        size = -(-num_trucks // min(self.workers, num_trucks))
+        shards = [(start, min(start + size, num_trucks)) for start in range(0, num_trucks, size)]
+
+        # Fleet columns, then load keys, first load times, load time spans and travel times by truck,
+        # the trucks needing a station and the stations of finished trucks written by each shard from its start,
+        # and how many of each every shard wrote
+        layout = ([(column.typecode, len(column)) for column in fleet.columns()] +
+                  [('Q', num_trucks), ('q', num_trucks), ('Q', num_trucks), ('q', num_trucks), ('i', num_trucks),
+                   ('i', num_trucks), ('q', 2 * len(shards))])
+        if len(shards) == 1:
+            block, barrier, processes = None, None, []
+            buffer = bytearray(block_size(layout))
+        else:
+            block = shared_memory.SharedMemory(create=True, size=block_size(layout))
+            buffer = block.buf
+            context = multiprocessing.get_context()
+            barrier = context.Barrier(len(shards) + 1)
+            processes = [context.Process(target=run_worker, daemon=True,
+                                         args=(block.name, layout, start, stop, index, sim.simulation_minutes,
+                                               sim.load_times.step, barrier))
+                         for index, (start, stop) in enumerate(shards)]
+        try:
+            self.coordinate(fleet, buffer, layout, shards, barrier, processes)
+        except BaseException:
+            # Workers waiting for this minute's dispatch stop instead
+            if barrier is not None:
+                barrier.abort()
+            raise
+        finally:
+            for process in processes:
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.terminate()
+            if block is not None:
+                close_block(block)
+                block.unlink()
+
+        if sim.fleet is None:
+            fleet.write_to(sim.trucks)
+
+    def coordinate(self, fleet: TruckFleet, buffer, layout: list[tuple[str, int]], shards: list[tuple[int, int]],
+                   barrier, processes: list):
+        """
+        Copy the fleet into the block, start the workers and dispatch every minute, then copy the fleet back.
+        Without workers the single shard is stepped here.
+        """
+        sim = self.simulation
+        stations = sim.stations
+        end = sim.simulation_minutes
+        select = sim.dispatcher.select
+        columns = fleet.columns()
+        views = typed_views(buffer, layout)
+        # The coordinator only writes the state, minutes required and station of trucks
+        state, _, required, station_id = views[:4]
+        arrived, finished, counts = views[-3:]
+
+        first, span, travel = sim.truck_parameters()
+        keys = [mix64(sim.load_times.key ^ i) for i in range(len(fleet))]
+        for view, values in zip(views, columns + (keys, first, span, travel)):
+            view[:] = values if isinstance(values, array) else array(view.format, values)
+
+        # Arguments of step_trucks after the range of trucks, the same arrays as views for compiled code
+        compiled = typed_views(buffer, layout, JIT)
+        step_args = (*compiled[:9], sim.load_times.step, *compiled[9:13])
+        if processes:
+            if JIT:
+                # Compile the step before the workers start, so forked workers share the compiled code
+                step_trucks(0, 0, *step_args)
+            for process in processes:
+                process.start()
+
+        # Minute from which each station's current queue length counts towards its statistics
+        last_change = [0] * len(stations)
+
+        for minute in range(end):
+            if processes:
+                try:
+                    barrier.wait()
+                except BrokenBarrierError:
+                    raise RuntimeError("A shard worker failed, see its traceback above") from None
+            else:
+                counts[0], counts[1] = step_trucks(0, len(fleet), *step_args)
+
+            # Arriving trucks join a queue in truck id order, shards are in truck id order as well
+            for index, (start, stop) in enumerate(shards):
+                for i in arrived[start:start + counts[2 * index]]:
+                    station = select(i)
+                    queue = station.truck_queue
+                    s = station.station_id
+                    station.record_queue_length(minute - last_change[s])
+                    last_change[s] = minute
+                    station.add_truck(i)
+                    station_id[i] = s
+                    required[i] = station.unload_minutes
+                    if len(queue) <= station.bays:
+                        state[i] = UNLOADING
+
+            # Stations whose head trucks finished unloading move their line
+            for index, (start, stop) in enumerate(shards):
+                for s in finished[start:start + counts[2 * index + 1]]:
+                    station = stations[s]
+                    queue = station.truck_queue
+                    station.record_queue_length(minute + 1 - last_change[s])
+                    last_change[s] = minute + 1
+                    station.remove_head()
+                    station.num_trucks_unloaded += 1
+                    if len(queue) >= station.bays:
+                        # The first truck waiting for a bay starts unloading in the freed one
+                        state[queue[station.bays - 1]] = UNLOADING
+
+            if processes:
+                barrier.wait()
+
+        for station in stations:
+            station.record_queue_length(end - last_change[station.station_id])
+        for column, view in zip(columns, views):
+            memoryview(column)[:] = view
@@ -0,0 +1,243 @@
+import importlib.util
+import os
+import sys
+
+# Columns and value types of every table a simulation writes, in order
+TABLES = {
+    "trucks": (("truck_id", int), ("loads_delivered", int), ("minutes_queued", int)),
+    "stations": (("station_id", int), ("loads_received", int), ("average_queue_length", float)),
+    "truck_snapshots": (("minute", int), ("truck_id", int), ("state", str), ("station_id", int),
+                        ("loads_delivered", int), ("minutes_queued", int)),
+    "station_snapshots": (("minute", int), ("station_id", int), ("queue_length", int), ("loads_received", int)),
+    "summary": (("metric", str), ("value", float)),
+}
+
+# Line printed by the text sink for a row of each table
+TEXT_FORMATS = {
+    "trucks": "Truck {0}: {1} loads delivered, {2} minutes spent queued for an unload station",
+    "stations": "Station {0}: {1} loads recieved, average queue length {2:.2f}",
+    "truck_snapshots": "Minute {0}: Truck {1} {2}, station {3}, {4} loads delivered, {5} minutes spent queued",
+    "station_snapshots": "Minute {0}: Station {1} queue length {2}, {3} loads received",
+    "summary": "{0}: {1}",
+}
+
+# Rows handed to a sink's write_batch at once
+BATCH_SIZE = 10000
+
+
+def columns(table: str) -> list[str]:
+    """
+    Get the column names of a table
+    """
+    return [name for name, _ in TABLES[table]]
+
+
+class ResultSink:
+    def __init__(self, batch_size: int = BATCH_SIZE):
+        """
+        Initialize a destination for simulation results.
+
+        Rows are gathered into batches of batch_size and each batch is written at once, so neither a row at a time
+        nor a whole table is handled in Python. Subclasses implement write_batch.
+
+        Args:
+            batch_size (int): Rows per batch.
+        """
+        if batch_size <= 0:
+            raise ValueError("Invalid value passed for batch size. Value must be > 0")
+        self.batch_size = batch_size
+
+    def write(self, table: str, rows):
+        """
+        Write rows to a table.
+
+        Args:
+            table (str): Name of a table in TABLES.
+            rows: Iterable of tuples with one value per column of the table.
+        """
+        if table not in TABLES:
+            raise ValueError(f"Invalid value passed for table. Value must be one of {', '.join(TABLES)}")
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                self.write_batch(table, batch)
+                batch = []
+        if batch:
+            self.write_batch(table, batch)
+
+    def write_batch(self, table: str, batch: list[tuple]):
+        """
+        Write one batch of rows to a table
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        """
+        Push written rows to their destination
+        """
+
+    def close(self):
+        """
+        Flush and release the sink's files
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class TextSink(ResultSink):
+    def __init__(self, path: str = None, batch_size: int = BATCH_SIZE):
+        """
+        Initialize a sink printing one human readable line per row, the default output of a simulation.
+
+        Args:
+            path (str): File to write to, defaults to stdout.
+            batch_size (int): Rows formatted and written at once.
+        """
+        super().__init__(batch_size)
+        self.file = open(path, "w") if path is not None else None
+
+    def write_batch(self, table: str, batch: list[tuple]):
+        line = TEXT_FORMATS[table]
+        # stdout is looked up on every write, so redirecting it after the sink is created still works
+        file = self.file or sys.stdout
+        file.write("\n".join(line.format(*row) for row in batch) + "\n")
+
+    def flush(self):
+        (self.file or sys.stdout).flush()
+
+    def close(self):
+        self.flush()
+        if self.file is not None:
+            self.file.close()
+
+
+class DirectorySink(ResultSink):
+    # File name extension of each table's file
+    extension = ""
+
+    def __init__(self, directory: str, batch_size: int = BATCH_SIZE):
+        """
+        Initialize a sink writing each table to its own file in a directory.
+
+        Args:
+            directory (str): Directory the files are written to, created if missing.
+            batch_size (int): Rows written at once.
+        """
+        super().__init__(batch_size)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.files = {}
+
+    def path(self, table: str) -> str:
+        """
+        Get the file a table is written to
+        """
+        return os.path.join(self.directory, table + self.extension)
+
+    def open(self, table: str):
+        """
+        Get the open file of a table, opening it with a large buffer on first use
+        """
+        if table not in self.files:
+            self.files[table] = open(self.path(table), "w", newline="", buffering=1 << 20)
+        return self.files[table]
+
+    def flush(self):
+        for file in self.files.values():
+            file.flush()
+
+    def close(self):
+        for file in self.files.values():
+            file.close()
+        self.files = {}
+
+
+class CSVSink(DirectorySink):
+    extension = ".csv"
+
+    def __init__(self, directory: str, batch_size: int = BATCH_SIZE):
+        """
+        Initialize a sink writing each table to a CSV file with a header line.
+        """
+        super().__init__(directory, batch_size)
+        self.writers = {}
+
+    def write_batch(self, table: str, batch: list[tuple]):
+        # Only imported by runs writing CSV, like json below, to keep the startup of other runs short
+        import csv
+        if table not in self.writers:
+            self.writers[table] = csv.writer(self.open(table))
+            self.writers[table].writerow(columns(table))
+        self.writers[table].writerows(batch)
+
+
+class JSONLinesSink(DirectorySink):
+    extension = ".jsonl"
+
+    def write_batch(self, table: str, batch: list[tuple]):
+        """
+        Write each row as a JSON object keyed by column name, one per line
+        """
+        import json
+        names = columns(table)
+        self.open(table).write("".join(json.dumps(dict(zip(names, row))) + "\n" for row in batch))
+
+
+class ParquetSink(DirectorySink):
+    extension = ".parquet"
+
+    def __init__(self, directory: str, batch_size: int = BATCH_SIZE):
+        """
+        Initialize a sink writing each table to a Parquet file, one row group per batch. Needs pyarrow.
+        """
+        if importlib.util.find_spec("pyarrow") is None:
+            raise ValueError("Invalid value passed for output format. parquet needs pyarrow, "
+                             "install it with pip install .[arrow]")
+        super().__init__(directory, batch_size)
+
+    def open(self, table: str):
+        if table not in self.files:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            types = {int: pa.int64(), float: pa.float64(), str: pa.string()}
+            schema = pa.schema([(name, types[kind]) for name, kind in TABLES[table]])
+            self.files[table] = pq.ParquetWriter(self.path(table), schema)
+        return self.files[table]
+
+    def write_batch(self, table: str, batch: list[tuple]):
+        import pyarrow as pa
+        writer = self.open(table)
+        arrays = [pa.array(column, type=field.type) for column, field in zip(zip(*batch), writer.schema)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=writer.schema))
+
+    def flush(self):
+        # Row groups are written as soon as each batch arrives
+        pass
+
+
+# Sinks selectable with --output-format
+SINKS = {"text": TextSink, "csv": CSVSink, "jsonl": JSONLinesSink, "parquet": ParquetSink}
+
+
+def open_sink(output_format: str = "text", path: str = None, batch_size: int = BATCH_SIZE) -> ResultSink:
+    """
+    Create a sink by name.
+
+    Args:
+        output_format (str): One of SINKS.
+        path (str): File for the text sink, which defaults to stdout, directory for every other sink.
+        batch_size (int): Rows written at once.
+    """
+    if output_format not in SINKS:
+        raise ValueError(f"Invalid value passed for output format. Value must be one of {', '.join(SINKS)}")
+    if output_format == "text":
+        return TextSink(path, batch_size)
+    if path is None:
+        raise ValueError(f"Invalid value passed for output. {output_format} output needs a directory")
+    return SINKS[output_format](path, batch_size)
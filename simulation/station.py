@@ -1,22 +1,44 @@
+from array import array
+from collections import deque
 from simulation.truck import MiningTruck
+from simulation.stats import QueueStats
 
 class MiningUnloadStation:
-    def __init__(self, id: int):
+    __slots__ = ("station_id", "truck_queue", "num_trucks_unloaded", "queue_stats", "queue_length_over_time",
+                 "dispatcher", "unload_minutes", "bays")
+
+    def __init__(self, id: int, record_history: bool = False, history=None, unload_minutes: int = 5,
+                 bays: int = 1):
         """
         Initialize an instance of a Mining Unload Station.
 
-        Starts the station's truck queue empty
+        Starts the station's truck queue empty. The first bays trucks of the queue unload at the same time,
+        the rest wait for a bay.
 
         Args:
             id (int): ID of the station.
+            record_history (bool): Keep the queue length of every minute in queue_length_over_time.
+                Off by default, queue_stats already holds the running statistics.
+            history: Empty history to record queue lengths in instead, such as a WindowHistory or
+                DownsampledHistory whose memory does not grow with the length of the run.
+            unload_minutes (int): Minutes a truck takes to unload at this station.
+            bays (int): Number of trucks the station unloads at once.
         """
         self.station_id = id
-        self.truck_queue: list[int] = []
+        self.truck_queue: deque[int] = deque()
         self.num_trucks_unloaded = 0
-        self.queue_length_over_time: list[int] = []
+        self.queue_stats = QueueStats()
+        # Compact per-minute history, numpy.frombuffer can view it without copying
+        if history is None and record_history:
+            history = array('H')
+        self.queue_length_over_time = history
+        self.unload_minutes = unload_minutes
+        self.bays = bays
+        # Dispatcher notified whenever the queue changes, set by the simulation
+        self.dispatcher = None
 
     def __str__(self):
-        return f"Station {self.station_id}: {self.truck_queue}"
+        return f"Station {self.station_id}: {list(self.truck_queue)}"
 
     def get_queue_length(self):
         """
@@ -26,27 +48,84 @@ class MiningUnloadStation:
             length of the truck queue as an integer
         """
         return len(self.truck_queue)
-    
+
+    def get_backlog(self) -> int:
+        """
+        Get the number of trucks waiting for a bay, negative while bays are free.
+        Shortest queue dispatchers rank stations by it, for single bay stations it orders like the queue length.
+        """
+        return len(self.truck_queue) - self.bays
+
+    def add_truck(self, truck_id: int):
+        """
+        Add a truck to the back of the truck queue.
+
+        Args:
+            truck_id (int): ID of the truck joining the queue.
+        """
+        self.truck_queue.append(truck_id)
+        if self.dispatcher is not None:
+            self.dispatcher.queue_changed(self)
+
+    def remove_head(self) -> int:
+        """
+        Remove the truck at the front of the truck queue.
+
+        Returns:
+            ID of the removed truck
+        """
+        truck_id = self.truck_queue.popleft()
+        if self.dispatcher is not None:
+            self.dispatcher.queue_changed(self)
+        return truck_id
+
+    def record_queue_length(self, minutes: int = 1, length: int = None):
+        """
+        Record the current queue length as lasting a number of minutes.
+
+        Args:
+            minutes (int): Number of minutes the queue has had its current length.
+            length (int): Queue length to record instead, for engines that keep the queue elsewhere while running.
+        """
+        if minutes <= 0:
+            return
+        if length is None:
+            length = len(self.truck_queue)
+        self.queue_stats.add(length, minutes)
+        if self.queue_length_over_time is None:
+            return
+        if not isinstance(self.queue_length_over_time, array):
+            # Window and downsampled histories keep their memory bounded themselves
+            self.queue_length_over_time.add(length, minutes)
+        else:
+            try:
+                self.queue_length_over_time.extend(array(self.queue_length_over_time.typecode, [length]) * minutes)
+            except OverflowError:
+                # Queue is too long for 16 bit entries, widen the history once
+                self.queue_length_over_time = array('L', self.queue_length_over_time)
+                self.queue_length_over_time.extend(array('L', [length]) * minutes)
+
     def process_queue(self, trucks: list[MiningTruck]):
         """
         Check the status of the truck queue.
 
-        If the head truck has finished unloading, start unloading the next truck.
+        While the head truck has finished unloading, remove it and start unloading the next truck waiting for
+        a bay. Every bay takes the same time, so trucks finish in the order they started and the finished trucks
+        are always at the front of the queue.
         """
-        self.queue_length_over_time.append(self.get_queue_length())
-        if self.get_queue_length() == 0:
-            # Nothing to do for empty truck queue
-            return
-        if not trucks[self.truck_queue[0]].is_unloading():
+        self.record_queue_length()
+        queue = self.truck_queue
+        # Nothing to do for an empty truck queue, the head truck is always in a bay
+        while queue and not trucks[queue[0]].is_unloading():
             # The head truck has finished unloading, remove it from the queue
-            self.truck_queue.pop(0)
+            self.remove_head()
             self.num_trucks_unloaded += 1
-            if self.get_queue_length() > 0:
-                # If there is more trucks in queue, start unloading the next one
-                trucks[self.truck_queue[0]].start_unload()
+            if len(queue) >= self.bays:
+                # If there is a truck waiting, it starts unloading in the freed bay
+                trucks[queue[self.bays - 1]].start_unload()
 
     def get_average_queue_length(self) -> float:
         """
         Get the average length of the truck queue over each minute
         """
-        return (sum(self.queue_length_over_time) / len(self.queue_length_over_time))
\ No newline at end of file
+        return self.queue_stats.mean
@@ -0,0 +1,144 @@
+# Queue lengths below 2 ** SKETCH_BITS are counted exactly, larger ones share buckets
+# whose width keeps them within 1 / 2 ** (SKETCH_BITS - 1) of the true value
+SKETCH_BITS = 8
+
+
+def bucket_of(value: int) -> int:
+    """
+    Map a non-negative integer to its histogram bucket, keeping the top SKETCH_BITS bits of the value.
+
+    Buckets are ordered like the values they hold, so walking them in order gives percentiles.
+    """
+    shift = value.bit_length() - SKETCH_BITS
+    if shift <= 0:
+        return value
+    return (shift << SKETCH_BITS) + (value >> shift)
+
+
+def bucket_value(bucket: int) -> int:
+    """
+    Get the midpoint of the values that map to a histogram bucket.
+    """
+    shift = bucket >> SKETCH_BITS
+    if shift == 0:
+        return bucket
+    return ((bucket & ((1 << SKETCH_BITS) - 1)) << shift) + (1 << shift) // 2
+
+
+class QueueStats:
+    __slots__ = ("count", "total", "total_of_squares", "max", "histogram")
+
+    def __init__(self):
+        """
+        Initialize streaming, time-weighted statistics of a queue length.
+
+        Each observation is a queue length and the number of minutes it lasted. Only running totals
+        and a bounded histogram are kept, so memory does not grow with the length of the simulation.
+        """
+        self.count = 0
+        self.total = 0
+        self.total_of_squares = 0
+        self.max = 0
+        self.histogram: dict[int, int] = {}
+
+    def add(self, value: int, minutes: int = 1):
+        """
+        Record that the queue had the given length for a number of minutes.
+
+        Args:
+            value (int): Length of the queue.
+            minutes (int): Number of minutes the queue had this length.
+        """
+        self.count += minutes
+        self.total += value * minutes
+        self.total_of_squares += value * value * minutes
+        if value > self.max:
+            self.max = value
+        bucket = bucket_of(value)
+        self.histogram[bucket] = self.histogram.get(bucket, 0) + minutes
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, QueueStats):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    @property
+    def mean(self) -> float:
+        """
+        Time-weighted mean queue length, 0 before anything was recorded
+        """
+        return self.total / self.count if self.count else 0.0
+
+    @property
+    def variance(self) -> float:
+        """
+        Time-weighted variance of the queue length
+        """
+        if not self.count:
+            return 0.0
+        return (self.total_of_squares * self.count - self.total * self.total) / (self.count * self.count)
+
+    def percentile(self, q: float) -> int:
+        """
+        Get the queue length that the queue was at or below for q percent of the minutes.
+
+        Lengths below 2 ** SKETCH_BITS are exact, larger ones are approximated by their bucket midpoint.
+
+        Args:
+            q (float): Percentile between 0 and 100.
+        """
+        if not 0 <= q <= 100:
+            raise ValueError("Invalid value passed for percentile. Value must be between 0 and 100")
+        if not self.count:
+            return 0
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.histogram):
+            seen += self.histogram[bucket]
+            if seen >= rank:
+                return min(bucket_value(bucket), self.max)
+        return self.max
+
+
+# Two-sided 95% Student t critical values by degrees of freedom, 1.96 is used beyond the table
+T_CRITICAL_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+                 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+                 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def mean_confidence_interval(values: list[float]) -> tuple[float, float]:
+    """
+    Get the sample mean of replicate results and the half width of its 95% confidence interval.
+
+    Args:
+        values (list[float]): One result per replicate.
+
+    Returns:
+        (mean, half width), the half width is infinite with fewer than 2 values
+    """
+    n = len(values)
+    if n == 0:
+        raise ValueError("Invalid value passed for values. At least one value is required")
+    mean = sum(values) / n
+    if n < 2:
+        return mean, float("inf")
+    variance = sum((x - mean) ** 2 for x in values) / (n - 1)
+    t = T_CRITICAL_95[n - 2] if n - 1 <= len(T_CRITICAL_95) else 1.96
+    return mean, t * (variance / n) ** 0.5
+
+
+def sample_percentile(values: list[float], q: float) -> float:
+    """
+    Get a percentile of replicate results, interpolating linearly between the closest ranks.
+
+    Args:
+        values (list[float]): One result per replicate.
+        q (float): Percentile between 0 and 100.
+    """
+    if not values:
+        raise ValueError("Invalid value passed for values. At least one value is required")
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
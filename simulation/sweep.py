@@ -0,0 +1,292 @@
+import argparse
+import contextlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from simulation.cache import DEFAULT_PATH, ResultCache, cache_key
+from simulation.config import SimulationConfig, DEFAULT_CONFIG
+from simulation.rng import derive_seed
+from simulation.run import LunarMiningSimulation, ENGINES
+from simulation.stats import mean_confidence_interval, sample_percentile
+
+# Percentiles reported for every configuration
+PERCENTILES = (5, 50, 95)
+
+
+def parse_range(text: str) -> list[int]:
+    """
+    Parse a command line range of counts.
+
+    Accepts a single value "10", a comma separated list "1,2,4" or an inclusive range "start:stop[:step]".
+
+    Args:
+        text (str): Range to parse.
+
+    Returns:
+        list of counts
+    """
+    if "," in text:
+        return [int(part) for part in text.split(",")]
+    if ":" in text:
+        parts = [int(part) for part in text.split(":")]
+        if len(parts) not in (2, 3) or (len(parts) == 3 and parts[2] <= 0):
+            raise ValueError(f"Invalid value passed for range {text}. Use start:stop or start:stop:step with step > 0")
+        step = parts[2] if len(parts) == 3 else 1
+        return list(range(parts[0], parts[1] + 1, step))
+    return [int(text)]
+
+
+def replicate_seed(base_seed: int, replicate: int) -> int:
+    """
+    Derive the seed of one replicate.
+
+    The seed only depends on the replicate number, so replicate r of every configuration sees
+    the same random numbers, which makes differences between configurations easier to see.
+
+    Args:
+        base_seed (int): Seed of the whole sweep.
+        replicate (int): Replicate number.
+
+    Returns:
+        64 bit seed
+    """
+    return derive_seed(base_seed, "replicate", replicate)
+
+
+def run_replicate(num_trucks: int, num_stations: int, seed: int, engine: str = "event", minutes: int = None,
+                  dispatch: str = "indexed", config: SimulationConfig = None,
+                  antithetic: bool = False) -> tuple[int, float]:
+    """
+    Run one simulation and reduce it to the values a sweep aggregates.
+
+    Args:
+        minutes (int): Simulated minutes, defaults to the horizon of the config.
+        config (SimulationConfig): Durations and horizon of the run, defaults to the original 72 hour operation.
+        antithetic (bool): Run on the mirrored load times of the seed instead.
+
+    Returns:
+        (total loads delivered, mean minutes a truck spent queued)
+    """
+    config = (config if config is not None else DEFAULT_CONFIG).replace(horizon_minutes=minutes)
+    simulation = LunarMiningSimulation(num_trucks, num_stations, engine=engine, dispatch=dispatch, seed=seed,
+                                       config=config, antithetic=antithetic)
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = simulation.run()
+    return results.total_deliveries, results.mean_queue_time
+
+
+def replicate_key(num_trucks: int, num_stations: int, seed: int, config: SimulationConfig) -> str:
+    """
+    Get the cache key of one replicate, the engine is left out since every engine gives the same results
+    """
+    return cache_key("replicate", num_trucks=num_trucks, num_stations=num_stations, seed=seed, dispatch="indexed",
+                     config=config.to_dict())
+
+
+def run_chunk(tasks: list[tuple], engine: str, minutes: int = None, config: SimulationConfig = None) -> list[tuple]:
+    """
+    Run a batch of replicates in one worker call, so the pool is not flooded with tiny tasks.
+
+    Args:
+        tasks (list[tuple]): (num_trucks, num_stations, replicate, seed) of every replicate to run.
+
+    Returns:
+        (num_trucks, num_stations, replicate, deliveries, queue_time) of every replicate
+    """
+    results = []
+    for num_trucks, num_stations, replicate, seed in tasks:
+        deliveries, queue_time = run_replicate(num_trucks, num_stations, seed, engine, minutes, config=config)
+        results.append((num_trucks, num_stations, replicate, deliveries, queue_time))
+    return results
+
+
+def replicate_chunks(trucks: list[int], stations: list[int], replicates: int, seed: int = 0, workers: int = 1,
+                     chunk_size: int = None) -> list[list[tuple]]:
+    """
+    Split every replicate of every configuration into the batches sent to workers.
+
+    Args:
+        trucks (list[int]): Truck counts to simulate.
+        stations (list[int]): Station counts to simulate.
+        replicates (int): Replicates per configuration.
+        seed (int): Seed of the whole sweep, every replicate derives its own seed from it.
+        workers (int): Worker processes the batches are spread over.
+        chunk_size (int): Replicates per batch, by default about 8 batches per worker.
+
+    Returns:
+        batches of (num_trucks, num_stations, replicate, seed), configuration by configuration
+    """
+    if replicates <= 0:
+        raise ValueError("Invalid value passed for number of replicates. Value must be > 0")
+    tasks = [(n, m, r, replicate_seed(seed, r)) for n in trucks for m in stations for r in range(replicates)]
+    if chunk_size is None:
+        chunk_size = max(1, len(tasks) // (workers * 8))
+    return [tasks[start:start + chunk_size] for start in range(0, len(tasks), chunk_size)]
+
+
+class ConfigurationSummary:
+    def __init__(self, num_trucks: int, num_stations: int, replicates: int):
+        """
+        Initialize the aggregated results of one (num_trucks, num_stations) configuration.
+
+        Args:
+            num_trucks (int): Number of trucks simulated.
+            num_stations (int): Number of stations simulated.
+            replicates (int): Number of replicates expected before the summary is complete.
+        """
+        self.num_trucks = num_trucks
+        self.num_stations = num_stations
+        self.replicates = replicates
+        # Results are kept in replicate order, so aggregates do not depend on the order workers finish in
+        self.results: dict[int, tuple[int, float]] = {}
+
+    def add(self, replicate: int, deliveries: int, queue_time: float):
+        """
+        Add the result of one replicate.
+        """
+        self.results[replicate] = (deliveries, queue_time)
+
+    def is_complete(self) -> bool:
+        """
+        Check if every expected replicate has been added
+        """
+        return len(self.results) == self.replicates
+
+    @property
+    def deliveries(self) -> list[int]:
+        """
+        Total loads delivered by each replicate
+        """
+        return [self.results[r][0] for r in sorted(self.results)]
+
+    @property
+    def queue_time(self) -> list[float]:
+        """
+        Mean minutes a truck spent queued in each replicate
+        """
+        return [self.results[r][1] for r in sorted(self.results)]
+
+    def row(self) -> dict:
+        """
+        Get the mean, 95% confidence interval half width and percentiles of deliveries and queue time.
+        """
+        row = {"num_trucks": self.num_trucks, "num_stations": self.num_stations, "replicates": len(self.results)}
+        for name, values in (("deliveries", self.deliveries), ("queue_time", self.queue_time)):
+            row[f"{name}_mean"], row[f"{name}_ci"] = mean_confidence_interval(values)
+            for q in PERCENTILES:
+                row[f"{name}_p{q}"] = sample_percentile(values, q)
+        return row
+
+
+def sweep(trucks: list[int], stations: list[int], replicates: int, seed: int = 0, engine: str = "event",
+          minutes: int = None, workers: int = None, chunk_size: int = None, config: SimulationConfig = None,
+          cache: ResultCache = None):
+    """
+    Run every replicate of every (num_trucks, num_stations) configuration across a process pool.
+
+    Replicates are sent to the workers in chunks, configuration by configuration, and each configuration
+    is yielded as soon as its last replicate finishes, so results stream in while the sweep runs and only
+    configurations with replicates in flight are held in memory.
+
+    Args:
+        trucks (list[int]): Truck counts to simulate.
+        stations (list[int]): Station counts to simulate.
+        replicates (int): Replicates per configuration.
+        seed (int): Seed of the whole sweep, every replicate derives its own seed from it.
+        engine (str): Simulation engine used for every replicate.
+        minutes (int): Simulated minutes of every replicate, defaults to the horizon of the config.
+        workers (int): Worker processes, defaults to the number of CPUs. 1 runs everything in this process.
+        chunk_size (int): Replicates per task sent to a worker, by default about 8 tasks per worker.
+        config (SimulationConfig): Durations and horizon of every replicate, defaults to the original
+            72 hour operation.
+        cache (ResultCache): Cache checked for every replicate before it is run, new results are added to it.
+
+    Yields:
+        ConfigurationSummary of each configuration, in the order they complete
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = replicate_chunks(trucks, stations, replicates, seed, workers, chunk_size)
+    replicate_config = (config if config is not None else DEFAULT_CONFIG).replace(horizon_minutes=minutes)
+
+    pending: dict[tuple[int, int], ConfigurationSummary] = {}
+
+    def collect(results, new=True):
+        for num_trucks, num_stations, replicate, deliveries, queue_time in results:
+            if cache is not None and new:
+                cache.put(replicate_key(num_trucks, num_stations, replicate_seed(seed, replicate), replicate_config),
+                          [deliveries, queue_time])
+            key = (num_trucks, num_stations)
+            if key not in pending:
+                pending[key] = ConfigurationSummary(num_trucks, num_stations, replicates)
+            summary = pending[key]
+            summary.add(replicate, deliveries, queue_time)
+            if summary.is_complete():
+                del pending[key]
+                yield summary
+
+    if cache is not None:
+        # Only replicates missing from the cache are sent to the workers, cached ones are collected right away
+        cached, missing = [], []
+        for task in (task for chunk in chunks for task in chunk):
+            num_trucks, num_stations, replicate, task_seed = task
+            result = cache.get(replicate_key(num_trucks, num_stations, task_seed, replicate_config))
+            if result is None:
+                missing.append(task)
+            else:
+                cached.append((num_trucks, num_stations, replicate, *result))
+        yield from collect(cached, new=False)
+        if chunk_size is None:
+            chunk_size = max(1, len(missing) // (workers * 8))
+        chunks = [missing[start:start + chunk_size] for start in range(0, len(missing), chunk_size)]
+
+    if workers == 1:
+        for chunk in chunks:
+            yield from collect(run_chunk(chunk, engine, minutes, config))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_chunk, chunk, engine, minutes, config) for chunk in chunks]
+        for future in as_completed(futures):
+            yield from collect(future.result())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='LunarMiningSweep',
+        description='Runs replicates of many truck and station counts in parallel and aggregates their results'
+    )
+    parser.add_argument('--trucks', type=parse_range, required=True, help='truck counts, e.g. 10, 5,10,20 or 5:50:5')
+    parser.add_argument('--stations', type=parse_range, required=True, help='station counts, same format as --trucks')
+    parser.add_argument('--replicates', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--engine', choices=ENGINES, default="event")
+    parser.add_argument('--minutes', type=int, default=None, help='simulated minutes, overrides the config horizon')
+    parser.add_argument('--config', metavar='FILE', default=None,
+                        help='TOML file with the horizon and durations of every replicate')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=None)
+    parser.add_argument('--cache', metavar='PATH', nargs='?', const=DEFAULT_PATH, default=None,
+                        help=f'reuse replicates already run with the same settings from the sqlite cache PATH, '
+                             f'{DEFAULT_PATH} by default')
+    args = parser.parse_args()
+    config = SimulationConfig.from_toml(args.config) if args.config else DEFAULT_CONFIG
+
+    cache = ResultCache(args.cache) if args.cache else None
+    try:
+        header = None
+        for summary in sweep(args.trucks, args.stations, args.replicates, seed=args.seed, engine=args.engine,
+                             minutes=args.minutes, workers=args.workers, chunk_size=args.chunk_size, config=config,
+                             cache=cache):
+            row = summary.row()
+            if header is None:
+                header = list(row)
+                print(",".join(header))
+            print(",".join(str(row[key]) if isinstance(row[key], int) else f"{row[key]:.3f}" for key in header),
+                  flush=True)
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
-from enum import Enum
+from enum import IntEnum
 import random
+from simulation.config import SimulationConfig, DEFAULT_CONFIG, TruckClass
+from simulation.rng import LoadTimeStream, LOAD_TIME_BLOCK
 
 
-class TruckState(Enum):
+class TruckState(IntEnum):
     LOADING = 0
     SITE_TO_STATION = 1
     QUEUED = 2
@@ -12,8 +14,21 @@ class TruckState(Enum):
     def __str__(self) -> str:
         return self.name
 
+# Module level aliases, cheaper to look up than TruckState members on the hot path
+LOADING = TruckState.LOADING
+SITE_TO_STATION = TruckState.SITE_TO_STATION
+QUEUED = TruckState.QUEUED
+UNLOADING = TruckState.UNLOADING
+STATION_TO_SITE = TruckState.STATION_TO_SITE
+
 class MiningTruck:
-    def __init__(self, id: int):
+    # No per-instance __dict__, a truck only carries these fields
+    __slots__ = ("truck_id", "load_times", "config", "truck_class", "num_loads", "upcoming_load_times", "state",
+                 "minutes_elapsed_in_state", "minutes_required_in_state", "station_id", "num_batches_delivered",
+                 "total_queued_time")
+
+    def __init__(self, id: int, load_times: LoadTimeStream = None, config: SimulationConfig = None,
+                 truck_class: TruckClass = None):
         """
         Initialize an instance of a Mining Truck.
 
@@ -21,11 +36,23 @@ class MiningTruck:
 
         Args:
             id (int): ID of the truck.
+            load_times (LoadTimeStream): Stream the truck draws its load times from.
+                Defaults to a stream seeded from the random module.
+            config (SimulationConfig): Travel and unload durations, the original 30 and 5 minutes by default.
+            truck_class (TruckClass): Class of the truck from the config's truck_table, its travel time is used
+                instead of the config's. Defaults to the first class.
         """
         self.truck_id = id
-        self.state = TruckState.LOADING
+        self.load_times = load_times if load_times is not None else LoadTimeStream(random.getrandbits(64))
+        self.config = config if config is not None else DEFAULT_CONFIG
+        self.truck_class = truck_class if truck_class is not None else self.config.truck_table[0]
+        # Number of load times drawn so far, the position of this truck in its load time stream
+        self.num_loads = 1
+        # Buffered load times are only allocated once the truck draws its second load time
+        self.upcoming_load_times: list[int] = ()
+        self.state = LOADING
         self.minutes_elapsed_in_state = 0
-        self.minutes_required_in_state = self.get_load_time()
+        self.minutes_required_in_state = self.load_times.draw(id, 0)
         self.station_id = None
         self.num_batches_delivered = 0
         self.total_queued_time = 0
@@ -33,17 +60,22 @@ class MiningTruck:
     def __str__(self) -> str:
         return f"Truck {self.truck_id}: {self.state} {self.minutes_elapsed_in_state}/{self.minutes_required_in_state}"
 
-    @staticmethod
-    def get_load_time():
+    def get_load_time(self):
         """
         Randomly generate a time it takes to load a mining truck.
 
-        Returns a duration in minutes between 1 hour and 5 hours.
+        Returns a duration in minutes between the stream's shortest and longest load time, 1 hour and 5 hours
+        by default, drawn from this truck's own stream a block at a time.
 
         Returns:
-            duration in minutes between 1 hour and 5 hours.
+            duration in minutes of the next load.
         """
-        return random.randint(1 * 60, 5 * 60)
+        if not self.upcoming_load_times:
+            block = self.load_times.draw_block(self.truck_id, self.num_loads, LOAD_TIME_BLOCK)
+            block.reverse()
+            self.upcoming_load_times = block
+        self.num_loads += 1
+        return self.upcoming_load_times.pop()
 
     def is_unloading(self):
         """
@@ -52,21 +84,21 @@ class MiningTruck:
         Returns:
             True if truck is unloading, False otherwise
         """
-        return self.state == TruckState.UNLOADING
+        return self.state == UNLOADING
     
     def start_unload(self):
         """
         Set this trucks state to unloading
 
         """
-        self.state = TruckState.UNLOADING
+        self.state = UNLOADING
 
     def needs_unload_station(self):
         """
         Check if this truck needs to be assigned an unload station
 
         """
-        return self.state == TruckState.QUEUED and self.station_id is None
+        return self.state == QUEUED and self.station_id is None
 
     def tick(self):
         """
@@ -76,36 +108,37 @@ class MiningTruck:
         The state machine is a linear cycle: The truck loads helium, drives to a station, queues up to unload helium, 
         eventually reaching the front of the line and unloading, then drives to a new mining site and the cycle repeats.
         """
-        if self.state == TruckState.QUEUED:
+        state = self.state
+        if state == QUEUED:
             # If the truck is queued up at a station, it does not start unloading until the station changes its state to UNLOADING
             self.total_queued_time += 1
             return
         
         self.minutes_elapsed_in_state += 1
         if self.minutes_elapsed_in_state == self.minutes_required_in_state:
-            if self.state == TruckState.LOADING:
-                # The truck is done loading, drive to the unloading station takes 30 minutes
-                self.state = TruckState.SITE_TO_STATION
+            if state == LOADING:
+                # The truck is done loading, drive to the unloading station takes 30 minutes by default
+                self.state = SITE_TO_STATION
                 self.minutes_elapsed_in_state = 0
-                self.minutes_required_in_state = 30
-            elif self.state == TruckState.SITE_TO_STATION:
-                # The truck has reached a station, unloading takes 5 minutes
-                self.state = TruckState.QUEUED
+                self.minutes_required_in_state = self.truck_class.travel_minutes
+            elif state == SITE_TO_STATION:
+                # The truck has reached a station, unloading takes 5 minutes by default or the station's own time
+                self.state = QUEUED
                 self.minutes_elapsed_in_state = 0
-                self.minutes_required_in_state = 5
-            elif self.state == TruckState.UNLOADING:
-                # The truck is done unloading, drive to the mining site takes 30 minutes
-                self.state = TruckState.STATION_TO_SITE
+                self.minutes_required_in_state = self.config.unload_minutes
+            elif state == UNLOADING:
+                # The truck is done unloading, drive to the mining site takes 30 minutes by default
+                self.state = STATION_TO_SITE
                 self.minutes_elapsed_in_state = 0
-                self.minutes_required_in_state = 30
+                self.minutes_required_in_state = self.truck_class.travel_minutes
                 self.station_id = None
                 self.num_batches_delivered += 1
-            elif self.state == TruckState.STATION_TO_SITE:
+            elif state == STATION_TO_SITE:
                 # The truck has reached a site, loading takes between 1 and 5 hours
-                self.state = TruckState.LOADING
+                self.state = LOADING
                 self.minutes_elapsed_in_state = 0
                 self.minutes_required_in_state = self.get_load_time()
-            else: # self.state == TruckState.QUEUED
+            else: # self.state == QUEUED
                 raise SystemError("Mining Truck somehow unloaded while still in line for an unloading station")
         
 
@@ -0,0 +1,10 @@
+def snapshot(sim):
+    """
+    Collect every per-truck and per-station value runs of the same seed are expected to agree on
+    """
+    trucks = [(t.state, t.minutes_elapsed_in_state, t.minutes_required_in_state, t.station_id,
+               t.num_batches_delivered, t.total_queued_time) for t in sim.trucks]
+    stations = [(list(s.truck_queue), s.num_trucks_unloaded,
+                 list(s.queue_length_over_time) if s.queue_length_over_time is not None else None, s.queue_stats)
+                for s in sim.stations]
+    return trucks, stations
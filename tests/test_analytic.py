@@ -0,0 +1,64 @@
+import pytest
+from simulation.analytic import EXACT_STEPS, estimate, main, validate
+from simulation.config import SimulationConfig, StationClass, TruckClass
+
+
+class TestQueueingModel:
+
+    def test_matches_simulator_on_grid(self):
+        """
+        Test the estimates stay close to simulated replicates below, at and beyond the saturation of the stations
+        """
+        config = SimulationConfig(horizon_minutes=2000)
+        rows = validate([20, 60, 150], [1, 3], replicates=2, config=config, workers=1)
+        assert len(rows) == 6
+        for row in rows:
+            assert abs(row["deliveries_error"]) < 0.03
+            assert abs(row["queue_length_error"]) < 0.2
+            if row["queue_time_sim"] > 50:
+                assert abs(row["queue_time_error"]) < 0.2
+
+    def test_limits(self):
+        """
+        Test a lone truck never waits, and large fleets saturate the bays of mixed stations
+        """
+        lone = estimate(1, 1)
+        assert lone.wait_minutes == 0 and lone.queue_time == 0
+        assert lone.throughput == pytest.approx(1 / (180 + 60 + 5))
+
+        config = SimulationConfig(truck_classes=[TruckClass("light", 2, 60, 120, 20), TruckClass("heavy", 1)],
+                                  station_classes=[StationClass("single", 1, 5), StationClass("triple", 1, 4, 3)])
+        for num_trucks in (500, 501, 20000):
+            model = estimate(num_trucks, 2, config)
+            # One bay unloading for 5 minutes and three for 4 minutes, pooled at 4.25 minutes a bay
+            assert model.throughput == pytest.approx(4 / 4.25, rel=1e-3)
+            assert model.utilization == pytest.approx(1.0, rel=1e-3)
+            assert model.deliveries < model.throughput * config.horizon_minutes
+
+    @pytest.mark.parametrize("num_stations", [1, 2, 10, 50])
+    def test_changes_smoothly_with_fleet(self, num_stations):
+        """
+        Test one more truck waits at most one more unload per bay, around the fleets where the recursion stops
+        starting from one truck, across the knee of the stations and around 500 trucks
+        """
+        fleets = sorted({*range(EXACT_STEPS - 2, EXACT_STEPS + 4), *range(45 * num_stations, 55 * num_stations),
+                         *range(498, 503)})
+        for num_trucks in fleets:
+            model, more = estimate(num_trucks, num_stations), estimate(num_trucks + 1, num_stations)
+            assert -1e-9 <= more.wait_minutes - model.wait_minutes <= 5 / num_stations + 1e-9
+            assert more.throughput >= model.throughput
+        assert estimate(501, 10).queue_time == pytest.approx(estimate(500, 10).queue_time, rel=0.05)
+
+    def test_cli_and_invalid_values(self, capsys, monkeypatch):
+        """
+        Test the command line prints an estimate, and counts are validated
+        """
+        monkeypatch.setattr("sys.argv", ["analytic.py", "100", "2", "--minutes", "1000"])
+        main()
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[2].startswith("Deliveries in 1000 minutes: ")
+        assert lines[-1].startswith("Estimated in ") and lines[-1].endswith(" microseconds")
+        with pytest.raises(ValueError, match="Invalid value passed for num_trucks"):
+            estimate(0, 1)
+        with pytest.raises(ValueError, match="Invalid value passed for num_stations"):
+            estimate(1, 0)
@@ -0,0 +1,45 @@
+import pytest
+from simulation.bench import benchmark, compare, report, variants
+from simulation.dispatch import DISPATCHERS
+
+
+class TestBench:
+
+    def test_variants(self):
+        """
+        Test every engine and dispatcher is benchmarked, and the tick engine never gets an array fleet
+        """
+        combinations = variants(engines=["tick", "event"])
+        assert ("tick", "linear", "objects") in combinations
+        assert ("event", "indexed", "arrays") in combinations
+        assert ("tick", "indexed", "arrays") not in combinations
+        assert {dispatch for _, dispatch, _ in combinations} == set(DISPATCHERS)
+
+    def test_benchmark_records_metrics(self):
+        """
+        Test a benchmark run records wall time, throughput and memory for every case
+        """
+        cases = [("tick", "indexed", "objects"), ("event", "linear", "arrays")]
+        results = list(benchmark([20], [2], [120], cases, warmup=0, repeat=2, isolate=False))
+        assert [(r["engine"], r["dispatch"], r["fleet"]) for r in results] == cases
+        for result in results:
+            assert result["repeat"] == 2
+            assert 0 < result["wall_seconds"] <= result["wall_seconds_mean"]
+            assert result["ticks_per_second"] == pytest.approx(120 / result["wall_seconds"])
+            assert result["truck_minutes_per_second"] == pytest.approx(20 * 120 / result["wall_seconds"])
+            assert result["tracemalloc_peak_bytes"] > 0
+
+    def test_compare_flags_regressions(self):
+        """
+        Test only metrics that grew by more than the tolerance count as regressions
+        """
+        case = {"engine": "event", "dispatch": "indexed", "fleet": "objects", "num_trucks": 10, "num_stations": 1,
+                "minutes": 60}
+        baseline = report([dict(case, wall_seconds=1.0, tracemalloc_peak_bytes=1000)])
+        assert compare([dict(case, wall_seconds=1.05, tracemalloc_peak_bytes=1000)], baseline, 0.1) == []
+        regressions = compare([dict(case, wall_seconds=1.2, tracemalloc_peak_bytes=1000)], baseline, 0.1)
+        assert [(r["metric"], r["baseline"], r["current"]) for r in regressions] == [("wall_seconds", 1.0, 1.2)]
+        # Cases missing from the baseline are not compared
+        assert compare([dict(case, num_trucks=20, wall_seconds=9.0, tracemalloc_peak_bytes=1)], baseline) == []
+        with pytest.raises(ValueError, match="Invalid value passed for baseline"):
+            compare([], {"version": 0, "results": []})
@@ -0,0 +1,79 @@
+import sqlite3
+import pytest
+from simulation import cache as cache_module
+from simulation.cache import ResultCache, cache_key
+from simulation.config import SimulationConfig
+from simulation.run import main
+from simulation import sweep as sweep_module
+from simulation.sweep import sweep
+
+
+class TestCache:
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        """
+        Test both tiers stay within their sizes by dropping the least recently used results
+        """
+        path = str(tmp_path / "results.sqlite")
+        # Every result encodes to 9 bytes, so only two fit in either tier
+        for cache in (ResultCache(memory_bytes=20), ResultCache(path, memory_bytes=0, disk_bytes=20)):
+            with cache:
+                for name in "abc":
+                    cache.put(cache_key("run", name=name), [name * 5])
+                assert cache.get(cache_key("run", name="a")) is None
+                assert cache.get(cache_key("run", name="b")) == ["bbbbb"]
+                cache.put(cache_key("run", name="d"), ["ddddd"])
+                assert len(cache) == 2
+                assert cache.get(cache_key("run", name="b")) == ["bbbbb"]
+                assert cache.get(cache_key("run", name="c")) is None
+        with ResultCache(path) as cache:
+            assert cache.get(cache_key("run", name="d")) == ["ddddd"]
+        with pytest.raises(ValueError, match="Invalid value passed for cache size"):
+            ResultCache(memory_bytes=-1)
+
+    def test_new_results_version_invalidates(self, tmp_path, monkeypatch):
+        """
+        Test results cached by another results version are neither found nor kept
+        """
+        path = str(tmp_path / "results.sqlite")
+        with ResultCache(path) as cache:
+            cache.put(cache_key("run", seed=1), [1])
+        monkeypatch.setattr(cache_module, "RESULTS_VERSION", cache_module.RESULTS_VERSION + 1)
+        with ResultCache(path) as cache:
+            assert cache.get(cache_key("run", seed=1)) is None
+        assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM results").fetchone()[0] == 0
+
+    def test_cli_answers_repeated_run(self, tmp_path, capsys, monkeypatch):
+        """
+        Test a repeated seeded run prints the same results from the cache without simulating, on any engine
+        """
+        path = str(tmp_path / "results.sqlite")
+        argv = ["run.py", "20", "2", "--seed", "4", "--horizon", "600", "--cache", path]
+        monkeypatch.setattr("sys.argv", argv)
+        main()
+        first = capsys.readouterr().out
+
+        monkeypatch.setattr("simulation.run.LunarMiningSimulation.run", lambda self: pytest.fail("ran again"))
+        monkeypatch.setattr("sys.argv", argv + ["--engine", "event"])
+        main()
+        assert capsys.readouterr().out == first
+        assert "Truck 19:" in first
+
+    def test_overlapping_sweep_runs_only_new_replicates(self, monkeypatch):
+        """
+        Test a sweep over a grid overlapping a cached one only runs the replicates it has not seen
+        """
+        cache = ResultCache()
+        config = SimulationConfig(horizon_minutes=300)
+        first = {(s.num_trucks, s.num_stations): s.row() for s in sweep([5, 10], [1], 3, config=config, workers=1,
+                                                                      cache=cache)}
+        ran = []
+        run_replicate = sweep_module.run_replicate
+        monkeypatch.setattr(sweep_module, "run_replicate", lambda *args, **kwargs: ran.append(args[:2]) or
+                            run_replicate(*args, **kwargs))
+        second = {(s.num_trucks, s.num_stations): s.row() for s in sweep([5, 10, 15], [1], 3, config=config,
+                                                                       workers=1, cache=cache)}
+        assert ran == [(15, 1)] * 3
+        assert second[(5, 1)] == first[(5, 1)] and second[(10, 1)] == first[(10, 1)]
+        assert second == {(s.num_trucks, s.num_stations): s.row() for s in sweep([5, 10, 15], [1], 3, config=config,
+                                                                               workers=1)}
@@ -0,0 +1,90 @@
+import pytest
+from simulation.checkpoint import CheckpointFile, load, save
+from simulation.run import LunarMiningSimulation, main
+from helpers import snapshot
+
+
+def run_for(sim, minutes):
+    sim.simulation_minutes = minutes
+    sim.run()
+    return sim
+
+
+class TestCheckpoint:
+
+    @pytest.mark.parametrize("engine,fleet", [("tick", "objects"), ("event", "objects"), ("event", "arrays")])
+    def test_resume_is_exact(self, engine, fleet, tmp_path):
+        """
+        Test a run saved and loaded halfway ends exactly like an uninterrupted run
+        """
+        path = str(tmp_path / "run.ckpt")
+        straight = run_for(LunarMiningSimulation(150, 2, engine=engine, record_history=True, seed=5, fleet=fleet), 700)
+        first = run_for(LunarMiningSimulation(150, 2, engine=engine, record_history=True, seed=5, fleet=fleet), 400)
+        save(first, path)
+        resumed = run_for(load(path, engine=engine, fleet=fleet), 300)
+        assert resumed.minute == 700
+        assert snapshot(resumed) == snapshot(straight)
+
+    def test_fork_and_reset_statistics(self, tmp_path):
+        """
+        Test forks of a warmed-up state start from it, but draw their own load times
+        """
+        path = str(tmp_path / "warm.ckpt")
+        warm = run_for(LunarMiningSimulation(80, 2, engine="event", record_history=True, seed=1), 600)
+        save(warm, path)
+        forks = [load(path, seed=seed, engine="event") for seed in (10, 11, 10)]
+        assert all(snapshot(fork) == snapshot(warm) for fork in forks)
+
+        for fork in forks:
+            fork.reset_statistics()
+            assert sum(t.num_batches_delivered for t in fork.trucks) == 0
+            assert all(s.queue_stats.count == 0 and s.num_trucks_unloaded == 0 for s in fork.stations)
+            run_for(fork, 600)
+        assert snapshot(forks[0]) == snapshot(forks[2])
+        assert snapshot(forks[0]) != snapshot(forks[1])
+
+    def test_file_can_be_viewed_in_place(self, tmp_path):
+        """
+        Test the header and sections of a checkpoint can be read without loading it
+        """
+        path = str(tmp_path / "run.ckpt")
+        sim = run_for(LunarMiningSimulation(40, 3, engine="event", seed=2, fleet="arrays"), 300)
+        save(sim, path)
+        with CheckpointFile(path) as checkpoint:
+            assert (checkpoint.num_trucks, checkpoint.num_stations, checkpoint.minute) == (40, 3, 300)
+            assert checkpoint.seed == 2 and not checkpoint.record_history
+            delivered = checkpoint.view("delivered")
+            assert delivered.tolist() == sim.fleet.delivered.tolist()
+            assert checkpoint.array("queue").tolist() == [t for s in sim.stations for t in s.truck_queue]
+            delivered.release()
+
+        (tmp_path / "bad.ckpt").write_bytes(b"not a checkpoint at all, just some bytes" * 2)
+        with pytest.raises(ValueError, match="Invalid value passed for checkpoint"):
+            CheckpointFile(str(tmp_path / "bad.ckpt"))
+        (tmp_path / "short.ckpt").write_bytes(open(path, "rb").read()[:200])
+        with pytest.raises(ValueError, match="is truncated"):
+            CheckpointFile(str(tmp_path / "short.ckpt"))
+
+    def test_cli_resumes_periodic_checkpoint(self, tmp_path, capsys, monkeypatch):
+        """
+        Test a run resumed from a checkpoint saved mid-run prints the same results as an uninterrupted run
+        """
+        path = str(tmp_path / "run.ckpt")
+        monkeypatch.setattr("sys.argv", ["run.py", "20", "2", "--seed", "4"])
+        main()
+        straight = capsys.readouterr().out
+
+        sim = LunarMiningSimulation(20, 2, seed=4, checkpoint=path, checkpoint_interval=1000)
+        saved = []
+        monkeypatch.setattr(sim, "save_checkpoint", lambda checkpoint: saved.append(sim.minute))
+        run_for(sim, 2500)
+        assert saved == [1000, 2000, 2500]
+        # A run killed after minute 2000 leaves the checkpoint of minute 2000
+        save(run_for(LunarMiningSimulation(20, 2, seed=4), 2000), path)
+        capsys.readouterr()
+
+        monkeypatch.setattr("sys.argv", ["run.py", "20", "2", "--resume", path, "--engine", "event"])
+        main()
+        assert capsys.readouterr().out == straight
+        with pytest.raises(ValueError, match="Invalid value passed for checkpoint interval"):
+            LunarMiningSimulation(2, 1, checkpoint_interval=10)
@@ -0,0 +1,31 @@
+import pytest
+from simulation.compare import compare_policies
+
+
+class TestCompare:
+
+    def test_paired_differences(self):
+        """
+        Test policies are compared pairwise against the baseline on common random numbers
+        """
+        rows = compare_policies(["linear", "affinity"], [30], [1, 3], replicates=4, seed=2, minutes=24 * 60,
+                                workers=1)
+        assert [(r["num_stations"], r["policy"]) for r in rows] == [
+            (1, "indexed"), (1, "linear"), (1, "affinity"), (3, "indexed"), (3, "linear"), (3, "affinity")]
+        for row in rows:
+            if row["policy"] in ("indexed", "linear") or row["num_stations"] == 1:
+                # Identical decisions on identical load times, every paired difference is exactly zero
+                assert row["deliveries_diff"] == 0 and row["deliveries_diff_ci"] == 0
+        affinity = rows[-1]
+        assert affinity["queue_time_diff"] > 0
+        assert affinity["queue_time_diff"] == pytest.approx(affinity["queue_time_mean"] - rows[3]["queue_time_mean"])
+        assert affinity["deliveries_diff_ci"] < affinity["deliveries_diff_ci_unpaired"]
+
+    def test_reproducible_across_worker_counts(self):
+        """
+        Test a comparison gives the same rows serially and on a process pool
+        """
+        kwargs = dict(policies=["two-choices", "idle"], trucks=[12], stations=[2], replicates=3, minutes=12 * 60)
+        assert compare_policies(workers=1, **kwargs) == compare_policies(workers=2, **kwargs)
+        with pytest.raises(ValueError, match="Invalid value passed for dispatch"):
+            compare_policies(["fastest"], [5], [1], replicates=2)
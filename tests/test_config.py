@@ -0,0 +1,130 @@
+import pytest
+from simulation.checkpoint import load, save
+from simulation.config import SimulationConfig, DEFAULT_CONFIG, StationClass, TruckClass, class_counts
+from simulation.run import LunarMiningSimulation, main
+from simulation.truck import TruckState
+from helpers import snapshot
+
+
+class TestConfig:
+
+    def test_from_toml(self, tmp_path):
+        """
+        Test settings are read from a TOML file, at the top level or in a [simulation] table
+        """
+        path = tmp_path / "run.toml"
+        path.write_text("[simulation]\nhorizon_days = 30\ntravel_minutes = 45\nhistory = \"window\"\n")
+        config = SimulationConfig.from_toml(str(path))
+        assert (config.horizon_minutes, config.travel_minutes, config.history) == (30 * 24 * 60, 45, "window")
+        assert config.unload_minutes == DEFAULT_CONFIG.unload_minutes
+
+        path.write_text("load_min = 10\nload_max = 20\n")
+        assert SimulationConfig.from_toml(str(path)).replace(load_max=None, unload_minutes=8) == \
+            SimulationConfig(load_min=10, load_max=20, unload_minutes=8)
+
+    def test_validation(self):
+        """
+        Test invalid and unknown settings are rejected
+        """
+        with pytest.raises(ValueError, match="Invalid value passed for load time"):
+            SimulationConfig(load_min=300, load_max=60)
+        with pytest.raises(ValueError, match="Invalid value passed for travel time"):
+            SimulationConfig(travel_minutes=0)
+        with pytest.raises(ValueError, match="Invalid value passed for history"):
+            SimulationConfig(history="everything")
+        with pytest.raises(ValueError, match="Unknown settings speed"):
+            SimulationConfig.from_dict({"speed": 3})
+
+    def test_truck_and_station_classes(self, tmp_path):
+        """
+        Test classes read from TOML fill in the config's durations and split the fleet by weight
+        """
+        path = tmp_path / "mixed.toml"
+        path.write_text("travel_minutes = 20\n[[truck_classes]]\nname = \"hauler\"\nweight = 3\nload_max = 100\n"
+                        "[[truck_classes]]\ntravel_minutes = 45\n[[station_classes]]\nbays = 4\n")
+        config = SimulationConfig.from_toml(str(path))
+        assert config.truck_table == (TruckClass("hauler", 3, 60, 100, 20), TruckClass("", 1, 60, 300, 45))
+        assert config.station_table == (StationClass("", 1, 5, 4),)
+        assert list(config.truck_class_indices(6)) == [0, 0, 0, 0, 1, 1]
+        assert class_counts(config.truck_table, 6) == [4, 2]
+        assert list(config.station_class_indices(3)) == [0, 0, 0]
+        assert SimulationConfig.from_dict(config.to_dict()) == config
+        assert DEFAULT_CONFIG.truck_table == (TruckClass("", 1, 60, 300, 30),)
+
+        with pytest.raises(ValueError, match="Invalid value passed for bays of class 'dock'"):
+            SimulationConfig(station_classes=[{"name": "dock", "bays": 0}])
+        with pytest.raises(ValueError, match="Invalid value passed for load time of class"):
+            SimulationConfig(load_max=100, truck_classes=[{"load_min": 120}])
+        with pytest.raises(ValueError, match="Classes take the settings"):
+            SimulationConfig(truck_classes=[{"speed": 3}])
+
+    @pytest.mark.parametrize("engine", ["event", "vector", "kernel"])
+    def test_engines_agree_on_mixed_fleet(self, engine, tmp_path):
+        """
+        Test every engine gives the same results with truck classes and multi-bay stations, also across
+        a checkpoint
+        """
+        if engine == "vector":
+            pytest.importorskip("numpy")
+        config = SimulationConfig(horizon_minutes=2000, history="full",
+                                  truck_classes=({"weight": 3, "load_min": 20, "load_max": 80, "travel_minutes": 12},
+                                                 {"load_min": 90, "travel_minutes": 25}),
+                                  station_classes=({"weight": 2}, {"unload_minutes": 9, "bays": 3}))
+        tick = LunarMiningSimulation(150, 5, seed=8, config=config, antithetic=True)
+        tick.run()
+        # The three bay stations unload more than their single bay neighbours
+        assert min(s.num_trucks_unloaded for s in tick.stations[3:]) > max(s.num_trucks_unloaded
+                                                                            for s in tick.stations[:3])
+        assert {t.minutes_required_in_state for t in tick.trucks if t.state == TruckState.UNLOADING} <= {5, 9}
+
+        first = LunarMiningSimulation(150, 5, engine=engine, seed=8, config=config, antithetic=True,
+                                      fleet="arrays")
+        first.simulation_minutes = 700
+        first.run()
+        path = str(tmp_path / "mixed.ckpt")
+        save(first, path)
+        resumed = load(path, engine=engine)
+        resumed.simulation_minutes = 1300
+        resumed.run()
+        assert snapshot(resumed) == snapshot(tick)
+
+    @pytest.mark.parametrize("history", ["full", "window", "downsample"])
+    def test_engines_agree_on_custom_config(self, history, tmp_path):
+        """
+        Test every engine gives the same results with other durations and histories, also across a checkpoint
+        """
+        config = SimulationConfig(horizon_minutes=900, load_min=20, load_max=90, travel_minutes=12,
+                                  unload_minutes=9, history=history, history_window=100, history_resolution=7,
+                                  history_points=8)
+        tick = LunarMiningSimulation(40, 2, seed=3, config=config)
+        tick.run()
+        assert all(t.minutes_required_in_state in (12, 9) or 20 <= t.minutes_required_in_state <= 90
+                   for t in tick.trucks)
+
+        event = LunarMiningSimulation(40, 2, engine="event", seed=3, config=config)
+        event.simulation_minutes = 500
+        event.run()
+        path = str(tmp_path / "run.ckpt")
+        save(event, path)
+        resumed = load(path, engine="event", fleet="arrays")
+        assert resumed.config == config
+        resumed.simulation_minutes = 400
+        resumed.run()
+        assert snapshot(resumed) == snapshot(tick)
+
+    def test_long_horizon_keeps_bounded_history(self, tmp_path, capsys, monkeypatch):
+        """
+        Test a long run from the command line keeps a history of a fixed size
+        """
+        path = tmp_path / "year.toml"
+        path.write_text("horizon_days = 365\nhistory = \"downsample\"\nhistory_points = 64\n")
+        sim = LunarMiningSimulation(30, 2, engine="event", seed=1, config=SimulationConfig.from_toml(str(path)))
+        sim.run()
+        for station in sim.stations:
+            assert len(station.queue_length_over_time) <= 64
+            assert station.queue_length_over_time.minutes == 365 * 24 * 60
+
+        monkeypatch.setattr("sys.argv", ["run.py", "30", "2", "--engine", "event", "--seed", "1",
+                                         "--config", str(path), "--history", "window", "--history-window", "50"])
+        main()
+        assert "Truck" in capsys.readouterr().out
@@ -0,0 +1,149 @@
+import random
+import pytest
+from simulation.checkpoint import load, save
+from simulation.dispatch import (DISPATCHERS, Affinity, IndexedShortestQueue, JoinIdleQueue, LinearShortestQueue,
+                                 PowerOfTwoChoices, RoundRobin, ShortestExpectedWait)
+from simulation.run import LunarMiningSimulation
+from simulation.station import MiningUnloadStation
+
+
+class TestDispatch:
+
+    def test_indexed_matches_linear(self):
+        """
+        Test the heap index picks the same station as the linear scan while queues grow and shrink
+        """
+        rng = random.Random(3)
+        stations = [MiningUnloadStation(i) for i in range(17)]
+        linear = LinearShortestQueue(stations)
+        indexed = IndexedShortestQueue(stations)
+        for station in stations:
+            station.dispatcher = indexed
+        for step in range(5000):
+            assert indexed.select() is linear.select()
+            station = rng.choice(stations)
+            if station.get_queue_length() > 0 and rng.random() < 0.45:
+                station.remove_head()
+            else:
+                station.add_truck(step)
+        # Outdated entries are compacted away
+        assert len(indexed.heap) <= 4 * len(stations) + 64
+
+    def test_indexed_handles_untracked_growth(self):
+        """
+        Test queues that grow without notifying the index are still ranked by their real length
+        """
+        stations = [MiningUnloadStation(i) for i in range(3)]
+        indexed = IndexedShortestQueue(stations)
+        stations[0].truck_queue.append(0)
+        stations[1].truck_queue.append(1)
+        stations[1].truck_queue.append(2)
+        assert indexed.select().station_id == 2
+        stations[2].truck_queue.append(3)
+        assert indexed.select().station_id == 0
+
+    @pytest.mark.parametrize("engine", ["tick", "event"])
+    def test_dispatchers_give_identical_runs(self, engine):
+        """
+        Test both dispatchers produce identical simulation results, including the lowest id tie-break
+        """
+        results = []
+        for dispatch in ("linear", "indexed"):
+            sim = LunarMiningSimulation(120, 7, engine=engine, dispatch=dispatch, seed=4)
+            sim.run()
+            results.append(([(t.num_batches_delivered, t.total_queued_time) for t in sim.trucks],
+                            [(s.num_trucks_unloaded, s.queue_stats) for s in sim.stations]))
+        assert results[0] == results[1]
+
+    def test_policies(self):
+        """
+        Test each policy picks the station it promises
+        """
+        stations = [MiningUnloadStation(i) for i in range(4)]
+        for station, length in zip(stations, (2, 0, 1, 0)):
+            station.truck_queue.extend(range(length))
+
+        assert ShortestExpectedWait(stations).select().station_id == 1
+        # A short queue at a slow station is worse than a longer queue at a fast one
+        pair = [MiningUnloadStation(0), MiningUnloadStation(1, unload_minutes=20)]
+        pair[0].truck_queue.extend([0, 1])
+        pair[1].truck_queue.append(2)
+        assert ShortestExpectedWait(pair).select().station_id == 0
+
+        idle = JoinIdleQueue(stations, seed=1)
+        for station in stations:
+            station.dispatcher = idle
+        assert idle.select().station_id == 1
+        stations[1].add_truck(9)
+        assert idle.select().station_id == 3
+        stations[3].add_truck(9)
+        # No station is idle, a random one is picked
+        assert idle.select() in stations and idle.draws == 1
+
+        two = PowerOfTwoChoices(stations, seed=2)
+        for _ in range(50):
+            picked = two.select()
+            assert picked.get_queue_length() <= 1
+        assert two.draws == 100
+
+        round_robin = RoundRobin(stations)
+        assert [round_robin.select().station_id for _ in range(6)] == [0, 1, 2, 3, 0, 1]
+        assert Affinity(stations).select(truck_id=7).station_id == 3
+        with pytest.raises(ValueError, match="Invalid value passed for truck id"):
+            Affinity(stations).select()
+
+    def test_policies_count_bays(self):
+        """
+        Test policies rank multi-bay stations by the trucks waiting for a bay, not the length of their queue
+        """
+        stations = [MiningUnloadStation(0), MiningUnloadStation(1, bays=3)]
+        stations[0].truck_queue.append(0)
+        stations[1].truck_queue.extend([1, 2])
+        for policy in (IndexedShortestQueue, LinearShortestQueue, ShortestExpectedWait, JoinIdleQueue):
+            assert policy(stations).select().station_id == 1
+        # Three trucks ahead at a three bay station wait a third of the unload time each
+        stations[1].truck_queue.extend([3, 4, 5])
+        stations[1].unload_minutes = 2
+        stations[0].truck_queue.append(6)
+        assert ShortestExpectedWait(stations).select().station_id == 1
+        assert IndexedShortestQueue(stations).select().station_id == 0
+
+    @pytest.mark.parametrize("dispatch", sorted(DISPATCHERS))
+    def test_policies_agree_across_engines(self, dispatch, tmp_path):
+        """
+        Test every policy gives the same run on every engine, and after a checkpoint is resumed
+        """
+        results = []
+        for engine in ("tick", "event"):
+            sim = LunarMiningSimulation(90, 4, engine=engine, dispatch=dispatch, seed=6)
+            sim.run()
+            results.append(([(t.num_batches_delivered, t.total_queued_time) for t in sim.trucks],
+                             [(s.num_trucks_unloaded, s.queue_stats) for s in sim.stations]))
+        assert results[0] == results[1]
+
+        first = LunarMiningSimulation(90, 4, engine="event", dispatch=dispatch, seed=6)
+        first.simulation_minutes = 2000
+        first.run()
+        save(first, str(tmp_path / "run.ckpt"))
+        resumed = load(str(tmp_path / "run.ckpt"), engine="event", dispatch=dispatch)
+        resumed.simulation_minutes = 72 * 60 - 2000
+        resumed.run()
+        assert ([(t.num_batches_delivered, t.total_queued_time) for t in resumed.trucks],
+                [(s.num_trucks_unloaded, s.queue_stats) for s in resumed.stations]) == results[0]
+
+    def test_invalid_dispatch(self):
+        """
+        Test the constructor rejects unknown dispatchers
+        """
+        with pytest.raises(ValueError, match="Invalid value passed for dispatch"):
+            LunarMiningSimulation(2, 1, dispatch="random")
+
+    @pytest.mark.parametrize("dispatch", ["affinity", "two-choices", "idle"])
+    def test_shortest_queue_lookup_leaves_policy_alone(self, dispatch):
+        """
+        Test get_station_shortest_queue works with any policy and draws none of its random numbers
+        """
+        sim = LunarMiningSimulation(4, 3, dispatch=dispatch, seed=1)
+        sim.stations[0].add_truck(0)
+        assert sim.get_station_shortest_queue().station_id == 1
+        assert sim.dispatcher.draws == 0
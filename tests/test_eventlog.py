@@ -0,0 +1,86 @@
+import pytest
+from simulation.config import SimulationConfig, StationClass, TruckClass
+from simulation.eventlog import EventLogFile, main
+from simulation.fleet import TruckFleet
+from simulation.run import LunarMiningSimulation
+from simulation.truck import TruckState
+
+# Two truck classes and a station with three bays, so replays see every kind of event
+MIXED = SimulationConfig(horizon_minutes=700,
+                         truck_classes=[TruckClass("light", 2, 60, 120, 20), TruckClass("heavy", 1, 90, 300)],
+                         station_classes=[StationClass("single", 1, 5), StationClass("triple", 1, 4, 3)])
+
+
+def trucks_and_stations(fleet: TruckFleet, stations) -> tuple:
+    """
+    Collect the per-truck columns and the queues and unloaded counts of stations
+    """
+    return ([list(column) for column in fleet.columns()],
+            [(list(station.truck_queue), station.num_trucks_unloaded) for station in stations])
+
+
+class TestEventLog:
+
+    @pytest.mark.parametrize("dispatch", ["indexed", "round-robin"])
+    def test_replay_matches_runs_to_each_minute(self, dispatch, tmp_path):
+        """
+        Test the state replayed at a minute equals a run with that horizon, on and between index checkpoints
+        """
+        path = str(tmp_path / "run.log")
+        LunarMiningSimulation(60, 4, dispatch=dispatch, seed=4, config=MIXED, event_log=path,
+                              event_log_interval=50, snapshot_interval=30).run()
+        with EventLogFile(path) as log:
+            assert (log.start, log.end, log.num_trucks, log.config) == (0, 700, 60, MIXED)
+            assert list(log.minutes) == list(range(0, 700, 50))
+            for minute in (0, 1, 49, 50, 51, 333, 699, 700):
+                tick = LunarMiningSimulation(60, 4, dispatch=dispatch, seed=4,
+                                             config=MIXED.replace(horizon_minutes=minute))
+                tick.run()
+                assert trucks_and_stations(*log.state_at(minute)) == trucks_and_stations(
+                    TruckFleet.from_trucks(tick.trucks), tick.stations)
+            with pytest.raises(ValueError, match="Invalid value passed for minute"):
+                log.state_at(701)
+
+    def test_records_of_a_continued_run(self, tmp_path):
+        """
+        Test a second run() logs from the minute the first one stopped, and records list every event in a range
+        """
+        path = str(tmp_path / "run.log")
+        sim = LunarMiningSimulation(20, 2, seed=1, config=SimulationConfig(horizon_minutes=300), event_log=path)
+        sim.run()
+        sim.run()
+        with EventLogFile(path) as log:
+            assert (log.start, log.end) == (300, 600)
+            events = list(log.records(400, 460))
+        assert events and all(400 <= event.minute < 460 for event in events)
+        assert [event.minute for event in events] == sorted(event.minute for event in events)
+        for event in events:
+            # Trucks only have a station while they queue or unload, and when they leave it
+            at_station = event.state in (TruckState.QUEUED, TruckState.UNLOADING, TruckState.STATION_TO_SITE)
+            assert (event.station_id is not None) == at_station
+
+    def test_cli_replays_minute(self, tmp_path, capsys, monkeypatch):
+        """
+        Test the replay command line prints the stations and trucks asked for at a minute
+        """
+        path = str(tmp_path / "run.log")
+        LunarMiningSimulation(10, 2, seed=2, config=SimulationConfig(horizon_minutes=400), event_log=path).run()
+        capsys.readouterr()
+        monkeypatch.setattr("sys.argv", ["eventlog.py", path, "--minute", "250", "--trucks", "0:2", "--stations", "1"])
+        main()
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0] == "Minute 250"
+        assert lines[1].startswith("Station 1: ") and len(lines) == 5
+
+    def test_invalid_logs(self, tmp_path):
+        """
+        Test logged runs need truck objects and an event log file, and other files are not read as logs
+        """
+        with pytest.raises(ValueError, match="Invalid value passed for fleet. An event log"):
+            LunarMiningSimulation(10, 2, engine="event", fleet="arrays", event_log=str(tmp_path / "run.log"))
+        with pytest.raises(ValueError, match="Invalid value passed for event log interval"):
+            LunarMiningSimulation(10, 2, event_log_interval=10)
+        path = tmp_path / "other.bin"
+        path.write_bytes(b"not an event log" * 10)
+        with pytest.raises(ValueError, match="is not an event log"):
+            EventLogFile(str(path))
@@ -0,0 +1,57 @@
+import pytest
+from simulation.run import LunarMiningSimulation
+from simulation.truck import TruckState
+from helpers import snapshot
+
+
+def run_engine(engine, num_trucks, num_stations, seed, minutes=None):
+    sim = LunarMiningSimulation(num_trucks, num_stations, engine=engine, record_history=True, seed=seed)
+    if minutes is not None:
+        sim.simulation_minutes = minutes
+    sim.run()
+    return sim
+
+
+class TestEventEngine:
+
+    @pytest.mark.parametrize("num_trucks,num_stations,seed", [(15, 2, 0), (40, 1, 1), (7, 3, 2), (100, 4, 3)])
+    def test_matches_tick_engine(self, num_trucks, num_stations, seed):
+        """
+        Test the event engine produces the same trucks and stations as the tick engine for the same seed
+        """
+        tick = run_engine("tick", num_trucks, num_stations, seed)
+        event = run_engine("event", num_trucks, num_stations, seed)
+        assert snapshot(event) == snapshot(tick)
+
+    @pytest.mark.parametrize("minutes", [0, 1, 61, 95, 301])
+    def test_matches_tick_engine_short_runs(self, minutes):
+        """
+        Test runs that stop in the middle of loading, travelling and queueing
+        """
+        tick = run_engine("tick", 30, 1, 7, minutes)
+        event = run_engine("event", 30, 1, 7, minutes)
+        assert snapshot(event) == snapshot(tick)
+
+    def test_resumes_from_mid_run_state(self):
+        """
+        Test the event engine can continue from trucks and stations left mid-cycle by the tick engine
+        """
+        tick = LunarMiningSimulation(200, 1, record_history=True, seed=11)
+        tick.simulation_minutes = 400
+        tick.run()
+        assert any(truck.state == TruckState.QUEUED for truck in tick.trucks)
+
+        tick.run()
+        event = LunarMiningSimulation(200, 1, record_history=True, seed=11)
+        event.simulation_minutes = 400
+        event.run()
+        event.engine = "event"
+        event.run()
+        assert snapshot(event) == snapshot(tick)
+
+    def test_invalid_engine(self):
+        """
+        Test the constructor rejects unknown engines
+        """
+        with pytest.raises(ValueError, match="Invalid value passed for simulation engine"):
+            LunarMiningSimulation(2, 1, engine="warp")
@@ -0,0 +1,55 @@
+import pytest
+from simulation.config import SimulationConfig
+from simulation.experiment import MIN_REPLICATES, run_experiment
+from simulation.sweep import replicate_seed, run_replicate
+
+# Short runs keep the experiments fast
+CONFIG = SimulationConfig(horizon_minutes=24 * 60)
+
+
+class TestExperiment:
+
+    def test_stops_at_target_width(self):
+        """
+        Test every configuration stops once its intervals are within target, with fewer runs than a fixed design
+        """
+        rows = run_experiment([10, 30], [2], relative=0.01, widths={"queue_time": 1.0}, fixed=100, workers=1,
+                              config=CONFIG)
+        for row in rows:
+            assert row["replicates"] >= MIN_REPLICATES
+            assert row["deliveries_ci"] <= row["deliveries_target"] == pytest.approx(0.01 * row["deliveries_mean"])
+            assert row["queue_time_ci"] <= max(1.0, row["queue_time_target"])
+            assert row["runs"] == 2 * row["replicates"] and row["runs_saved"] == 100 - row["runs"]
+        assert sum(row["runs_saved"] for row in rows) > 0
+        # The first configuration has nothing to be compared with
+        assert rows[0]["deliveries_diff"] != rows[0]["deliveries_diff"]
+        assert rows[1]["deliveries_diff"] == pytest.approx(rows[1]["deliveries_mean"] - rows[0]["deliveries_mean"],
+                                                           abs=rows[1]["deliveries_diff_ci"])
+
+        # A replicate is the mean of the run of its seed and of its antithetic twin
+        replicate = run_experiment([10], [2], relative=1.0, widths={"queue_time": 100.0}, config=CONFIG,
+                                   workers=1)[0]
+        pairs = [[run_replicate(10, 2, replicate_seed(0, r), config=CONFIG, antithetic=antithetic)[0]
+                  for antithetic in (False, True)] for r in range(MIN_REPLICATES)]
+        assert replicate["replicates"] == MIN_REPLICATES
+        assert replicate["deliveries_mean"] == pytest.approx(sum(map(sum, pairs)) / (2 * MIN_REPLICATES))
+
+    def test_antithetic_pairs_need_fewer_runs(self):
+        """
+        Test antithetic pairs reach the same deliveries interval with fewer runs than independent replicates
+        """
+        options = dict(relative=0.005, widths={"queue_time": 10.0}, config=CONFIG, workers=2)
+        paired = run_experiment([20], [2], **options)[0]
+        independent = run_experiment([20], [2], antithetic=False, **options)[0]
+        assert paired["deliveries_ci"] <= paired["deliveries_target"]
+        assert independent["deliveries_ci"] <= independent["deliveries_target"]
+        assert paired["runs"] < independent["runs"]
+
+    def test_validation(self):
+        """
+        Test invalid targets are rejected
+        """
+        with pytest.raises(ValueError, match="Invalid value passed for width"):
+            run_experiment([5], [1], widths={"profit": 1.0})
+        with pytest.raises(ValueError, match="Invalid value passed for maximum replicates"):
+            run_experiment([5], [1], max_replicates=2)
@@ -0,0 +1,76 @@
+import pytest
+from simulation.fleet import TruckFleet, TruckRecord
+from simulation.rng import LoadTimeStream
+from simulation.run import LunarMiningSimulation
+from simulation.station import MiningUnloadStation
+from simulation.truck import MiningTruck, TruckState
+
+
+def engines():
+    """
+    Engines that can run an array-backed fleet in this environment
+    """
+    try:
+        import numpy  # noqa: F401
+        return ["event", "vector"]
+    except ImportError:
+        return ["event"]
+
+
+class TestTruckFleet:
+
+    def test_entities_have_no_instance_dict(self):
+        """
+        Test trucks and stations only carry their declared slots
+        """
+        assert not hasattr(MiningTruck(0), "__dict__")
+        assert not hasattr(MiningUnloadStation(0), "__dict__")
+        assert TruckState.QUEUED == 2
+
+    def test_new_fleet_matches_new_trucks(self):
+        """
+        Test a new fleet starts every truck like MiningTruck does
+        """
+        stream = LoadTimeStream(9)
+        fleet = TruckFleet(5, stream)
+        trucks = [MiningTruck(i, stream) for i in range(5)]
+        assert list(fleet) == list(TruckFleet.from_trucks(trucks))
+        assert fleet[3] == TruckRecord(3, TruckState.LOADING, 0, trucks[3].minutes_required_in_state, None, 0, 0, 1)
+        assert fleet.nbytes() == 5 * 25
+
+    def test_round_trip_through_trucks(self):
+        """
+        Test copying trucks into a fleet and back keeps their state
+        """
+        sim = LunarMiningSimulation(40, 1, seed=3)
+        sim.simulation_minutes = 300
+        sim.run()
+        fleet = TruckFleet.from_trucks(sim.trucks)
+        copies = [MiningTruck(i) for i in range(40)]
+        fleet.write_to(copies)
+        for truck, copy in zip(sim.trucks, copies):
+            assert (copy.state, copy.minutes_elapsed_in_state, copy.minutes_required_in_state, copy.station_id,
+                    copy.num_batches_delivered, copy.total_queued_time, copy.num_loads) == \
+                   (truck.state, truck.minutes_elapsed_in_state, truck.minutes_required_in_state, truck.station_id,
+                    truck.num_batches_delivered, truck.total_queued_time, truck.num_loads)
+
+    @pytest.mark.parametrize("engine", engines())
+    def test_array_fleet_matches_objects(self, engine, capsys):
+        """
+        Test an array-backed fleet gives the same output as truck objects
+        """
+        outputs = []
+        for fleet in ("objects", "arrays"):
+            sim = LunarMiningSimulation(50, 2, engine=engine, seed=12, fleet=fleet)
+            sim.run()
+            capsys.readouterr()
+            sim.output_results()
+            outputs.append(capsys.readouterr().out)
+        assert outputs[0] == outputs[1]
+
+    def test_tick_engine_needs_objects(self):
+        """
+        Test the tick engine rejects an array-backed fleet
+        """
+        with pytest.raises(ValueError, match="The tick engine needs a fleet of truck objects"):
+            LunarMiningSimulation(2, 1, fleet="arrays")
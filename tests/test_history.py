@@ -0,0 +1,36 @@
+import pytest
+from simulation.history import DownsampledHistory, WindowHistory
+
+
+class TestHistory:
+
+    def test_window_keeps_latest_minutes(self):
+        """
+        Test a window history drops its oldest minutes once full
+        """
+        history = WindowHistory(4)
+        history.add(1, 3)
+        history.add(2)
+        history.add(5, 2)
+        assert list(history) == [1, 2, 5, 5]
+        history.add(7, 100)
+        assert list(history) == [7, 7, 7, 7]
+        with pytest.raises(ValueError, match="Invalid value passed for history window"):
+            WindowHistory(0)
+
+    def test_downsample_merges_into_coarser_means(self):
+        """
+        Test a downsampled history averages its minutes and doubles its resolution instead of growing
+        """
+        history = DownsampledHistory(resolution=2, max_points=4)
+        history.add(1, 2)
+        history.add(3, 2)
+        history.add(5)
+        assert (list(history), history.resolution) == ([1, 3, 5], 2)
+        history.add(7, 5)
+        # Eight minutes filled four values, the ninth merged them into pairs of four minutes
+        assert history.resolution == 4
+        assert list(history) == [2, 6.5, 7]
+        assert sum(history.sums) == 1 * 2 + 3 * 2 + 5 + 7 * 5
+        with pytest.raises(ValueError, match="Invalid value passed for history points"):
+            DownsampledHistory(max_points=3)
@@ -0,0 +1,72 @@
+import pstats
+import pytest
+from simulation.instrument import Instrumentation, StackSampler, profile
+from simulation.run import LunarMiningSimulation
+from simulation.truck import TruckState
+from helpers import snapshot
+
+
+def run_traced(engine, fleet="objects", minutes=5 * 60):
+    instrumentation = Instrumentation()
+    sim = LunarMiningSimulation(60, 2, engine=engine, record_history=True, seed=9, fleet=fleet,
+                                instrumentation=instrumentation)
+    sim.simulation_minutes = minutes
+    sim.run()
+    return sim, instrumentation
+
+
+class TestInstrumentation:
+
+    @pytest.mark.parametrize("engine", ["tick", "event"])
+    def test_traced_run_matches_plain_run(self, engine):
+        """
+        Test tracing a run, period by period, does not change its results
+        """
+        traced, _ = run_traced(engine, minutes=5 * 60 + 17)
+        plain = LunarMiningSimulation(60, 2, engine=engine, record_history=True, seed=9)
+        plain.simulation_minutes = 5 * 60 + 17
+        plain.run()
+        assert snapshot(traced) == snapshot(plain)
+
+    def test_transitions_match_engine_results(self):
+        """
+        Test transition counts agree across engines and with the trucks' own counters
+        """
+        tick, tick_trace = run_traced("tick")
+        event, event_trace = run_traced("event", fleet="arrays")
+        assert [p.transitions for p in tick_trace.periods] == [p.transitions for p in event_trace.periods]
+        transitions = tick_trace.transitions
+        assert transitions[TruckState.STATION_TO_SITE] == sum(t.num_batches_delivered for t in tick.trucks)
+        assert transitions[TruckState.LOADING] == sum(t.num_loads - 1 for t in tick.trucks)
+        assert transitions[TruckState.UNLOADING] == sum(s.num_trucks_unloaded for s in tick.stations) + sum(
+            1 for t in tick.trucks if t.state == TruckState.UNLOADING)
+
+    def test_periods_and_phases(self):
+        """
+        Test one period is traced per simulated hour, with each phase of the loop timed
+        """
+        _, tick_trace = run_traced("tick")
+        assert [p.start_minute for p in tick_trace.periods] == [0, 60, 120, 180, 240]
+        assert set(tick_trace.phases) == {"trucks", "dispatch", "stations"}
+        assert all(seconds >= 0 for seconds in tick_trace.phases.values())
+        _, event_trace = run_traced("event")
+        assert set(event_trace.phases) == {"engine"}
+        with pytest.raises(ValueError, match="Invalid value passed for trace interval"):
+            Instrumentation(0)
+
+    def test_profile_outputs(self, tmp_path):
+        """
+        Test both profile formats are written
+        """
+        sim = LunarMiningSimulation(30, 2, seed=1)
+        profile(sim.run, str(tmp_path / "run.prof"))
+        stats = pstats.Stats(str(tmp_path / "run.prof"))
+        assert any(function == "tick" for _, _, function in stats.stats)
+
+        with StackSampler(interval=0.0005) as sampler:
+            LunarMiningSimulation(200, 2, seed=1).run()
+        sampler.write(str(tmp_path / "run.folded"))
+        lines = (tmp_path / "run.folded").read_text().splitlines()
+        assert lines
+        stack, count = lines[0].rsplit(" ", 1)
+        assert int(count) > 0 and "run_ticks (run.py:" in stack
@@ -0,0 +1,63 @@
+import pytest
+from simulation.config import SimulationConfig
+from simulation.kernel import KernelEngine
+from simulation.run import LunarMiningSimulation
+from helpers import snapshot
+
+
+class TestKernelEngine:
+
+    @pytest.mark.parametrize("num_trucks,num_stations,minutes,history", [(15, 2, 72 * 60, "full"),
+                                                                         (60, 1, 72 * 60, "full"),
+                                                                         (9, 3, 200, "window"),
+                                                                         (300, 7, 3000, "downsample")])
+    @pytest.mark.parametrize("fleet", ["objects", "arrays"])
+    def test_matches_tick_engine(self, num_trucks, num_stations, minutes, history, fleet):
+        """
+        Test the kernel reproduces the tick engine bit for bit for the same seed, compiled or not
+        """
+        config = SimulationConfig(horizon_minutes=minutes, history=history, history_window=50, history_points=16)
+        tick = LunarMiningSimulation(num_trucks, num_stations, seed=num_trucks, config=config)
+        tick.run()
+        kernel = LunarMiningSimulation(num_trucks, num_stations, engine="kernel", seed=num_trucks, config=config,
+                                       fleet=fleet)
+        kernel.run()
+        assert snapshot(kernel) == snapshot(tick)
+
+    def test_continues_runs_of_other_engines(self):
+        """
+        Test the kernel picks up queues, trucks and the dispatcher where other engines left them, and back
+        """
+        tick = LunarMiningSimulation(40, 3, record_history=True, seed=1)
+        tick.simulation_minutes = 4000
+        tick.run()
+
+        mixed = LunarMiningSimulation(40, 3, record_history=True, seed=1)
+        mixed.simulation_minutes = 1000
+        for engine in ("kernel", "event", "kernel", "tick"):
+            mixed.engine = engine
+            mixed.run()
+        assert snapshot(mixed) == snapshot(tick)
+
+        KernelEngine(mixed).run()
+        assert mixed.dispatcher.select() is mixed.get_station_shortest_queue()
+
+    def test_only_dispatches_to_shortest_queue(self):
+        """
+        Test the kernel engine refuses dispatchers it cannot run
+        """
+        with pytest.raises(ValueError, match="Invalid value passed for dispatch. The kernel engine only runs"):
+            LunarMiningSimulation(10, 2, engine="kernel", dispatch="round-robin")
+        LunarMiningSimulation(10, 2, engine="kernel", dispatch="linear")
+
+    def test_hands_changes_to_stations_when_log_fills(self, monkeypatch):
+        """
+        Test results do not depend on how often the kernel stops to hand its log to the stations
+        """
+        tick = LunarMiningSimulation(50, 3, record_history=True, seed=2)
+        tick.run()
+        # Only room for a single minute's changes, so the kernel stops after almost every minute
+        monkeypatch.setattr("simulation.kernel.LOG_CAPACITY", 0)
+        kernel = LunarMiningSimulation(50, 3, engine="kernel", record_history=True, seed=2)
+        kernel.run()
+        assert snapshot(kernel) == snapshot(tick)
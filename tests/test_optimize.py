@@ -0,0 +1,80 @@
+import pytest
+from simulation.config import SimulationConfig
+from simulation.optimize import ProfitModel, grid_truck_minutes, main, optimize, run_candidate
+from simulation.sweep import replicate_seed
+
+CONFIG = SimulationConfig(horizon_minutes=1440)
+
+
+class TestOptimize:
+
+    def test_finds_grid_optimum_with_fewer_truck_minutes(self):
+        """
+        Test successive halving picks the most profitable candidate of a full grid search with as many
+        replicates, while simulating far fewer truck minutes
+        """
+        trucks, stations = list(range(10, 101, 10)), [1, 2]
+        rows = optimize(trucks, stations, 100, 300, 6000, eta=3, max_replicates=9, seed=5, workers=1,
+                        config=CONFIG)
+        assert len(rows) == len(trucks) * len(stations)
+        assert [row["replicates"] for row in rows[:3]] == [9, 9, 9]
+        assert sorted(row["replicates"] for row in rows)[:len(rows) // 2] == [1] * (len(rows) // 2)
+
+        model = ProfitModel(100, 300, 6000, CONFIG.horizon_minutes)
+        grid = {}
+        for n in trucks:
+            for m in stations:
+                deliveries = [run_candidate((n, m, r, replicate_seed(5, r), "event", CONFIG))[3] for r in range(9)]
+                grid[(n, m)] = model.profit(n, m, sum(deliveries) / 9)
+        best = max(grid, key=grid.get)
+        assert (rows[0]["num_trucks"], rows[0]["num_stations"]) == best
+        assert rows[0]["profit_mean"] == pytest.approx(grid[best])
+        simulated = sum(row["truck_minutes"] for row in rows)
+        assert simulated * 2 < grid_truck_minutes(trucks, stations, 9, CONFIG)
+
+    def test_screen_keeps_best_modelled_candidates(self):
+        """
+        Test screening only simulates the candidates the queueing model ranks best, in parallel workers
+        """
+        rows = optimize([10, 40, 80, 160], [1, 2, 4], 100, 300, 6000, screen=4, max_replicates=3, workers=2,
+                        config=CONFIG)
+        assert len(rows) == 4
+        assert all(row["num_trucks"] >= 40 for row in rows)
+
+    def test_screen_ranks_grid_across_fleet_sizes(self):
+        """
+        Test the queueing model ranks a grid spanning 500 trucks smoothly, keeping neighbouring truck counts
+        around its optimum
+        """
+        trucks = list(range(440, 561, 8))
+        rows = optimize(trucks, [10], 100, 300, 6000, screen=4, max_replicates=1, workers=1, config=CONFIG)
+        kept = sorted(trucks.index(row["num_trucks"]) for row in rows)
+        assert kept == list(range(kept[0], kept[0] + 4))
+        assert {496, 504} <= {row["num_trucks"] for row in rows}
+
+    def test_cli_prints_best_candidate(self, capsys, monkeypatch):
+        """
+        Test the command line prints every candidate and the best one, also for a zero minute horizon
+        """
+        for minutes, saved in (("600", True), ("0", False)):
+            monkeypatch.setattr("sys.argv", ["optimize.py", "--trucks", "10,20", "--stations", "1", "--load-profit",
+                                             "100", "--truck-cost", "300", "--station-cost", "6000", "--minutes",
+                                             minutes, "--max-replicates", "3", "--workers", "1"])
+            main()
+            captured = capsys.readouterr()
+            assert len(captured.out.splitlines()) == 3
+            assert captured.err.startswith("Best: ")
+            assert ("truck minutes simulated" in captured.err) == saved
+
+    def test_invalid_values(self):
+        """
+        Test the search and profit settings are validated
+        """
+        with pytest.raises(ValueError, match="Invalid value passed for eta"):
+            optimize([10], [1], 100, 300, 6000, eta=1)
+        with pytest.raises(ValueError, match="Invalid value passed for maximum replicates"):
+            optimize([10], [1], 100, 300, 6000, replicates=4, max_replicates=3)
+        with pytest.raises(ValueError, match="Invalid value passed for load profit"):
+            optimize([10], [1], 0, 300, 6000)
+        with pytest.raises(ValueError, match="Invalid value passed for cost"):
+            ProfitModel(100, -1, 6000, 1440)
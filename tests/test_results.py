@@ -0,0 +1,61 @@
+import pytest
+from simulation import results as results_module
+from simulation.config import SimulationConfig
+from simulation.run import LunarMiningSimulation, main
+from simulation.stats import sample_percentile
+
+
+class TestResults:
+
+    @pytest.mark.parametrize("numpy", [True, False])
+    def test_aggregates_match_trucks(self, numpy, monkeypatch):
+        """
+        Test the lazy aggregates equal sums over the truck objects, with or without NumPy
+        """
+        if numpy:
+            pytest.importorskip("numpy")
+        else:
+            monkeypatch.setattr(results_module, "as_numpy", lambda column: None)
+        sim = LunarMiningSimulation(80, 3, seed=2, config=SimulationConfig(horizon_minutes=2000))
+        results = sim.run()
+        queued = [truck.total_queued_time for truck in sim.trucks]
+        assert results.total_deliveries == sum(truck.num_batches_delivered for truck in sim.trucks)
+        assert results.mean_queue_time == sum(queued) / 80
+        assert results.queue_time_percentiles(50, 99) == [sample_percentile(queued, 50),
+                                                           sample_percentile(queued, 99)]
+        edges, counts = results.queue_time_histogram(4)
+        assert len(edges) == 5 and sum(counts) == 80 and edges[-1] == max(queued)
+
+        # Each finished unload keeps a bay busy for the unload time
+        station = sim.stations[0]
+        assert results.utilization[0] == pytest.approx(station.num_trucks_unloaded * 5 / 2000, abs=5 / 2000)
+        assert 0 < results.mean_utilization <= 1
+        with pytest.raises(ValueError, match="Invalid value passed for percentile"):
+            results.queue_time_percentiles(101)
+
+    def test_range_queries_on_array_fleet(self):
+        """
+        Test range queries of an array-backed fleet return array slices equal to the truck objects of a tick run
+        """
+        config = SimulationConfig(horizon_minutes=1500)
+        tick = LunarMiningSimulation(60, 4, seed=5, config=config)
+        tick_results = tick.run()
+        results = LunarMiningSimulation(60, 4, engine="event", fleet="arrays", seed=5, config=config).run()
+        trucks = results.trucks(10, 20)
+        assert trucks["truck_id"] == range(10, 20)
+        assert list(trucks["num_batches_delivered"]) == [t.num_batches_delivered for t in tick.trucks[10:20]]
+        assert list(trucks["total_queued_time"]) == [t.total_queued_time for t in tick.trucks[10:20]]
+        assert len(results.trucks(55)["truck_id"]) == 5
+        stations = results.stations(1, 3)
+        assert list(stations["num_trucks_unloaded"]) == [s.num_trucks_unloaded for s in tick.stations[1:3]]
+        assert results.summary() == tick_results.summary()
+
+    def test_cli_summary(self, capsys, monkeypatch):
+        """
+        Test --summary prints the fleet totals instead of a line per truck and station
+        """
+        monkeypatch.setattr("sys.argv", ["run.py", "30", "2", "--seed", "1", "--horizon", "600", "--summary"])
+        main()
+        out = capsys.readouterr().out
+        assert "total_deliveries: " in out and "queue_time_p99: " in out
+        assert "Truck 0:" not in out
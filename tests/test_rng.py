@@ -0,0 +1,131 @@
+import pytest
+from simulation.checkpoint import load, save
+from simulation.rng import LoadTimeStream, derive_seed
+from simulation.run import LunarMiningSimulation, main
+from simulation.truck import MiningTruck
+from helpers import snapshot
+
+
+class TestLoadTimeStream:
+
+    def test_draws_are_reproducible_and_in_range(self):
+        """
+        Test load times only depend on the seed, truck and index, and stay between 1 and 5 hours
+        """
+        stream = LoadTimeStream(42)
+        draws = [stream.draw(truck_id, index) for truck_id in range(50) for index in range(40)]
+        assert draws == [LoadTimeStream(42).draw(truck_id, index) for truck_id in range(50) for index in range(40)]
+        assert min(draws) == 60
+        assert max(draws) == 300
+        assert draws != [LoadTimeStream(43).draw(truck_id, index) for truck_id in range(50) for index in range(40)]
+
+    def test_blocks_match_single_draws(self):
+        """
+        Test drawing a block gives the same load times as drawing them one at a time
+        """
+        stream = LoadTimeStream(7)
+        assert stream.draw_block(3, 5, 10) == [stream.draw(3, index) for index in range(5, 15)]
+
+    def test_array_draws_match_single_draws(self):
+        """
+        Test the NumPy bulk draw is bit for bit equal to the scalar draw
+        """
+        np = pytest.importorskip("numpy")
+        stream = LoadTimeStream(2 ** 63 + 12345)
+        truck_ids = np.arange(1000)
+        indices = truck_ids % 17
+        expected = [stream.draw(int(i), int(k)) for i, k in zip(truck_ids, indices)]
+        assert stream.draw_array(truck_ids, indices).tolist() == expected
+
+    def test_antithetic_stream_mirrors_draws(self):
+        """
+        Test every draw of an antithetic stream is the mirror of the plain draw within the load time range
+        """
+        plain = LoadTimeStream(11, 20, 90)
+        mirrored = LoadTimeStream(11, 20, 90, antithetic=True)
+        draws = [plain.draw(truck_id, index) for truck_id in range(20) for index in range(30)]
+        assert [mirrored.draw(truck_id, index) for truck_id in range(20) for index in range(30)] == \
+            [20 + 90 - draw for draw in draws]
+        assert mirrored.draw_block(3, 5, 10) == [mirrored.draw(3, index) for index in range(5, 15)]
+        np = pytest.importorskip("numpy")
+        truck_ids = np.arange(100)
+        assert mirrored.draw_array(truck_ids, truck_ids % 7).tolist() == \
+            [mirrored.draw(int(i), int(i % 7)) for i in truck_ids]
+
+    def test_truck_consumes_its_stream_in_order(self):
+        """
+        Test a truck's load times follow its stream, however they are buffered
+        """
+        stream = LoadTimeStream(1)
+        truck = MiningTruck(4, stream)
+        drawn = [truck.minutes_required_in_state] + [truck.get_load_time() for _ in range(20)]
+        assert drawn == stream.draw_block(4, 0, 21)
+        assert truck.num_loads == 21
+
+    def test_derive_seed(self):
+        """
+        Test derived seeds are reproducible and differ between keys
+        """
+        assert derive_seed(1, "replicate", 2) == derive_seed(1, "replicate", 2)
+        assert derive_seed(1, "replicate", 2) != derive_seed(1, "replicate", 3)
+        assert 0 <= derive_seed(99) < 2 ** 64
+
+
+class TestSeededSimulation:
+
+    def test_same_output_on_every_engine(self, capsys):
+        """
+        Test the same seed gives identical output_results on every engine
+        """
+        outputs = []
+        engines = ["tick", "event"]
+        try:
+            import numpy  # noqa: F401
+            engines.append("vector")
+        except ImportError:
+            pass
+        for engine in engines:
+            sim = LunarMiningSimulation(25, 2, engine=engine, seed=2024)
+            sim.run()
+            capsys.readouterr()
+            sim.output_results()
+            outputs.append(capsys.readouterr().out)
+        assert all(output == outputs[0] for output in outputs)
+
+    def test_antithetic_runs_agree_on_every_engine(self, tmp_path):
+        """
+        Test an antithetic run is the same on every engine and stays antithetic across a checkpoint
+        """
+        engines = ["event", "kernel"]
+        try:
+            import numpy  # noqa: F401
+            engines.append("vector")
+        except ImportError:
+            pass
+        tick = LunarMiningSimulation(25, 2, seed=2024, antithetic=True)
+        tick.run()
+        plain = LunarMiningSimulation(25, 2, seed=2024)
+        plain.run()
+        assert snapshot(tick) != snapshot(plain)
+        for engine in engines:
+            sim = LunarMiningSimulation(25, 2, engine=engine, seed=2024, antithetic=True)
+            sim.simulation_minutes = 1000
+            sim.run()
+            path = str(tmp_path / f"{engine}.ckpt")
+            save(sim, path)
+            resumed = load(path, engine=engine)
+            resumed.simulation_minutes = 72 * 60 - 1000
+            resumed.run()
+            assert snapshot(resumed) == snapshot(tick)
+
+    def test_cli_seed(self, capsys, monkeypatch):
+        """
+        Test --seed makes command line runs reproducible
+        """
+        outputs = []
+        for _ in range(2):
+            monkeypatch.setattr("sys.argv", ["run.py", "6", "1", "--engine", "event", "--seed", "3"])
+            main()
+            outputs.append(capsys.readouterr().out)
+        assert outputs[0] == outputs[1]
+        assert "Truck 5:" in outputs[0]
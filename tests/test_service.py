@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from simulation.config import SimulationConfig
+from simulation.run import LunarMiningSimulation
+from simulation.service import ServiceClient, SimulationService
+from simulation.sweep import sweep
+
+
+# Seconds a test may take before it counts as hung
+TIMEOUT = 60
+
+
+def serve(test, tmp_path, **limits):
+    """
+    Run a test coroutine against a service listening on a Unix socket in tmp_path, failing if it hangs
+    """
+    async def main():
+        path = str(tmp_path / "service.sock")
+        async with SimulationService(workers=2, **limits) as service:
+            server = await service.serve(path=path)
+            async with server:
+                return await asyncio.wait_for(test(service, ServiceClient(path=path)), TIMEOUT)
+    return asyncio.run(main())
+
+
+class TestService:
+
+    def test_run_streams_and_caches(self, tmp_path):
+        """
+        Test a run streams its events, gives the same result as the engines, and is then answered from the cache
+        """
+        spec = {"num_trucks": 30, "num_stations": 2, "seed": 9, "config": {"horizon_minutes": 600}}
+
+        async def test(service, client):
+            events = []
+            result = await client.run(spec, on_event=events.append)
+            again = await client.submit(dict(spec, engine="tick"))
+            return events, result, again, await client.health()
+
+        events, result, again, health = serve(test, tmp_path)
+        assert [event["event"] for event in events] == ["queued", "running", "done"]
+        assert again["status"] == "done" and again["cached"] and again["result"] == result
+        assert health["cached"] == 1 and health["queued"] == 0
+
+        sim = LunarMiningSimulation(30, 2, seed=9, config=SimulationConfig(horizon_minutes=600))
+        sim.run()
+        assert result["deliveries"] == sum(truck.num_batches_delivered for truck in sim.trucks)
+        assert [row[1] for row in result["stations"]] == [station.num_trucks_unloaded for station in sim.stations]
+
+    def test_sweep_streams_partial_results(self, tmp_path):
+        """
+        Test a sweep reports progress and every configuration as it completes, matching a local sweep
+        """
+        spec = {"kind": "sweep", "trucks": [5, 10], "stations": [1, 2], "replicates": 3, "minutes": 300,
+                "chunk_size": 2}
+
+        async def test(service, client):
+            events = []
+            rows = await client.run(spec, on_event=events.append)
+            return events, rows
+
+        events, rows = serve(test, tmp_path)
+        progress = [event["done"] for event in events if event["event"] == "progress"]
+        assert progress == sorted(progress) and progress[-1] == 12
+        assert sorted(event["row"]["num_trucks"] for event in events if event["event"] == "partial") == [5, 5, 10, 10]
+        local = {(s.num_trucks, s.num_stations): s.row() for s in sweep([5, 10], [1, 2], 3, minutes=300, workers=1)}
+        assert {(row["num_trucks"], row["num_stations"]): row for row in rows} == local
+
+    def test_concurrent_jobs_with_bounded_queue(self, tmp_path):
+        """
+        Test many concurrent clients are served, identical jobs run once, and a full queue refuses new jobs
+        """
+        async def test(service, client):
+            specs = [{"num_trucks": 5 + i % 10, "num_stations": 1, "seed": 1, "config": {"horizon_minutes": 120}}
+                     for i in range(60)]
+            results = await asyncio.gather(*(client.run(spec) for spec in specs))
+            with pytest.raises(ValueError, match="Missing settings num_stations"):
+                await client.submit({"num_trucks": 5})
+            bad = [{"kind": "sweep", "trucks": 5, "stations": [1]},
+                   {"kind": "sweep", "trucks": [5], "stations": [1], "minutes": "x"},
+                   {"kind": "sweep", "trucks": [5], "stations": [1], "chunk_size": 0},
+                   {"num_trucks": 5, "num_stations": 1, "config": {"horizon_minutes": "x"}}]
+            for spec in bad:
+                with pytest.raises(ValueError, match="Invalid value passed for"):
+                    await client.submit(spec)
+            with pytest.raises(ValueError, match="no job"):
+                await client.status("999")
+
+            # Fill the queue while both workers are busy
+            slow = {"num_trucks": 500, "num_stations": 4, "config": {"horizon_minutes": 2000}}
+            refused = 0
+            for seed in range(16):
+                try:
+                    await client.submit(dict(slow, seed=seed))
+                except asyncio.QueueFull:
+                    refused += 1
+            return results, refused, len(service.cache)
+
+        results, refused, cached = serve(test, tmp_path, max_queued=10, max_jobs=20, cache_size=8)
+        assert [result["deliveries"] for result in results[:10]] == [result["deliveries"] for result in results[10:20]]
+        assert cached <= 8
+        # Two jobs can be running while ten wait
+        assert refused >= 16 - 10 - 2
@@ -0,0 +1,50 @@
+import pytest
+from simulation.config import SimulationConfig, StationClass, TruckClass
+from simulation.run import LunarMiningSimulation
+from simulation.shard import ShardEngine
+from helpers import snapshot
+
+
+class TestShardEngine:
+
+    @pytest.mark.parametrize("workers", [1, 3])
+    @pytest.mark.parametrize("dispatch", ["indexed", "round-robin", "expected-wait"])
+    def test_matches_tick_engine(self, workers, dispatch):
+        """
+        Test workers stepping ranges of trucks reproduce the tick engine for the same seed, on a mixed fleet
+        with multi-bay stations
+        """
+        config = SimulationConfig(horizon_minutes=1500, history="full",
+                                  truck_classes=[TruckClass("light", 2, 60, 120, 20), TruckClass("heavy", 1, 90, 300)],
+                                  station_classes=[StationClass("single", 1, 5), StationClass("triple", 1, 4, 3)])
+        tick = LunarMiningSimulation(70, 4, dispatch=dispatch, seed=6, config=config)
+        tick.run()
+        shard = LunarMiningSimulation(70, 4, engine="shard", dispatch=dispatch, seed=6, config=config, workers=workers)
+        shard.run()
+        assert snapshot(shard) == snapshot(tick)
+
+    def test_continues_runs_of_other_engines(self):
+        """
+        Test the shard engine picks up an array-backed fleet where other engines left it, with more workers
+        than trucks
+        """
+        tick = LunarMiningSimulation(5, 2, record_history=True, seed=3)
+        tick.simulation_minutes = 3000
+        tick.run()
+
+        mixed = LunarMiningSimulation(5, 2, engine="event", fleet="arrays", record_history=True, seed=3)
+        mixed.simulation_minutes = 1000
+        for engine in ("shard", "event", "shard"):
+            mixed.engine = engine
+            mixed.workers = 8
+            mixed.run()
+        assert snapshot(mixed) == snapshot(tick)
+
+    def test_invalid_workers(self):
+        """
+        Test the number of workers is validated
+        """
+        with pytest.raises(ValueError, match="Invalid value passed for workers"):
+            LunarMiningSimulation(10, 2, engine="shard", workers=0)
+        with pytest.raises(ValueError, match="Invalid value passed for workers"):
+            ShardEngine(LunarMiningSimulation(10, 2), workers=-1)
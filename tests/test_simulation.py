@@ -1,5 +1,8 @@
+import io
+import subprocess
+import sys
 import pytest
-from simulation.run import LunarMiningSimulation
+from simulation.run import LunarMiningSimulation, main
 from simulation.truck import MiningTruck, TruckState
 
 
@@ -126,4 +129,46 @@ class TestLunarMiningSimulation:
         
         # Run the simulation
         sim.run()
-        
\ No newline at end of file
+        
+
+
+class TestBatch:
+    def test_batch_file_matches_single_runs(self, tmp_path, capsys):
+        """
+        Test a batch file prints the results of every line in order, the same as running them one by one,
+        with the batch command line's arguments as the defaults of its lines
+        """
+        lines = ["20 2 --seed 1", "# comment", "", "30 3 --seed 2 --engine event --horizon 300"]
+        path = tmp_path / "batch.txt"
+        path.write_text("\n".join(lines))
+        main(["--batch", str(path), "--horizon", "600"])
+        batch = capsys.readouterr().out
+
+        main(["20", "2", "--seed", "1", "--horizon", "600"])
+        main(["30", "3", "--seed", "2", "--engine", "event", "--horizon", "300"])
+        assert batch == capsys.readouterr().out
+        assert batch.count("Running Simulation") == 2
+
+    def test_batch_from_stdin(self, capsys, monkeypatch):
+        """
+        Test a batch read from stdin, whose lines take the truck and station counts of the batch command line,
+        and that stdin is left open for the caller
+        """
+        stdin = io.StringIO("--seed 3\n40 --seed 3\n")
+        monkeypatch.setattr("sys.stdin", stdin)
+        main(["20", "2", "--batch", "-", "--horizon", "600", "--summary"])
+        assert not stdin.closed
+        out = capsys.readouterr().out
+        assert "20 trucks and 2 stations" in out and "40 trucks and 2 stations" in out
+        with pytest.raises(SystemExit):
+            monkeypatch.setattr("sys.stdin", io.StringIO("20 2 --batch other.txt\n"))
+            main(["--batch", "-"])
+
+    def test_import_leaves_optional_dependencies(self):
+        """
+        Test importing the command line does not import optional or unused dependencies, which slow down startup
+        """
+        heavy = ["numpy", "numba", "pyarrow", "sqlite3", "csv", "json", "simulation.events"]
+        code = f"import sys, simulation.run; print([name for name in {heavy!r} if name in sys.modules])"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        assert result.stdout.strip() == "[]"
\ No newline at end of file
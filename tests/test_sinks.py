@@ -0,0 +1,93 @@
+import csv
+import importlib.util
+import json
+import pytest
+from simulation.run import LunarMiningSimulation
+from simulation.sinks import CSVSink, JSONLinesSink, TextSink, open_sink
+
+
+def run_with_sink(sink, engine="tick", snapshot_interval=None):
+    sim = LunarMiningSimulation(12, 2, engine=engine, seed=3, sink=sink, snapshot_interval=snapshot_interval)
+    sim.simulation_minutes = 6 * 60
+    sim.run()
+    sim.output_results()
+    return sim
+
+
+class TestSinks:
+
+    def test_text_sink_keeps_output_format(self, capsys):
+        """
+        Test the default sink prints the same lines as the original print-based output
+        """
+        sim = run_with_sink(None)
+        capsys.readouterr()
+        sim.output_results()
+        expected = [f"Truck {t.truck_id}: {t.num_batches_delivered} loads delivered, {t.total_queued_time} minutes "
+                    f"spent queued for an unload station" for t in sim.trucks]
+        expected += [f"Station {s.station_id}: {s.num_trucks_unloaded} loads recieved, average queue length "
+                     f"{'%.2f' % s.get_average_queue_length()}" for s in sim.stations]
+        assert capsys.readouterr().out.splitlines() == expected
+
+    def test_csv_and_jsonl_sinks(self, tmp_path):
+        """
+        Test the CSV and JSON Lines sinks write the same rows, in small batches
+        """
+        with CSVSink(str(tmp_path / "csv"), batch_size=5) as sink:
+            sim = run_with_sink(sink)
+        with JSONLinesSink(str(tmp_path / "jsonl"), batch_size=5) as sink:
+            run_with_sink(sink)
+        with open(tmp_path / "csv" / "trucks.csv") as file:
+            rows = list(csv.DictReader(file))
+        assert [int(row["loads_delivered"]) for row in rows] == [t.num_batches_delivered for t in sim.trucks]
+        with open(tmp_path / "jsonl" / "trucks.jsonl") as file:
+            records = [json.loads(line) for line in file]
+        assert records == [{key: int(value) for key, value in row.items()} for row in rows]
+        with open(tmp_path / "jsonl" / "stations.jsonl") as file:
+            stations = [json.loads(line) for line in file]
+        assert [s["loads_received"] for s in stations] == [s.num_trucks_unloaded for s in sim.stations]
+
+    @pytest.mark.parametrize("engine", ["tick", "event"])
+    def test_snapshots_stream_during_run(self, engine, tmp_path):
+        """
+        Test snapshots are written at every interval and do not change the results
+        """
+        with JSONLinesSink(str(tmp_path)) as sink:
+            sim = run_with_sink(sink, engine, snapshot_interval=100)
+        plain = run_with_sink(TextSink(str(tmp_path / "plain.txt")), engine)
+        assert [t.num_batches_delivered for t in sim.trucks] == [t.num_batches_delivered for t in plain.trucks]
+        with open(tmp_path / "truck_snapshots.jsonl") as file:
+            trucks = [json.loads(line) for line in file]
+        with open(tmp_path / "station_snapshots.jsonl") as file:
+            stations = [json.loads(line) for line in file]
+        assert sorted({row["minute"] for row in trucks}) == [100, 200, 300, 360]
+        assert len(trucks) == 4 * 12 and len(stations) == 4 * 2
+        last = [row for row in trucks if row["minute"] == 360]
+        assert [row["state"] for row in last] == [str(t.state) for t in sim.trucks]
+        assert [row["minutes_queued"] for row in last] == [t.total_queued_time for t in sim.trucks]
+
+    def test_open_sink(self, tmp_path):
+        """
+        Test sinks are created by name, and invalid choices are rejected
+        """
+        assert isinstance(open_sink("csv", str(tmp_path)), CSVSink)
+        with pytest.raises(ValueError, match="Invalid value passed for output format"):
+            open_sink("xml", str(tmp_path))
+        with pytest.raises(ValueError, match="Invalid value passed for output"):
+            open_sink("jsonl")
+        with pytest.raises(ValueError, match="Invalid value passed for snapshot interval"):
+            LunarMiningSimulation(2, 1, snapshot_interval=0)
+        if importlib.util.find_spec("pyarrow") is None:
+            with pytest.raises(ValueError, match="parquet needs pyarrow"):
+                open_sink("parquet", str(tmp_path))
+
+    def test_parquet_sink(self, tmp_path):
+        """
+        Test the Parquet sink writes typed columns, when pyarrow is installed
+        """
+        pq = pytest.importorskip("pyarrow.parquet")
+        with open_sink("parquet", str(tmp_path), batch_size=4) as sink:
+            sim = run_with_sink(sink, snapshot_interval=120)
+        table = pq.read_table(str(tmp_path / "trucks.parquet"))
+        assert table.column("loads_delivered").to_pylist() == [t.num_batches_delivered for t in sim.trucks]
+        assert pq.read_table(str(tmp_path / "truck_snapshots.parquet")).num_rows == 3 * 12
@@ -76,4 +76,55 @@ class TestStation:
         assert test_station.get_queue_length() == 2
         test_station.process_queue(trucks=[test_truck_0, test_truck_1])
         assert test_station.get_queue_length() == 1
-        assert test_truck_1.is_unloading()
\ No newline at end of file
+        assert test_truck_1.is_unloading()
+
+    def test_process_queue_with_bays(self):
+        """
+        Test a multi-bay station unloads its first trucks together and hands each freed bay to the next truck
+        """
+        test_station = MiningUnloadStation(0, bays=2)
+        trucks = [MiningTruck(i) for i in range(4)]
+        for truck in trucks:
+            truck.state = TruckState.QUEUED
+        trucks[0].state = trucks[1].state = TruckState.UNLOADING
+        test_station.truck_queue.extend(range(4))
+
+        # Both bays finish in the same minute, the two waiting trucks take them
+        trucks[0].state = trucks[1].state = TruckState.STATION_TO_SITE
+        test_station.process_queue(trucks=trucks)
+        assert list(test_station.truck_queue) == [2, 3]
+        assert test_station.num_trucks_unloaded == 2
+        assert trucks[2].is_unloading() and trucks[3].is_unloading()
+        assert test_station.get_backlog() == 0
+
+    def test_queue_statistics(self):
+        """
+        Test processing the queue keeps running statistics without storing a history by default
+        """
+        test_station = MiningUnloadStation(0)
+        test_truck = MiningTruck(0)
+        test_truck.state = TruckState.UNLOADING
+        test_station.add_truck(test_truck.truck_id)
+        for _ in range(3):
+            test_station.process_queue(trucks=[test_truck])
+        test_station.truck_queue.popleft()
+        test_station.process_queue(trucks=[test_truck])
+
+        assert test_station.queue_length_over_time is None
+        assert test_station.queue_stats.count == 4
+        assert test_station.queue_stats.max == 1
+        assert test_station.get_average_queue_length() == 0.75
+
+    def test_queue_history(self):
+        """
+        Test the optional per-minute history, which widens itself for very long queues
+        """
+        test_station = MiningUnloadStation(0, record_history=True)
+        test_station.add_truck(0)
+        test_station.record_queue_length(2)
+        assert test_station.queue_length_over_time.typecode == 'H'
+        assert list(test_station.queue_length_over_time) == [1, 1]
+
+        test_station.truck_queue.extend(range(70000))
+        test_station.record_queue_length()
+        assert list(test_station.queue_length_over_time) == [1, 1, 70001]
@@ -0,0 +1,68 @@
+import pytest
+from simulation.stats import QueueStats, bucket_of, bucket_value
+
+
+class TestQueueStats:
+
+    def test_time_weighted_statistics(self):
+        """
+        Test the running statistics weight every queue length by how many minutes it lasted
+        """
+        stats = QueueStats()
+        stats.add(0, 6)
+        stats.add(2, 3)
+        stats.add(5)
+        assert stats.count == 10
+        assert stats.total == 11
+        assert stats.max == 5
+        assert stats.mean == pytest.approx(1.1)
+        # Same as the variance of the expanded per-minute samples
+        samples = [0] * 6 + [2] * 3 + [5]
+        mean = sum(samples) / len(samples)
+        assert stats.variance == pytest.approx(sum((x - mean) ** 2 for x in samples) / len(samples))
+
+    def test_empty_statistics(self):
+        """
+        Test statistics before anything was recorded
+        """
+        stats = QueueStats()
+        assert stats.mean == 0.0
+        assert stats.variance == 0.0
+        assert stats.percentile(50) == 0
+
+    def test_percentiles(self):
+        """
+        Test percentiles are exact for short queues and within the sketch precision for long ones
+        """
+        stats = QueueStats()
+        for length in range(100):
+            stats.add(length)
+        assert stats.percentile(0) == 0
+        assert stats.percentile(50) == 49
+        assert stats.percentile(100) == 99
+
+        long_queue = QueueStats()
+        long_queue.add(100000, 10)
+        assert long_queue.percentile(50) == pytest.approx(100000, rel=1 / 128)
+        with pytest.raises(ValueError, match="Invalid value passed for percentile"):
+            stats.percentile(101)
+
+    def test_sketch_is_bounded(self):
+        """
+        Test the histogram stays small however many distinct lengths are recorded
+        """
+        stats = QueueStats()
+        for length in range(0, 1000000, 7):
+            stats.add(length)
+        assert len(stats.histogram) < 3000
+
+    def test_buckets_are_ordered(self):
+        """
+        Test larger values never map to smaller buckets, and bucket midpoints stay close to the values
+        """
+        previous = -1
+        for value in range(0, 70000, 13):
+            bucket = bucket_of(value)
+            assert bucket >= previous
+            assert abs(bucket_value(bucket) - value) <= value / 128
+            previous = bucket
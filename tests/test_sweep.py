@@ -0,0 +1,63 @@
+import pytest
+from simulation.config import SimulationConfig
+from simulation.run import LunarMiningSimulation
+from simulation.stats import mean_confidence_interval, sample_percentile
+from simulation.sweep import parse_range, replicate_seed, run_replicate, sweep
+
+
+class TestSweep:
+
+    def test_parse_range(self):
+        """
+        Test the range formats accepted on the command line
+        """
+        assert parse_range("10") == [10]
+        assert parse_range("1,2,4") == [1, 2, 4]
+        assert parse_range("5:20:5") == [5, 10, 15, 20]
+        assert parse_range("1:3") == [1, 2, 3]
+        with pytest.raises(ValueError, match="Invalid value passed for range"):
+            parse_range("1:10:0")
+
+    def test_replicate_seeds(self):
+        """
+        Test replicate seeds are reproducible and distinct
+        """
+        assert replicate_seed(0, 3) == replicate_seed(0, 3)
+        assert len({replicate_seed(0, r) for r in range(1000)}) == 1000
+        assert replicate_seed(0, 3) != replicate_seed(1, 3)
+
+    def test_sweep_is_reproducible_across_worker_counts(self):
+        """
+        Test a sweep gives the same aggregated results serially and on a process pool
+        """
+        kwargs = dict(trucks=[4, 8], stations=[1, 2], replicates=3, seed=5, minutes=24 * 60)
+        serial = {(s.num_trucks, s.num_stations): s.row() for s in sweep(workers=1, **kwargs)}
+        parallel = {(s.num_trucks, s.num_stations): s.row() for s in sweep(workers=2, chunk_size=2, **kwargs)}
+        assert len(serial) == 4
+        assert serial == parallel
+        for row in serial.values():
+            assert row["replicates"] == 3
+            assert row["deliveries_p5"] <= row["deliveries_p50"] <= row["deliveries_p95"]
+
+    def test_replicates_use_config(self):
+        """
+        Test replicates run with the durations of the config, and minutes only override its horizon
+        """
+        config = SimulationConfig(horizon_minutes=5000, load_min=30, load_max=40, travel_minutes=10)
+        sim = LunarMiningSimulation(6, 1, engine="event", seed=2, config=config.replace(horizon_minutes=600))
+        sim.run()
+        expected = sum(truck.num_batches_delivered for truck in sim.trucks)
+        assert run_replicate(6, 1, 2, minutes=600, config=config)[0] == expected
+        assert run_replicate(6, 1, 2, minutes=600)[0] < expected
+
+    def test_sample_statistics(self):
+        """
+        Test the replicate aggregation helpers
+        """
+        mean, half_width = mean_confidence_interval([1, 2, 3, 4])
+        assert mean == 2.5
+        # t with 3 degrees of freedom times the standard error
+        assert half_width == pytest.approx(3.182 * (5 / 3 / 4) ** 0.5)
+        assert mean_confidence_interval([7]) == (7, float("inf"))
+        assert sample_percentile([1, 2, 3, 4], 50) == 2.5
+        assert sample_percentile([4, 1, 3, 2], 100) == 4